@@ -2,6 +2,7 @@
 ASGI config for DnD_character_sheet_creator project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Run it with an ASGI server, e.g. ``uvicorn DnD_character_sheet_creator.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -14,3 +15,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DnD_character_sheet_creator.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler  # noqa: E402
+
+if settings.DEBUG:
+    # runserver serves static files itself; do the same under an ASGI server in development
+    application = ASGIStaticFilesHandler(application)
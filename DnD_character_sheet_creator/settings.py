@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,8 +51,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'base.middleware.ProfilerMiddleware',
 ]
 
+# Per-request profiling (Server-Timing headers + JSON log for `manage.py profile_report`).
+# Off unless DND_PROFILE=1; the middleware removes itself when disabled.
+PROFILER_ENABLED = os.environ.get('DND_PROFILE') == '1'
+PROFILER_LOG = BASE_DIR / 'logs' / 'profile.jsonl'
+PROFILER_LOG_MAX_BYTES = 5 * 1024 * 1024
+PROFILER_LOG_BACKUPS = 3
+
 ROOT_URLCONF = 'DnD_character_sheet_creator.urls'
 
 TEMPLATES = [
@@ -81,6 +91,51 @@ DATABASES = {
     }
 }
 
+# SQLite production profile (DND_SQLITE_PRODUCTION=1): persistent, health-checked
+# connections, IMMEDIATE write transactions and the pragmas below, which
+# base.signals.configure_sqlite runs on every new connection
+SQLITE_PRODUCTION = os.environ.get('DND_SQLITE_PRODUCTION') == '1'
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -32000,
+}
+SQLITE_PRODUCTION_OPTIONS = {
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+}
+SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS if SQLITE_PRODUCTION else {}
+if SQLITE_PRODUCTION:
+    DATABASES['default'].update(SQLITE_PRODUCTION_OPTIONS)
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/ref/settings/#caches
+# 'default' holds rendered sheet fragments and their render locks. 'state'
+# holds the few long-lived values every server process must agree on (the
+# rules version stamp and the fragment hit counters), so it must be shared
+# and is never culled: a file cache for one host, Redis
+# (DND_CACHE_BACKEND / DND_STATE_CACHE_BACKEND) for several.
+
+CACHE_DIR = BASE_DIR / '.cache'
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DND_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('DND_CACHE_LOCATION', str(CACHE_DIR / 'default')),
+    },
+    'state': {
+        'BACKEND': os.environ.get(
+            'DND_STATE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.environ.get('DND_STATE_CACHE_LOCATION', str(CACHE_DIR / 'state')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': sys.maxsize},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -114,6 +169,9 @@ USE_TZ = True
 
 LOGIN_URL = 'login'
 
+# Restores test databases from a cached, pre-migrated template (see base/test_runner.py)
+TEST_RUNNER = 'base.test_runner.TemplateDatabaseTestRunner'
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+from base.utils.rules_catalog import STATE_CACHE
+
+# Backends whose entries live in (or never leave) a single process
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """The rules version stamp must be shared by every server process."""
+    if STATE_CACHE not in settings.CACHES:
+        return [
+            Error(
+                f"CACHES has no '{STATE_CACHE}' alias.",
+                hint='It holds the rules version stamp; see settings.CACHES.',
+                id='base.E001',
+            )
+        ]
+    backend = settings.CACHES[STATE_CACHE].get('BACKEND')
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [
+        Warning(
+            f"The '{STATE_CACHE}' cache ({backend}) is not shared between processes.",
+            hint=(
+                'Rules edits bump a version stamp in this cache; with more than one '
+                'server process the others keep serving the old catalog, ETags and sheet '
+                'fragments. Use a file, database or Redis cache (DND_STATE_CACHE_BACKEND).'
+            ),
+            id='base.W001',
+        )
+    ]
@@ -1,7 +1,8 @@
 # base/forms.py
 from django import forms
-from .models import Character, Skill, Subclass, CharacterClass, Spell, Feat
+from .models import LEVELS_PER_FEAT, Character, Skill, Subclass, CharacterClass, Spell, Feat
 from django.core.exceptions import ValidationError
+from .utils.rules_catalog import get_rules_catalog
 
 class CharacterForm(forms.ModelForm):
     skills = forms.ModelMultipleChoiceField(
@@ -52,8 +53,8 @@ class CharacterForm(forms.ModelForm):
         except (ValueError, TypeError):
             level = 1
 
-        # Logika: 1 feat co 4 levele
-        max_feats = level // 4
+        # Logika: 1 feat co LEVELS_PER_FEAT leveli
+        max_feats = level // LEVELS_PER_FEAT
         selected_count = len(feats) if feats else 0
 
         if selected_count > max_feats:
@@ -66,34 +67,26 @@ class CharacterForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        print("DEBUG: Initializing CharacterForm")
-        print("DEBUG: instance.pk =", self.instance.pk)
-        print("DEBUG: self.data =", self.data)
-
         # ----------------------
         # Subclasses
         # ----------------------
         if self.instance.pk and self.instance.character_class:
             # EDIT mode
-            print("DEBUG: EDIT → filter subclasses for", self.instance.character_class)
-            self.fields['subclass'].queryset = Subclass.objects.filter(
+            self.fields['subclass'].queryset = Subclass.objects.select_related('character_class').filter(
                 character_class=self.instance.character_class
             )
         elif 'character_class' in self.data:
             # POST mode (class selected)
             try:
                 class_id = int(self.data.get('character_class'))
-                print("DEBUG: POST → filter subclasses for class_id", class_id)
-                self.fields['subclass'].queryset = Subclass.objects.filter(
+                self.fields['subclass'].queryset = Subclass.objects.select_related('character_class').filter(
                     character_class_id=class_id
                 )
             except (ValueError, TypeError):
-                print("DEBUG: Invalid class_id", self.data.get('character_class'))
                 self.fields['subclass'].queryset = Subclass.objects.none()
         else:
             # CREATE GET → show all subclasses
-            print("DEBUG: CREATE GET → show all subclasses")
-            self.fields['subclass'].queryset = Subclass.objects.all()
+            self.fields['subclass'].queryset = Subclass.objects.select_related('character_class')
 
         # ----------------------
         # Skills
@@ -115,7 +108,6 @@ class CharacterForm(forms.ModelForm):
             char_class = CharacterClass.objects.first()
 
         if char_class:
-            print("DEBUG: Setting skills queryset for class", char_class)
             self.fields['skills'].queryset = Skill.objects.filter(
                 classskillchoice__character_class=char_class
             )
@@ -124,15 +116,61 @@ class CharacterForm(forms.ModelForm):
                     self.instance.characterskillproficiency_set.values_list('skill_id', flat=True)
                 )
         else:
-            print("DEBUG: No class found → skills queryset empty")
             self.fields['skills'].queryset = Skill.objects.none()
 
-        print("DEBUG: skills queryset =", list(self.fields['skills'].queryset))
+
+def spell_limit_errors(character, c_count, s_count):
+    """Error messages for a selection of cantrips/leveled spells that exceeds the character's limits."""
+    errors = []
+
+    # --- 1. VALIDATE CANTRIPS ---
+    max_cantrips = character.max_cantrips_known
+
+    if max_cantrips > 0 and c_count > max_cantrips:
+        errors.append(f"Too many Cantrips selected! You can have max {max_cantrips}, but you selected {c_count}.")
+
+    # --- 2. VALIDATE LEVELED SPELLS ---
+    max_spells, limit_type = character.max_spells_known
+
+    if max_spells > 0 and s_count > max_spells:
+        errors.append(
+            f"Too many Spells selected! As a lvl {character.level} {character.character_class.name}, "
+            f"you can have max {max_spells} Spells {limit_type}. You selected {s_count}."
+        )
+    return errors
+
+
+class EligibleSpellsField(forms.ModelMultipleChoiceField):
+    """Validates picks against the rules catalog's spell-eligibility index."""
+    eligible_ids = None
+
+    def _check_values(self, value):
+        if self.eligible_ids is None:
+            return super()._check_values(value)
+
+        spell_ids = set()
+        for pk in value:
+            try:
+                spell_ids.add(int(pk))
+            except (TypeError, ValueError):
+                raise ValidationError(
+                    self.error_messages['invalid_pk_value'], code='invalid_pk_value', params={'pk': pk}
+                )
+        for spell_id in spell_ids:
+            if spell_id not in self.eligible_ids:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'], code='invalid_choice', params={'value': spell_id}
+                )
+        return Spell.objects.filter(pk__in=spell_ids)
+
 
 class SpellSelectionForm(forms.ModelForm):
     class Meta:
         model = Character
         fields = ['spells']
+        field_classes = {
+            'spells': EligibleSpellsField,
+        }
         widgets = {
             'spells': forms.CheckboxSelectMultiple,
         }
@@ -141,18 +179,25 @@ class SpellSelectionForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         character = self.instance
 
-        # Filter the spells displayed in the form based on class and level
+        # Filter the spells displayed in the form based on class, subclass and level
         if character and character.pk:
-            char_class = character.character_class
-            char_level = character.level
-            
+            eligible_ids = get_rules_catalog().eligible_spell_ids(
+                character.character_class_id, character.subclass_id, character.level
+            )
+            self.fields['spells'].eligible_ids = eligible_ids
             self.fields['spells'].queryset = Spell.objects.filter(
-                classspell__character_class=char_class,
-                classspell__unlock_level__lte=char_level
-            ).order_by('level', 'name').distinct()
-            
+                pk__in=eligible_ids
+            ).order_by('level', 'name')
+
             self.fields['spells'].label = ""
 
+    @property
+    def selected_spell_ids(self):
+        """Ids to show as checked: the submitted picks, or the character's known spells."""
+        if self.is_bound:
+            return {int(pk) for pk in self.data.getlist(self.add_prefix('spells')) if pk.isdigit()}
+        return {spell.pk for spell in self.initial.get('spells', [])}
+
     def clean(self):
         cleaned_data = super().clean()
         spells = cleaned_data.get('spells')
@@ -162,28 +207,10 @@ class SpellSelectionForm(forms.ModelForm):
             return cleaned_data
 
         # Split selection into Cantrips and Spells
-        cantrips_selected = [s for s in spells if s.level == 0]
-        leveled_spells_selected = [s for s in spells if s.level > 0]
-        
-        c_count = len(cantrips_selected)
-        s_count = len(leveled_spells_selected)
-
-        # --- 1. VALIDATE CANTRIPS ---
-        # Call the model property instead of using a local table
-        max_cantrips = character.max_cantrips_known 
+        c_count = sum(1 for s in spells if s.level == 0)
+        s_count = len(spells) - c_count
 
-        if max_cantrips > 0 and c_count > max_cantrips:
-            self.add_error('spells', f"Too many Cantrips selected! You can have max {max_cantrips}, but you selected {c_count}.")
-
-        # --- 2. VALIDATE LEVELED SPELLS ---
-        # Call the model property instead of calculating it here
-        max_spells, limit_type = character.max_spells_known
-
-        if max_spells > 0 and s_count > max_spells:
-            self.add_error(
-                'spells', 
-                f"Too many Spells selected! As a lvl {character.level} {character.character_class.name}, "
-                f"you can have max {max_spells} Spells {limit_type}. You selected {s_count}."
-            )
+        for error in spell_limit_errors(character, c_count, s_count):
+            self.add_error('spells', error)
             
         return cleaned_data
\ No newline at end of file
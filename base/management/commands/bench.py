@@ -0,0 +1,89 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from base.utils.benchmark import SCENARIOS, benchmark_database, compare_results, run_benchmark
+from base.utils.synthetic_data import ensure_characters
+
+BENCH_DATABASE = Path(settings.BASE_DIR) / ".bench" / "bench.sqlite3"
+BENCH_PREFIX = "bench"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the character views against a synthetic dataset in a separate database "
+        "and print p50/p95/p99 latency and query counts as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--characters", type=int, default=1000, help="Size of the synthetic dataset.")
+        parser.add_argument("--users", type=int, default=10, help="Accounts the characters are spread over.")
+        parser.add_argument("--requests", type=int, default=50, help="Timed requests per view.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--views", nargs="+", choices=[s.name for s in SCENARIOS], help="Only these views.")
+        parser.add_argument("--database", type=Path, default=BENCH_DATABASE,
+                            help="SQLite file for the benchmark database.")
+        parser.add_argument("--keepdb", action="store_true",
+                            help="Keep the benchmark database and its dataset for the next run.")
+        parser.add_argument("-o", "--output", type=Path, help="Write the JSON result here instead of stdout.")
+        parser.add_argument("--baseline", type=Path, help="Compare with this saved result.")
+        parser.add_argument("--save-baseline", action="store_true", help="Write the result to --baseline.")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed p95 growth over the baseline before a view counts as regressed.")
+        parser.add_argument("--fail-on-regression", action="store_true",
+                            help="Exit with an error if any view regressed.")
+
+    def handle(self, *args, **options):
+        if options["save_baseline"] and not options["baseline"]:
+            raise CommandError("--save-baseline needs --baseline.")
+        if connection.vendor != "sqlite":
+            raise CommandError("bench runs on SQLite only.")
+
+        with benchmark_database(options["database"], options["keepdb"]):
+            result = self._run(options)
+
+        output = json.dumps(result, indent=2)
+        if options["output"]:
+            options["output"].write_text(output + "\n", encoding="utf-8")
+        else:
+            self.stdout.write(output)
+
+        if options["baseline"]:
+            self._compare(result, options)
+
+    def _run(self, options):
+        ensure_characters(options["characters"], options["users"], options["seed"], BENCH_PREFIX, self.stderr)
+        user = User.objects.get(username=f"{BENCH_PREFIX}-0")
+        return run_benchmark(
+            user, requests=options["requests"], seed=options["seed"], names=options["views"],
+            progress=lambda name, row: self.stderr.write(
+                f"{name:<20} p50 {row['p50_ms']:>8.1f} ms  p95 {row['p95_ms']:>8.1f} ms  "
+                f"{row['queries']:>3} queries" + (f"  {row['errors']} errors" if row["errors"] else "")
+            ),
+        )
+
+    def _compare(self, result, options):
+        path = options["baseline"]
+        if options["save_baseline"]:
+            path.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+            self.stderr.write(f"Saved baseline to {path}.")
+            return
+        if not path.exists():
+            raise CommandError(f"No baseline at {path}; create one with --save-baseline.")
+
+        rows = compare_results(result, json.loads(path.read_text(encoding="utf-8")), options["tolerance"])
+        self.stderr.write(f"\n{'view':<20}{'p95 ms':>10}{'baseline':>10}{'change':>9}{'queries':>10}")
+        for row in rows:
+            line = (
+                f"{row['view']:<20}{row['p95_ms']:>10.1f}{row['baseline_p95_ms']:>10.1f}{row['change']:>+9.0%}"
+                f"{row['queries']:>5} ({row['baseline_queries']})"
+            )
+            self.stderr.write(self.style.ERROR(line) if row["regressed"] else line)
+
+        regressed = [row["view"] for row in rows if row["regressed"]]
+        if regressed and options["fail_on_regression"]:
+            raise CommandError(f"Regressed: {', '.join(regressed)}")
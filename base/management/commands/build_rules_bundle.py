@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from base.utils.rules_bundle import write_bundle
+
+
+class Command(BaseCommand):
+    help = "Build the content-hashed rules bundle used by the character form"
+
+    def handle(self, *args, **options):
+        path = write_bundle()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path} ({path.stat().st_size} bytes)."))
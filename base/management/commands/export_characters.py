@@ -0,0 +1,44 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from base.models import Character
+from base.utils.character_export import CHARACTER_EXPORT_CHUNK_SIZE, EXPORT_WRITERS
+
+
+class Command(BaseCommand):
+    help = "Stream characters as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(EXPORT_WRITERS), default="ndjson")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout).")
+        parser.add_argument("--user", help="Only export characters of this username.")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHARACTER_EXPORT_CHUNK_SIZE,
+            help="Characters loaded (and prefetched) per query.",
+        )
+
+    def handle(self, *args, **options):
+        characters = Character.objects.all()
+        if options["user"]:
+            characters = characters.filter(user__username=options["user"])
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        started = time.perf_counter()
+        rows = 0
+        out = open(options["output"], "w", encoding="utf-8", newline="") if options["output"] else sys.stdout
+        try:
+            for chunk in EXPORT_WRITERS[options["format"]](characters, options["chunk_size"]):
+                out.write(chunk)
+                rows += 1
+        finally:
+            if options["output"]:
+                out.close()
+
+        if options["format"] == "csv":
+            rows -= 1  # header
+        self.stderr.write(f"Exported {rows} characters in {time.perf_counter() - started:.2f} s.")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from base.utils.fragment_cache import fragment_stats, reset_fragment_stats
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters of the character sheet fragment cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing them.")
+
+    def handle(self, *args, **options):
+        stats = fragment_stats()
+        self.stdout.write(f"{'section':<16}{'hits':>10}{'misses':>10}{'waits':>8}{'hit rate':>10}")
+        for section, counts in stats.items():
+            total = counts["hit"] + counts["miss"]
+            rate = f"{counts['hit'] / total:.1%}" if total else "-"
+            self.stdout.write(
+                f"{section:<16}{counts['hit']:>10}{counts['miss']:>10}{counts['wait']:>8}{rate:>10}"
+            )
+        if options["reset"]:
+            reset_fragment_stats()
+            self.stdout.write("Counters reset.")
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from base.utils.character_import import IMPORT_BATCH_SIZE, IMPORT_CHUNK_LINES, import_characters
+
+
+class Command(BaseCommand):
+    help = "Import characters from an NDJSON file written by export_characters"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, one character per line.")
+        parser.add_argument("--user", help="Give every character to this username instead of the one in the record.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Validation processes (default: one per CPU; 0 validates inline).",
+        )
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Characters created per transaction.")
+        parser.add_argument("--chunk-lines", type=int, default=IMPORT_CHUNK_LINES, help="Lines sent to a worker at a time.")
+
+    def handle(self, *args, **options):
+        owner = None
+        if options["user"]:
+            try:
+                owner = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']!r} does not exist")
+
+        try:
+            with open(options["path"], encoding="utf-8") as lines:
+                report = import_characters(
+                    lines,
+                    owner=owner,
+                    workers=options["workers"],
+                    batch_size=options["batch_size"],
+                    chunk_lines=options["chunk_lines"],
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for line_no, message in sorted(report.errors.items()):
+            self.stderr.write(f"line {line_no}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(report.created)} characters ({len(report.errors)} rejected) in "
+            f"{report.elapsed:.2f} s ({report.per_second:.0f} characters/s)."
+        ))
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from base.utils.character_bulk import BULK_BATCH_SIZE
+from base.utils.pdf_import import import_sheets
+
+
+class Command(BaseCommand):
+    help = "Import characters from filled 5E fillable PDF sheets"
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Owner of the imported characters.")
+        parser.add_argument("paths", nargs="+", help="PDF files or directories containing them.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes reading PDFs (default: one per CPU; 0 reads inline).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BULK_BATCH_SIZE,
+            help="Characters created per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist")
+
+        files = []
+        for path in map(Path, options["paths"]):
+            if path.is_dir():
+                files += sorted(path.glob("*.pdf"))
+            elif path.exists():
+                files.append(path)
+            else:
+                raise CommandError(f"{path} does not exist")
+
+        report = import_sheets(
+            [(str(path), path) for path in files],
+            user,
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+        )
+
+        for name, messages in report.warnings.items():
+            for message in messages:
+                self.stdout.write(self.style.WARNING(f"{name}: {message}"))
+        for name, message in report.errors.items():
+            self.stderr.write(f"{name}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(report.created)} of {len(files)} sheets in {report.elapsed:.2f} s "
+            f"({report.per_second:.1f} sheets/s)."
+        ))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from base.utils.rules_data_loader import load_rules_data
+
+
+class Command(BaseCommand):
+    help = "Load spells, class features and feats from the JSON files in base/data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Reload every file even if its content hash is unchanged.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        results = load_rules_data(force=options["force"])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        for name, count in results.items():
+            if count is None:
+                self.stdout.write(f"{name}: unchanged")
+            else:
+                self.stdout.write(f"{name}: {count} rows")
+        self.stdout.write(
+            self.style.SUCCESS(f"Rules data loaded in {elapsed_ms:.1f} ms.")
+        )
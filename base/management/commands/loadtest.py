@@ -0,0 +1,83 @@
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from base.utils.benchmark import benchmark_database
+from base.utils.loadtest import LoadConfig, run_load
+from base.utils.synthetic_data import ensure_characters
+
+LOADTEST_DATABASE = Path(settings.BASE_DIR) / ".bench" / "loadtest.sqlite3"
+LOADTEST_PREFIX = "loadtest"
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the WSGI application from a pool of concurrent players (no network) and report "
+        "throughput, latency percentiles, SQLite lock errors and write time per pool size"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                            help="Pool sizes to run, one after the other.")
+        parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds each player plays.")
+        parser.add_argument("--requests", type=int, help="Stop each player after this many requests.")
+        parser.add_argument("--characters", type=int, default=400, help="Size of the synthetic dataset.")
+        parser.add_argument("--users", type=int, default=8,
+                            help="Accounts the characters are spread over; players share them round-robin.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--database", type=Path, default=LOADTEST_DATABASE,
+                            help="SQLite file for the load test database.")
+        parser.add_argument("--keepdb", action="store_true",
+                            help="Keep the database and its dataset for the next run.")
+        parser.add_argument("-o", "--output", type=Path, help="Also write the results as JSON here.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("loadtest runs on SQLite only.")
+
+        # Lock errors are counted in the report rather than logged as tracebacks
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with benchmark_database(options["database"], options["keepdb"]):
+                result = self._run(options)
+        finally:
+            request_logger.setLevel(level)
+
+        if options["output"]:
+            options["output"].write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+
+    def _run(self, options):
+        ensure_characters(options["characters"], options["users"], options["seed"], LOADTEST_PREFIX, self.stderr)
+        usernames = tuple(
+            User.objects.filter(username__startswith=f"{LOADTEST_PREFIX}-", character__isnull=False)
+            .distinct().order_by("pk").values_list("username", flat=True)[:options["users"]]
+        )
+        if not usernames:
+            raise CommandError("No load test accounts with characters; run without --keepdb.")
+
+        config = LoadConfig(
+            usernames=usernames, password=LOADTEST_PREFIX, duration=options["duration"],
+            requests=options["requests"], seed=options["seed"],
+        )
+        self.stdout.write(
+            f"{'workers':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'errors':>8}{'locked':>8}{'write ms':>10}"
+        )
+        runs = []
+        for workers in options["workers"]:
+            run = run_load(workers, config, options["mode"])
+            runs.append(run)
+            line = (
+                f"{workers:>7}{run['throughput_rps']:>9.1f}{run['p50_ms']:>9.1f}{run['p95_ms']:>9.1f}"
+                f"{run['p99_ms']:>9.1f}{run['errors']:>8}{run['lock_errors']:>8}{run['write_time_ms']:>10.1f}"
+            )
+            self.stdout.write(self.style.ERROR(line) if run["lock_errors"] else line)
+        return {"mode": options["mode"], "characters": options["characters"], "runs": runs}
@@ -0,0 +1,92 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import get_runner
+
+from base.utils.microbench import (
+    CASES,
+    REPEAT,
+    build_fixtures,
+    confirm_regressions,
+    keep_best,
+    run_microbenchmarks,
+)
+
+BASELINE = Path(__file__).resolve().parents[2] / "benchmarks" / "microbench_baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the Character rules functions on in-memory fixtures (ns/op, bytes/op) "
+        "and fail if any regressed against the committed baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cases", nargs="+", choices=[case.name for case in CASES], help="Only these cases.")
+        parser.add_argument("--repeat", type=int, default=REPEAT, help="Timing repeats; the best one counts.")
+        parser.add_argument("--baseline", type=Path, default=BASELINE)
+        parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run.")
+        parser.add_argument("--threshold", type=float, default=0.5,
+                            help="Allowed growth over the baseline, as a fraction (default 0.5 = 50%%).")
+        parser.add_argument("--attempts", type=int, default=3,
+                            help="Extra runs of a regressed case (or of every case with --save-baseline) "
+                                 "before its best time counts.")
+        parser.add_argument("-o", "--output", type=Path, help="Also write the results as JSON here.")
+
+    def handle(self, *args, **options):
+        # Fixtures are read from a freshly set up test database, never the real one
+        runner = get_runner(settings)(verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            self._measure(options)
+        finally:
+            runner.teardown_databases(old_config)
+
+    def _measure(self, options):
+        fixtures = build_fixtures()
+        results = run_microbenchmarks(options["cases"], options["repeat"], self._report, fixtures)
+        if options["save_baseline"]:
+            # The baseline is the best of several runs, like the regression check below
+            for _ in range(options["attempts"]):
+                keep_best(results, run_microbenchmarks(options["cases"], options["repeat"], fixtures=fixtures))
+
+        document = {
+            "meta": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "machine": platform.machine(),
+            },
+            "cases": results,
+        }
+        if options["output"]:
+            options["output"].write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+        baseline_path = options["baseline"]
+        if options["save_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+            self.stdout.write(f"Saved baseline to {baseline_path}.")
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f"No baseline at {baseline_path}; create one with --save-baseline.")
+            return
+
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        regressions = confirm_regressions(
+            results, baseline["cases"], options["threshold"], options["attempts"], options["repeat"], fixtures,
+        )
+        if regressions:
+            for name, messages in regressions.items():
+                self.stderr.write(self.style.ERROR(f"{name}: {', '.join(messages)}"))
+            raise CommandError(f"{len(regressions)} microbenchmark(s) regressed past {options['threshold']:.0%}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path.name}."))
+
+    def _report(self, name, result):
+        self.stdout.write(
+            f"{name:<22}{result['ns_per_op']:>12,.1f} ns/op{result['alloc_bytes_per_op']:>10,} B/op"
+            f"{result['loops']:>12,} loops"
+        )
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from base.utils.profiling import read_profile_log, summarize_profile
+
+
+class Command(BaseCommand):
+    help = "Summarize the request profile log into the slowest endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", type=Path, default=settings.PROFILER_LOG,
+                            help="Profile log to read (rotated backups next to it are included).")
+        parser.add_argument("--limit", type=int, default=10, help="Number of endpoints to show.")
+        parser.add_argument("--sections", action="store_true",
+                            help="Also list the time spent in profiled sections per endpoint.")
+
+    def handle(self, *args, **options):
+        summary = summarize_profile(read_profile_log(options["log"]))
+        if not summary:
+            raise CommandError(f"No profile records in {options['log']} (run with DND_PROFILE=1).")
+
+        self.stdout.write(
+            f"{'endpoint':<44}{'reqs':>6}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}"
+            f"{'queries':>9}{'db ms':>9}{'tpl ms':>9}"
+        )
+        for row in summary[:options["limit"]]:
+            self.stdout.write(
+                f"{row['method'] + ' ' + row['endpoint']:<44}{row['requests']:>6}"
+                f"{row['mean_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['max_ms']:>10.1f}"
+                f"{row['queries']:>9.1f}{row['db_ms']:>9.1f}{row['template_ms']:>9.1f}"
+            )
+            if options["sections"]:
+                for name, ms in row["sections"].items():
+                    self.stdout.write(f"    {name:<40}{ms:>10.1f}")
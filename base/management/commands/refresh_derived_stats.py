@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from base.utils.derived_stats import refresh_derived_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute materialized derived stats (AC, speed, totals, skills, spell limits) for characters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "character_ids",
+            nargs="*",
+            type=int,
+            help="Only refresh these characters (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        count = refresh_derived_stats(options["character_ids"] or None)
+        self.stdout.write(
+            self.style.SUCCESS(f"Derived stats refreshed for {count} characters.")
+        )
@@ -0,0 +1,95 @@
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from base.utils.benchmark import benchmark_database
+from base.utils.loadtest import WRITE_MIX, LoadConfig, run_load, sqlite_profile
+from base.utils.synthetic_data import ensure_characters
+
+WRITE_BENCH_DATABASE = Path(settings.BASE_DIR) / ".bench" / "write_bench.sqlite3"
+WRITE_BENCH_PREFIX = "writer"
+PROFILES = (("stock", False), ("production", True))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare write throughput of concurrent character edits and spell saves under the stock "
+        "and the production SQLite profile (WAL, busy timeout, pragmas, persistent connections)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8],
+                            help="Pool sizes to run under each profile.")
+        parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds each player writes.")
+        parser.add_argument("--characters", type=int, default=200, help="Size of the synthetic dataset.")
+        parser.add_argument("--users", type=int, default=8)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--database", type=Path, default=WRITE_BENCH_DATABASE,
+                            help="SQLite file for the benchmark database.")
+        parser.add_argument("--keepdb", action="store_true",
+                            help="Keep the database and its dataset for the next run.")
+        parser.add_argument("-o", "--output", type=Path, help="Also write the results as JSON here.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("sqlite_write_bench runs on SQLite only.")
+
+        # Lock errors are counted in the report rather than logged as tracebacks
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with benchmark_database(options["database"], options["keepdb"]):
+                result = self._run(options)
+        finally:
+            request_logger.setLevel(level)
+
+        if options["output"]:
+            options["output"].write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+
+    def _run(self, options):
+        ensure_characters(
+            options["characters"], options["users"], options["seed"], WRITE_BENCH_PREFIX, self.stderr,
+        )
+        usernames = tuple(
+            User.objects.filter(username__startswith=f"{WRITE_BENCH_PREFIX}-", character__isnull=False)
+            .distinct().order_by("pk").values_list("username", flat=True)[:options["users"]]
+        )
+        if not usernames:
+            raise CommandError("No benchmark accounts with characters; run without --keepdb.")
+        config = LoadConfig(
+            usernames=usernames, password=WRITE_BENCH_PREFIX, duration=options["duration"],
+            seed=options["seed"], mix=WRITE_MIX,
+        )
+
+        self.stdout.write(
+            f"{'profile':<12}{'workers':>7}{'writes/s':>10}{'req/s':>9}{'p95 ms':>9}"
+            f"{'errors':>8}{'locked':>8}{'write ms':>10}"
+        )
+        result = {"mode": options["mode"], "profiles": {}}
+        for name, production in PROFILES:
+            runs = result["profiles"][name] = []
+            with sqlite_profile(production):
+                for workers in options["workers"]:
+                    run = run_load(workers, config, options["mode"])
+                    runs.append(run)
+                    line = (
+                        f"{name:<12}{workers:>7}{run['write_rps']:>10.1f}{run['throughput_rps']:>9.1f}"
+                        f"{run['p95_ms']:>9.1f}{run['errors']:>8}{run['lock_errors']:>8}"
+                        f"{run['write_time_ms']:>10.1f}"
+                    )
+                    self.stdout.write(self.style.ERROR(line) if run["lock_errors"] else line)
+
+        for stock, production in zip(result["profiles"]["stock"], result["profiles"]["production"]):
+            change = production["write_rps"] / stock["write_rps"] - 1 if stock["write_rps"] else 0.0
+            self.stdout.write(
+                f"{stock['workers']} workers: {stock['write_rps']:.1f} -> {production['write_rps']:.1f} "
+                f"writes/s ({change:+.0%})"
+            )
+        return result
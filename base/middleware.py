@@ -0,0 +1,69 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .utils.profiling import (
+    instrument_templates,
+    profile_record,
+    server_timing,
+    start_profile,
+    stop_profile,
+)
+
+profile_logger = logging.getLogger('base.profiler')
+
+
+def _configure_profile_log(path):
+    """Sends base.profiler records, one JSON object per line, to a rotating file."""
+    if any(getattr(handler, 'baseFilename', None) == str(path) for handler in profile_logger.handlers):
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(
+        path,
+        maxBytes=settings.PROFILER_LOG_MAX_BYTES,
+        backupCount=settings.PROFILER_LOG_BACKUPS,
+        encoding='utf-8',
+    )
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    profile_logger.addHandler(handler)
+    profile_logger.setLevel(logging.INFO)
+    profile_logger.propagate = False
+
+
+class ProfilerMiddleware:
+    """
+    Opt-in per-request profiler (settings.PROFILER_ENABLED). Adds a
+    Server-Timing header with query, template and @profiled section times,
+    and appends a JSON line per request to settings.PROFILER_LOG, which
+    `manage.py profile_report` summarizes.
+    """
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument_templates()
+        if settings.PROFILER_LOG:
+            _configure_profile_log(settings.PROFILER_LOG)
+
+    def __call__(self, request):
+        profile, token = start_profile()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.query_wrapper))
+                response = self.get_response(request)
+        finally:
+            stop_profile(token)
+        total = time.perf_counter() - started
+
+        response['Server-Timing'] = server_timing(profile, total)
+        if settings.PROFILER_LOG:
+            profile_logger.info(json.dumps(profile_record(request, response, profile, total)))
+        return response
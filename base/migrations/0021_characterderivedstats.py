@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0020_populate_ac_and_armor_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CharacterDerivedStats',
+            fields=[
+                ('character', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='derived_stats', serialize=False, to='base.character')),
+                ('armor_class', models.IntegerField()),
+                ('speed', models.IntegerField()),
+                ('total_strength', models.IntegerField()),
+                ('total_dexterity', models.IntegerField()),
+                ('total_constitution', models.IntegerField()),
+                ('total_intelligence', models.IntegerField()),
+                ('total_wisdom', models.IntegerField()),
+                ('total_charisma', models.IntegerField()),
+                ('proficiency_bonus', models.IntegerField()),
+                ('max_hit_points', models.IntegerField()),
+                ('skill_bonuses', models.JSONField(default=dict, help_text='Skill id -> total bonus')),
+                ('max_cantrips_known', models.IntegerField(default=0)),
+                ('max_spells_known', models.IntegerField(default=0)),
+                ('spell_limit_type', models.CharField(default='None', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['armor_class'], name='derived_armor_class_idx'), models.Index(fields=['max_hit_points'], name='derived_max_hp_idx')],
+            },
+        ),
+    ]
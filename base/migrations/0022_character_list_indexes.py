@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:04
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0021_characterderivedstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['user', 'created_at'], name='character_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(models.F('user'), django.db.models.functions.text.Lower('character_name'), name='character_user_name_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+# External-content FTS5 index over base_spell, kept in sync by triggers.
+# NOTE: SQLite rebuilds a table when a migration alters it, which drops these
+# triggers; a migration altering Spell must re-run CREATE_SQL[1:].
+FTS_COLUMNS = 'name, "desc", higher_level, school, components'
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE base_spell_fts USING fts5(
+        {FTS_COLUMNS},
+        content='base_spell',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER base_spell_fts_ai AFTER INSERT ON base_spell BEGIN
+        INSERT INTO base_spell_fts(rowid, {FTS_COLUMNS})
+        VALUES (new.id, new.name, new."desc", new.higher_level, new.school, new.components);
+    END
+    """,
+    f"""
+    CREATE TRIGGER base_spell_fts_ad AFTER DELETE ON base_spell BEGIN
+        INSERT INTO base_spell_fts(base_spell_fts, rowid, {FTS_COLUMNS})
+        VALUES ('delete', old.id, old.name, old."desc", old.higher_level, old.school, old.components);
+    END
+    """,
+    f"""
+    CREATE TRIGGER base_spell_fts_au AFTER UPDATE ON base_spell BEGIN
+        INSERT INTO base_spell_fts(base_spell_fts, rowid, {FTS_COLUMNS})
+        VALUES ('delete', old.id, old.name, old."desc", old.higher_level, old.school, old.components);
+        INSERT INTO base_spell_fts(rowid, {FTS_COLUMNS})
+        VALUES (new.id, new.name, new."desc", new.higher_level, new.school, new.components);
+    END
+    """,
+    "INSERT INTO base_spell_fts(base_spell_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS base_spell_fts_ai",
+    "DROP TRIGGER IF EXISTS base_spell_fts_ad",
+    "DROP TRIGGER IF EXISTS base_spell_fts_au",
+    "DROP TABLE IF EXISTS base_spell_fts",
+]
+
+
+def create_spell_fts(apps, schema_editor):
+    # FTS5 is SQLite only; other backends fall back to LIKE search at runtime
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_spell_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0022_character_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_spell_fts, drop_spell_fts),
+    ]
@@ -2,7 +2,11 @@ from django.db import models # type: ignore
 from django.contrib.auth.models import User # type: ignore
 from django.core.validators import MinValueValidator, MaxValueValidator # type: ignore
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import F
+from django.db.models.functions import Lower
+
+from base.utils.profiling import profiled
+from base.utils.rules_catalog import get_rules_catalog
 
 class Background(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -130,6 +134,23 @@ CANTRIPS_KNOWN_TABLE = {
     'Wizard': {1: 3, 4: 4, 10: 5},
 }
 
+HIT_DICE_TABLE = {
+    'Barbarian': 12, 'Bard': 8, 'Cleric': 8, 'Druid': 8, 'Fighter': 10,
+    'Monk': 8, 'Paladin': 10, 'Ranger': 10, 'Rogue': 8, 'Sorcerer': 6,
+    'Warlock': 8, 'Wizard': 6,
+}
+DEFAULT_HIT_DIE = 8
+
+# --- Point Buy ---
+# Scores 8-13 cost 1 point per increase, 14-15 cost 2 points per increase.
+POINT_BUY_COSTS = {8: 0, 9: 1, 10: 2, 11: 3, 12: 4, 13: 5, 14: 7, 15: 9}
+POINT_BUY_BUDGET = 27
+POINT_BUY_MIN = min(POINT_BUY_COSTS)
+POINT_BUY_MAX = max(POINT_BUY_COSTS)
+
+# One feat every this many levels
+LEVELS_PER_FEAT = 4
+
 class Character(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     character_name = models.CharField(max_length=100)
@@ -186,6 +207,8 @@ class Character(models.Model):
     spells = models.ManyToManyField(Spell, blank=True, related_name='learned_by_characters')
     feats = models.ManyToManyField(Feat, blank=True, related_name='characters')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every change to the character or its rows (see base/signals.py)
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     @property
     def total_strength(self):
@@ -211,46 +234,69 @@ class Character(models.Model):
     def total_charisma(self):
         return self.charisma + self.get_racial_bonus('charisma')
 
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None
+    def apply_calculated_fields(self):
+        """Fills the stored fields derived from class and abilities (also used by bulk creation)."""
         self.initiative = self.calculate_initiative
         self.hit_dice = self.calculate_hit_dice
 
+        if not self.hit_points: 
+            self.hit_points = self.calculate_hit_points
+            
+        if self.temporary_hit_points is None: self.temporary_hit_points = 0
+        if self.death_saves_success is None: self.death_saves_success = 0
+        if self.death_saves_failure is None: self.death_saves_failure = 0
+
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
 
         if not is_new:
             try:
-                old_instance = Character.objects.get(pk=self.pk)
-                if old_instance.character_class != self.character_class:
+                old_instance = Character.objects.only('character_class_id').get(pk=self.pk)
+                if old_instance.character_class_id != self.character_class_id:
                     self.spells.clear()
             except Character.DoesNotExist:
                 pass
 
-        if not self.hit_points: 
-            self.hit_points = self.calculate_hit_points
-            
-        if self.temporary_hit_points is None: self.temporary_hit_points = 0
-        if self.death_saves_success is None: self.death_saves_success = 0
-        if self.death_saves_failure is None: self.death_saves_failure = 0
+        self.apply_calculated_fields()
+
+        if not is_new:
+            self.version = models.F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
 
         super().save(*args, **kwargs)
+
+        if not is_new:
+            self.refresh_from_db(fields=['version'])
         
         if is_new:
+            inventory = []
             if self.character_class:
                 equipment_qs = StartingEquipment.objects.filter(character_class=self.character_class)
-                for eq in equipment_qs:
-                    InventoryItem.objects.create(character=self, item=eq.item, quantity=eq.quantity)
+                inventory += [
+                    InventoryItem(character=self, item_id=eq.item_id, quantity=eq.quantity)
+                    for eq in equipment_qs
+                ]
     
             if self.background:
                 bg_equipment = BackgroundStartingEquipment.objects.filter(background=self.background)
-                for eq in bg_equipment:
-                    InventoryItem.objects.create(character=self, item=eq.item, quantity=eq.quantity)
+                inventory += [
+                    InventoryItem(character=self, item_id=eq.item_id, quantity=eq.quantity)
+                    for eq in bg_equipment
+                ]
+
+            InventoryItem.objects.bulk_create(inventory)
+
+        # Inventory above is written without signals, so refresh explicitly
+        from base.utils.derived_stats import refresh_derived_stats
+        refresh_derived_stats([self.pk])
     
     def get_racial_bonus(self, ability_name: str) -> int:
         """Returns the racial modifier for a given ability score."""
-        if not self.race:
+        if not self.race_id:
             return 0
-        modifier_obj = self.race.modifiers.filter(ability=ability_name.lower()).first()
-        return modifier_obj.modifier if modifier_obj else 0
+        modifiers = get_rules_catalog().race_modifiers.get(self.race_id, {})
+        return modifiers.get(ability_name.lower(), 0)
     
     def clean(self):
         """
@@ -261,16 +307,6 @@ class Character(models.Model):
         self.validate_point_buy()
 
     def validate_point_buy(self):
-        # Point Buy Cost Table (Score: Cost)
-        # Scores 8-13 cost 1 point per increase.
-        # Scores 14-15 cost 2 points per increase.
-        POINT_COSTS = {
-            8: 0, 9: 1, 10: 2, 11: 3, 
-            12: 4, 13: 5, 14: 7, 15: 9
-        }
-        
-        MAX_POINTS = 27 
-        
         abilities = ['strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma']
         total_spent = 0
         errors = {}
@@ -281,17 +317,19 @@ class Character(models.Model):
             if score is None:
                 continue
 
-            if score < 8 or score > 15:
-                errors[ability] = f"In Point Buy, base scores must be between 8 and 15. Value was {score}."
+            if score < POINT_BUY_MIN or score > POINT_BUY_MAX:
+                errors[ability] = (
+                    f"In Point Buy, base scores must be between {POINT_BUY_MIN} and {POINT_BUY_MAX}. Value was {score}."
+                )
             else:
-                total_spent += POINT_COSTS[score]
+                total_spent += POINT_BUY_COSTS[score]
 
         if errors:
             raise ValidationError(errors)
 
-        if total_spent > MAX_POINTS:
+        if total_spent > POINT_BUY_BUDGET:
             raise ValidationError(
-                f"Point Buy budget exceeded. You have spent {total_spent} points, but the limit is {MAX_POINTS}."
+                f"Point Buy budget exceeded. You have spent {total_spent} points, but the limit is {POINT_BUY_BUDGET}."
             )
     
     @property
@@ -301,18 +339,12 @@ class Character(models.Model):
     
     @property
     def calculate_hit_dice(self):
-        class_hit_dice = {
-            'Barbarian': 12, 'Bard': 8, 'Cleric': 8, 'Druid': 8, 'Fighter': 10,
-            'Monk': 8, 'Paladin': 10, 'Ranger': 10, 'Rogue': 8, 'Sorcerer': 6,
-            'Warlock': 8, 'Wizard': 6,
-        }
-        if self.character_class and self.character_class.name in class_hit_dice:
-            return class_hit_dice[self.character_class.name]
-        return 8
+        class_name = get_rules_catalog().class_name(self.character_class_id)
+        return HIT_DICE_TABLE.get(class_name, DEFAULT_HIT_DIE)
     
     @property
     def max_feats_known(self):
-        return self.level // 4
+        return self.level // LEVELS_PER_FEAT
     
     @property
     def calculate_hit_points(self):
@@ -321,6 +353,7 @@ class Character(models.Model):
         return hit_die + con_mod + ( (self.level - 1) * ( (hit_die // 2) + 1 + con_mod ) )
     
     @property
+    @profiled('armor_class')
     def armor_class(self):
         """
         Best AC from:
@@ -328,6 +361,24 @@ class Character(models.Model):
         - Class/Subclass formulas (no shield)
         - Flat bonuses
         """
+        inventory = self.inventory.select_related("item__armor", "item__shield")
+        formulas, bonuses = self.get_armor_class_rules()
+        return self.best_armor_class(inventory, formulas, bonuses)
+
+    def get_armor_class_rules(self):
+        """Returns the (formulas, bonuses) AC rows unlocked for the character's class and level."""
+        return get_rules_catalog().ac_rules(
+            self.character_class_id, self.subclass_id, self.level
+        )
+
+    def best_armor_class(self, inventory, formulas, bonuses):
+        """
+        Computes the best AC from already loaded rows.
+
+        `inventory` are InventoryItem rows with item/armor/shield loaded,
+        `formulas` and `bonuses` are the ArmorClassFormula/ArmorClassBonus rows
+        of the character's class unlocked at its level.
+        """
 
         dex_mod = self.get_ability_modifier("dexterity")
         wis_mod = self.get_ability_modifier("wisdom")
@@ -345,7 +396,7 @@ class Character(models.Model):
         # 2) Detect shield
         # -----------------------------
         shield_bonus = 0
-        for inv in self.inventory.select_related("item__shield"):
+        for inv in inventory:
             shield = getattr(inv.item, "shield", None)
             if shield:
                 shield_bonus = max(shield_bonus, shield.ac_bonus)
@@ -353,7 +404,7 @@ class Character(models.Model):
         # -----------------------------
         # 3) Armor AC (shield allowed)
         # -----------------------------
-        for inv in self.inventory.select_related("item__armor"):
+        for inv in inventory:
             armor = getattr(inv.item, "armor", None)
             if not armor:
                 continue
@@ -372,44 +423,32 @@ class Character(models.Model):
         # -----------------------------
         # 4) Class / Subclass formulas
         # -----------------------------
-        if self.character_class:
-            formulas = ArmorClassFormula.objects.filter(
-                character_class=self.character_class,
-                min_level__lte=self.level
-            )
-
-            for f in formulas:
-                # Skip subclass-specific rows that don't match
-                if f.subclass and f.subclass != self.subclass:
-                    continue
+        for f in formulas:
+            # Skip subclass-specific rows that don't match
+            if f.subclass_id and f.subclass_id != self.subclass_id:
+                continue
 
-                ac = f.base
-                if f.use_dex:
-                    ac += dex_mod
-                if f.use_wis:
-                    ac += wis_mod
-                if f.use_con:
-                    ac += con_mod
-                if f.use_int:
-                    ac += int_mod
+            ac = f.base
+            if f.use_dex:
+                ac += dex_mod
+            if f.use_wis:
+                ac += wis_mod
+            if f.use_con:
+                ac += con_mod
+            if f.use_int:
+                ac += int_mod
 
-                possible_acs.append((ac, None))
+            possible_acs.append((ac, None))
 
         # -----------------------------
         # 5) Flat bonuses
         # -----------------------------
         flat_bonus = 0
 
-        if self.character_class:
-            bonuses = ArmorClassBonus.objects.filter(
-                character_class=self.character_class,
-                min_level__lte=self.level
-            )
-
-            for b in bonuses:
-                if b.subclass and b.subclass != self.subclass:
-                    continue
-                flat_bonus += b.flat_bonus
+        for b in bonuses:
+            if b.subclass_id and b.subclass_id != self.subclass_id:
+                continue
+            flat_bonus += b.flat_bonus
 
         possible_acs = [(ac + flat_bonus, src) for ac, src in possible_acs]
 
@@ -429,12 +468,27 @@ class Character(models.Model):
         score = getattr(self, f"total_{ability_name}")
         return (score - 10) // 2
 
-    def get_skill_bonus(self, skill: Skill) -> int:
+    @profiled('skill_bonus')
+    def get_skill_bonus(self, skill: Skill, proficient_ids=None) -> int:
+        if proficient_ids is None:
+            proficient_ids = self.get_skill_proficiency_ids()
         bonus = self.get_ability_modifier(skill.ability)
-        if skill in self.get_skill_proficiencies():
+        if skill.pk in proficient_ids:
             bonus += self.proficiency_bonus
         return bonus
 
+    def get_skill_proficiency_ids(self) -> set:
+        """
+        Ids of skills the character is proficient in (background + class choices).
+        Reads the relations through .all() so prefetched rows are reused.
+        """
+        skill_ids = {p.skill_id for p in self.characterskillproficiency_set.all()}
+        if self.background:
+            skill_ids.update(
+                p.skill_id for p in self.background.backgroundskillproficiency_set.all()
+            )
+        return skill_ids
+
     def get_skill_proficiencies(self):
         skills = Skill.objects.none()
         if self.background:
@@ -449,16 +503,10 @@ class Character(models.Model):
         return Skill.objects.filter(backgroundskillproficiency__background=self.background)
     
     def get_class_features(self):
-        if not self.character_class:
-            return ClassFeature.objects.none()
-
-        return ClassFeature.objects.filter(
-            character_class=self.character_class,
-            unlock_level__lte=self.level
-        ).filter(
-            Q(subclass__isnull=True) |
-            Q(subclass=self.subclass)
-        ).order_by('unlock_level')
+        """Base class and subclass features unlocked at the character's level."""
+        return get_rules_catalog().features_for(
+            self.character_class_id, self.subclass_id, self.level
+        )
     
     @property
     def speed(self):
@@ -481,10 +529,10 @@ class Character(models.Model):
     @property
     def max_cantrips_known(self):
         """Returns the maximum number of cantrips a character can know."""
-        if not self.character_class:
+        if not self.character_class_id:
             return 0
         
-        char_class = self.character_class.name
+        char_class = get_rules_catalog().class_name(self.character_class_id)
         if char_class in CANTRIPS_KNOWN_TABLE:
             table = CANTRIPS_KNOWN_TABLE[char_class]
             # Find the highest level threshold met
@@ -501,10 +549,10 @@ class Character(models.Model):
         Returns the maximum number of leveled spells (1+) a character can know or prepare.
         Returns a tuple: (limit, limit_type) where limit_type is "Known" or "Prepared".
         """
-        if not self.character_class:
+        if not self.character_class_id:
             return 0, "None"
 
-        char_class = self.character_class.name
+        char_class = get_rules_catalog().class_name(self.character_class_id)
         
         # A) Prepared Casters (Level + Ability Mod)
         if char_class in ['Cleric', 'Druid', 'Wizard']:
@@ -562,6 +610,14 @@ class Character(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset pagination of a user's characters
+            models.Index(fields=['user', 'created_at'], name='character_user_created_idx'),
+            # ?sort=hp pages of a user's characters, read in index order
+            models.Index(fields=['user', '-hit_points', 'created_at'], name='character_user_hp_idx'),
+            # Case-insensitive prefix search on the character list
+            models.Index(F('user'), Lower('character_name'), name='character_user_name_lower_idx'),
+        ]
         constraints = [
             models.CheckConstraint(condition=models.Q(level__gte=1) & models.Q(level__lte=20), name='level_range'),
             models.CheckConstraint(condition=models.Q(experience_points__gte=0), name='experience_points_minimum'),
@@ -689,6 +745,17 @@ class ClassSpell(models.Model):
             return f"{self.character_class}/{self.subclass} → {self.spell} (lvl {self.unlock_level})"
         return f"{self.character_class} → {self.spell} (lvl {self.unlock_level})"
 
+
+class RulesDataFile(models.Model):
+    """Content hash of a rules data file, as last loaded by load_rules_data."""
+    name = models.CharField(max_length=100, unique=True)
+    sha256 = models.CharField(max_length=64)
+    loaded_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Item(models.Model):
     name = models.CharField(max_length=100)
     weight = models.DecimalField(max_digits=5, decimal_places=2, default=0.0)
@@ -697,6 +764,42 @@ class Item(models.Model):
     def __str__(self):
         return self.name
 
+class CharacterDerivedStats(models.Model):
+    """
+    Materialized derived values of a character, kept up to date at write time
+    (see base/utils/derived_stats.py) so list pages can sort and filter on them.
+    """
+    character = models.OneToOneField(
+        Character,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='derived_stats'
+    )
+    armor_class = models.IntegerField()
+    speed = models.IntegerField()
+    total_strength = models.IntegerField()
+    total_dexterity = models.IntegerField()
+    total_constitution = models.IntegerField()
+    total_intelligence = models.IntegerField()
+    total_wisdom = models.IntegerField()
+    total_charisma = models.IntegerField()
+    proficiency_bonus = models.IntegerField()
+    max_hit_points = models.IntegerField()
+    skill_bonuses = models.JSONField(default=dict, help_text="Skill id -> total bonus")
+    max_cantrips_known = models.IntegerField(default=0)
+    max_spells_known = models.IntegerField(default=0)
+    spell_limit_type = models.CharField(max_length=10, default="None")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['armor_class'], name='derived_armor_class_idx'),
+            models.Index(fields=['max_hit_points'], name='derived_max_hp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.character}: AC {self.armor_class}, HP {self.max_hit_points}"
+
 class InventoryItem(models.Model):
     character = models.ForeignKey(Character, on_delete=models.CASCADE, related_name='inventory')
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
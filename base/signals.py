@@ -0,0 +1,254 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from .models import (
+    Armor,
+    ArmorClassBonus,
+    ArmorClassFormula,
+    Background,
+    BackgroundSkillProficiency,
+    BackgroundStartingEquipment,
+    BackgroundToolProficiency,
+    Character,
+    CharacterClass,
+    CharacterSkillProficiency,
+    ClassFeature,
+    ClassSkillChoice,
+    ClassSpell,
+    Feat,
+    InventoryItem,
+    Item,
+    Language,
+    Race,
+    RaceModifier,
+    Shield,
+    Skill,
+    Spell,
+    Subclass,
+    Tool,
+)
+from .utils.derived_stats import schedule_refresh, schedule_refresh_for
+from .utils.rules_catalog import bump_rules_version
+
+logger = logging.getLogger(__name__)
+
+# Models cached by the RulesCatalog; editing any of them invalidates it.
+RULES_MODELS = (
+    CharacterClass,
+    Subclass,
+    Race,
+    RaceModifier,
+    Skill,
+    ClassSkillChoice,
+    ArmorClassFormula,
+    ArmorClassBonus,
+    ClassFeature,
+    ClassSpell,
+    Feat,
+)
+
+
+def rules_changed(sender, **kwargs):
+    bump_rules_version()
+
+
+# Not cached by the catalog but shown on rendered sheets; bumping the rules
+# version also moves sheet fragment caches and sheet ETags to new keys.
+SHEET_REFERENCE_MODELS = (
+    Background,
+    BackgroundStartingEquipment,
+    BackgroundToolProficiency,
+    Item,
+    Language,
+    Spell,
+    Tool,
+)
+
+for model in RULES_MODELS + SHEET_REFERENCE_MODELS:
+    post_save.connect(rules_changed, sender=model, dispatch_uid=f'rules_changed_save_{model.__name__}')
+    post_delete.connect(rules_changed, sender=model, dispatch_uid=f'rules_changed_delete_{model.__name__}')
+
+
+def rules_migrated(sender, **kwargs):
+    # Data migrations use historical models, which do not send the signals above
+    bump_rules_version()
+
+
+_muted = threading.local()
+
+
+@contextmanager
+def character_row_signals_muted():
+    """
+    Skips the per-row derived stats and version handlers of inventory and
+    skill proficiency rows for this thread; the caller refreshes the stats
+    and bumps the version once itself.
+    """
+    previous = getattr(_muted, 'active', False)
+    _muted.active = True
+    try:
+        yield
+    finally:
+        _muted.active = previous
+
+
+def _character_rows_muted():
+    return getattr(_muted, 'active', False)
+
+
+# --- Derived stats maintenance ---
+
+def character_rows_changed(sender, instance, **kwargs):
+    if _character_rows_muted():
+        return
+    schedule_refresh([instance.character_id])
+
+
+def race_rules_changed(sender, instance, **kwargs):
+    race_id = instance.pk if sender is Race else instance.race_id
+    schedule_refresh_for(Character.objects.filter(race_id=race_id))
+
+
+def ac_rule_characters(rule):
+    """Characters an AC formula or bonus row applies to, or None for nobody."""
+    # RulesCatalog.ac_rules only looks rows up by class, so classless rows never apply
+    if not rule.character_class_id:
+        return None
+    characters = Character.objects.filter(character_class_id=rule.character_class_id, level__gte=rule.min_level)
+    if rule.subclass_id:
+        characters = characters.filter(subclass_id=rule.subclass_id)
+    return characters
+
+
+def ac_rules_changing(sender, instance, **kwargs):
+    # The row may move to another class; refresh whoever it applied to before
+    previous = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    characters = ac_rule_characters(previous) if previous else None
+    if characters is not None:
+        schedule_refresh_for(characters)
+
+
+def ac_rules_changed(sender, instance, **kwargs):
+    characters = ac_rule_characters(instance)
+    if characters is not None:
+        schedule_refresh_for(characters)
+
+
+def gear_changed(sender, instance, **kwargs):
+    schedule_refresh_for(Character.objects.filter(inventory__item_id=instance.item_id))
+
+
+def background_skills_changed(sender, instance, **kwargs):
+    schedule_refresh_for(Character.objects.filter(background_id=instance.background_id))
+
+
+def skill_changing(sender, instance, **kwargs):
+    # Readers fall back to live bonuses for skills missing from skill_bonuses,
+    # so new, renamed or deleted skills need no refresh. An ability change
+    # moves every character's bonus for the skill; that full refresh is left
+    # to the refresh_derived_stats command instead of running on commit.
+    if not instance.pk:
+        return
+    previous = Skill.objects.filter(pk=instance.pk).values_list('ability', flat=True).first()
+    if previous is not None and previous != instance.ability:
+        transaction.on_commit(lambda: logger.warning(
+            'Skill %s now uses %s; run "manage.py refresh_derived_stats" to update stored skill bonuses.',
+            instance.name, instance.ability,
+        ))
+
+
+DERIVED_STATS_HANDLERS = (
+    (InventoryItem, character_rows_changed),
+    (CharacterSkillProficiency, character_rows_changed),
+    (Race, race_rules_changed),
+    (RaceModifier, race_rules_changed),
+    (ArmorClassFormula, ac_rules_changed),
+    (ArmorClassBonus, ac_rules_changed),
+    (Armor, gear_changed),
+    (Shield, gear_changed),
+    (BackgroundSkillProficiency, background_skills_changed),
+)
+
+for model, handler in DERIVED_STATS_HANDLERS:
+    post_save.connect(handler, sender=model, dispatch_uid=f'derived_stats_save_{model.__name__}')
+    post_delete.connect(handler, sender=model, dispatch_uid=f'derived_stats_delete_{model.__name__}')
+
+for model in (ArmorClassFormula, ArmorClassBonus):
+    pre_save.connect(ac_rules_changing, sender=model, dispatch_uid=f'derived_stats_pre_save_{model.__name__}')
+pre_save.connect(skill_changing, sender=Skill, dispatch_uid='derived_stats_pre_save_Skill')
+
+
+# --- Character versions (ETags of the sheet API) ---
+# Rules edits are not listed: the rules version is part of every ETag.
+
+def bump_versions(characters):
+    """Bumps the version of every character in a Character queryset."""
+    characters.update(version=F('version') + 1)
+
+
+def character_row_versioned(sender, instance, **kwargs):
+    if _character_rows_muted():
+        return
+    bump_versions(Character.objects.filter(pk=instance.character_id))
+
+
+def gear_versioned(sender, instance, **kwargs):
+    bump_versions(Character.objects.filter(inventory__item_id=instance.item_id))
+
+
+def background_skills_versioned(sender, instance, **kwargs):
+    bump_versions(Character.objects.filter(background_id=instance.background_id))
+
+
+def character_m2m_versioned(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Reverse clears send no pk_set; remember who is about to lose the row
+        instance._versioned_character_ids = list(
+            sender.objects.filter(**{f'{instance._meta.model_name}_id': instance.pk})
+            .values_list('character_id', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_versions(Character.objects.filter(pk=instance.pk))
+    else:
+        character_ids = pk_set if action != 'post_clear' else instance.__dict__.pop('_versioned_character_ids', ())
+        if character_ids:
+            bump_versions(Character.objects.filter(pk__in=character_ids))
+
+
+VERSION_HANDLERS = (
+    (InventoryItem, character_row_versioned),
+    (CharacterSkillProficiency, character_row_versioned),
+    (Armor, gear_versioned),
+    (Shield, gear_versioned),
+    (BackgroundSkillProficiency, background_skills_versioned),
+)
+
+for model, handler in VERSION_HANDLERS:
+    post_save.connect(handler, sender=model, dispatch_uid=f'version_save_{model.__name__}')
+    post_delete.connect(handler, sender=model, dispatch_uid=f'version_delete_{model.__name__}')
+
+for through in (Character.languages.through, Character.spells.through, Character.feats.through):
+    m2m_changed.connect(character_m2m_versioned, sender=through, dispatch_uid=f'version_m2m_{through.__name__}')
+
+
+# --- SQLite connection settings ---
+
+def configure_sqlite(sender, connection, **kwargs):
+    # settings.SQLITE_PRAGMAS is empty unless the production profile is on
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+connection_created.connect(configure_sqlite, dispatch_uid='configure_sqlite')
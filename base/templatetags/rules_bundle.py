@@ -0,0 +1,20 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from base.utils.rules_bundle import BUNDLE_DIR, BUNDLE_STATIC_DIR, current_bundle
+
+register = template.Library()
+
+
+@register.simple_tag
+def rules_bundle_script():
+    """
+    <script> loading the hashed rules bundle built by build_rules_bundle, or
+    the bundle inlined if that build does not match the current rules.
+    """
+    text, name = current_bundle()
+    if (BUNDLE_DIR / name).exists():
+        return format_html('<script src="{}"></script>', static(f"{BUNDLE_STATIC_DIR}/{name}"))
+    return mark_safe(f"<script>{text}</script>")
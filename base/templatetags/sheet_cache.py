@@ -0,0 +1,37 @@
+from django import template
+
+from base.utils.fragment_cache import render_fragment
+
+register = template.Library()
+
+
+class CachedSectionNode(template.Node):
+    def __init__(self, nodelist, section):
+        self.nodelist = nodelist
+        self.section = section
+
+    def render(self, context):
+        section = self.section.resolve(context)
+        fragments = context.get('fragments') or {}
+        if section in fragments:
+            return fragments[section]
+        key = (context.get('fragment_keys') or {}).get(section)
+        if key is None:
+            return self.nodelist.render(context)
+        return render_fragment(section, key, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def cached_section(parser, token):
+    """
+    {% cached_section "skills" %}...{% endcached_section %}
+
+    Uses the fragments and keys the view put in the context
+    (see base/utils/fragment_cache.py); renders uncached without them.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes one argument, the section name")
+    nodelist = parser.parse(('endcached_section',))
+    parser.delete_first_token()
+    return CachedSectionNode(nodelist, parser.compile_filter(bits[1]))
@@ -0,0 +1,128 @@
+"""
+Test runner that restores SQLite test databases from a cached template.
+
+Migrating from scratch replays every data migration (spells, equipment,
+backgrounds, class features, feats, AC tables) for each test run. The first
+run migrates as usual and saves the result as a template file keyed by a
+hash of all migration and rules data files; later runs copy that template
+into the test database with the SQLite backup API instead of migrating.
+Parallel workers are cloned from the restored database by Django as usual.
+
+Tests also get private in-memory caches instead of the file caches in
+settings.CACHES, so cache.clear() in a test never empties the developer's
+cache and nothing cached by a dev server leaks into test results.
+"""
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEMPLATE_DIR = Path(settings.BASE_DIR) / ".test_db_cache"
+TEST_CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"test-{alias}"}
+    for alias in settings.CACHES
+}
+
+
+def template_key():
+    """Hash of everything that shapes the migrated database."""
+    digest = hashlib.sha256(django.__version__.encode())
+    files = []
+    for app_config in apps.get_app_configs():
+        for path in Path(app_config.path, "migrations").glob("*.py"):
+            files.append((f"{app_config.label}/migrations/{path.name}", path))
+    for path in Path(apps.get_app_config("base").path, "data").glob("*.json"):
+        files.append((f"base/data/{path.name}", path))
+
+    for name, path in sorted(files):
+        digest.update(name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class TemplateDatabaseTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # One test process is the only server process, so a per-process cache is fine here
+        self._test_settings = override_settings(
+            CACHES=TEST_CACHES,
+            SILENCED_SYSTEM_CHECKS=[*settings.SILENCED_SYSTEM_CHECKS, "base.W001"],
+        )
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        key = template_key()
+        patched = []
+        for alias in connections:
+            connection = connections[alias]
+            if connection.vendor == "sqlite" and not self.keepdb:
+                connection.creation.create_test_db = self._template_creator(connection, key)
+                patched.append(connection)
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            for connection in patched:
+                del connection.creation.create_test_db
+
+    @staticmethod
+    def _template_creator(connection, key):
+        creation = connection.creation
+        migrate_test_db = creation.create_test_db
+        template = TEMPLATE_DIR / f"{connection.alias}-{key}.sqlite3"
+
+        def create_test_db(verbosity=1, autoclobber=False, serialize=True, keepdb=False):
+            if not template.exists():
+                test_database_name = migrate_test_db(verbosity, autoclobber, serialize, keepdb)
+                _save_template(connection, template)
+                return test_database_name
+
+            test_database_name = creation._get_test_db_name()
+            if verbosity >= 1:
+                creation.log(
+                    "Restoring test database for alias %s from %s..."
+                    % (creation._get_database_display_str(verbosity, test_database_name), template.name)
+                )
+            creation._create_test_db(verbosity, autoclobber, keepdb)
+            connection.close()
+            settings.DATABASES[connection.alias]["NAME"] = test_database_name
+            connection.settings_dict["NAME"] = test_database_name
+            connection.ensure_connection()
+
+            source = sqlite3.connect(template)
+            try:
+                source.backup(connection.connection)
+            finally:
+                source.close()
+
+            if serialize:
+                connection._test_serialized_contents = creation.serialize_db_to_string()
+            return test_database_name
+
+        return create_test_db
+
+
+def _save_template(connection, template):
+    """Writes the migrated test database to `template`, replacing stale templates."""
+    template.parent.mkdir(parents=True, exist_ok=True)
+    for stale in template.parent.glob(f"{connection.alias}-*.sqlite3"):
+        stale.unlink(missing_ok=True)
+
+    partial = template.with_suffix(f".{os.getpid()}.tmp")
+    connection.ensure_connection()
+    target = sqlite3.connect(partial)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+    os.replace(partial, template)
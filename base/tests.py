@@ -1,7 +1,59 @@
-from django.test import TestCase # type: ignore
+import csv
+import io
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import zipfile
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.cache import cache # type: ignore
+from django.core.files.uploadedfile import SimpleUploadedFile # type: ignore
+from django.core.management import call_command # type: ignore
+from django.test import Client, TestCase, override_settings # type: ignore
+from pypdf import PdfReader
 from django.contrib.auth.models import User # type: ignore
 from django.urls import reverse # type: ignore
-from .models import Character
+from django.core.signals import request_finished, request_started # type: ignore
+from django.db.backends.signals import connection_created # type: ignore
+from django.db import OperationalError, close_old_connections, connection # type: ignore
+from django.test.utils import CaptureQueriesContext # type: ignore
+from .models import (
+    CANTRIPS_KNOWN_TABLE, AbilityScoreChoices, ArmorClassBonus, Background, Character, CharacterClass,
+    CharacterDerivedStats, CharacterSkillProficiency, ClassFeature, ClassSkillChoice, ClassSpell, Feat,
+    InventoryItem, Item, Language, POINT_BUY_BUDGET, Race, RaceModifier, Skill, Spell, Subclass,
+)
+from .checks import check_shared_cache
+from .forms import spell_limit_errors
+from .utils.batch_stats import compute_stats_for
+from .utils.benchmark import character_form_data, compare_results, run_benchmark
+from .utils.character_export import iter_ndjson
+from .utils.character_bulk import ImportReport, NameIndex, set_skill_proficiencies, write_records
+from .utils.character_import import import_characters
+from .utils.character_sheet import CharacterSheet
+from .management.commands.microbench import BASELINE as MICROBENCH_BASELINE
+from .utils.loadtest import LoadConfig, Player, run_player, summarize_load
+from .utils.microbench import CASES as MICRO_CASES, QueryInBenchmark, find_regressions, measure, run_microbenchmarks
+from .utils.keyset import encode_cursor
+from .views import prefix_range
+from .utils.fragment_cache import fragment_key, fragment_stats, render_fragment, reset_fragment_stats
+from .utils.pdf_export import export_queryset, get_form_template, render_character_pdf
+from .utils.pdf_fill import ZIP32_COUNT_LIMIT, ZIP32_LIMIT, ZipEntry, ZipStreamWriter, read_form_source
+from .utils.pdf_import import SheetImportError, sheet_to_record
+from .utils.rules_catalog import bump_rules_version, get_rules_catalog, get_rules_version
+from .middleware import profile_logger
+from .utils.profiling import current_profile, start_profile, stop_profile
+from .utils.rules_bundle import bundle_data, bundle_filename, current_bundle, render_bundle, write_bundle
+from .utils.rules_data_loader import RULES_DATA_LOADERS, get_data_dir, load_rules_data
+from .utils.spell_search import MAX_PAGE, search_spells
+from .utils.synthetic_data import generate_characters
+
+APP_DIR = str(Path(__file__).resolve().parent)
 
 
 class CharacterDeleteTests(TestCase):
@@ -36,3 +88,1384 @@ class CharacterDeleteTests(TestCase):
         self.assertRedirects(resp, reverse('characters'))
         self.assertFalse(Character.objects.filter(pk=self.character.pk).exists())
 
+
+
+class CharacterSheetQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sheetuser', password='pass')
+        self.client.force_login(self.user)
+        self.character = Character.objects.create(
+            user=self.user,
+            character_name='Sheet',
+            character_class=CharacterClass.objects.get(name='Fighter'),
+            race=Race.objects.first(),
+            background=Background.objects.first(),
+            level=5,
+            strength=15, dexterity=14, constitution=13,
+            intelligence=12, wisdom=10, charisma=8,
+            hit_points=0,
+            temporary_hit_points=0,
+        )
+
+    def _count_detail_queries(self):
+        url = reverse('character', args=[self.character.pk])
+        cache.clear()  # measure the uncached render, but with a loaded rules catalog
+        get_rules_catalog()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_detail_query_count_is_independent_of_related_rows(self):
+        baseline = self._count_detail_queries()
+
+        items = [Item.objects.create(name=f'Trinket {i}') for i in range(50)]
+        InventoryItem.objects.bulk_create(
+            InventoryItem(character=self.character, item=item) for item in items
+        )
+        for skill in Skill.objects.all()[:5]:
+            CharacterSkillProficiency.objects.create(character=self.character, skill=skill)
+        self.character.spells.set(Spell.objects.all()[:30])
+        self.character.feats.set(Feat.objects.all()[:3])
+
+        self.assertEqual(self._count_detail_queries(), baseline)
+
+    def test_sheet_matches_model_properties(self):
+        shield = Item.objects.get(name='Shield')
+        InventoryItem.objects.create(character=self.character, item=shield)
+        character = CharacterSheet.prefetch(Character.objects.all()).get(pk=self.character.pk)
+        sheet = CharacterSheet(character)
+
+        fresh = Character.objects.get(pk=self.character.pk)
+        self.assertEqual(sheet.armor_class, fresh.armor_class)
+        self.assertEqual(sheet.speed, fresh.speed)
+        self.assertEqual(sheet.ability_scores['strength'], fresh.total_strength)
+        for row in sheet.skills:
+            self.assertEqual(row['bonus'], fresh.get_skill_bonus(row['skill']))
+
+
+class RulesCatalogTests(TestCase):
+    def test_rules_properties_resolve_without_queries(self):
+        fighter = CharacterClass.objects.get(name='Fighter')
+        character = Character(character_class=fighter, race=Race.objects.first(), level=3,
+                              strength=15, dexterity=14, constitution=13,
+                              intelligence=12, wisdom=10, charisma=8)
+        get_rules_catalog()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(character.calculate_hit_dice, 10)
+            features = character.get_class_features()
+            character.total_strength
+
+        self.assertTrue(features)
+        self.assertTrue(all(f.unlock_level <= 3 for f in features))
+
+    def test_editing_rules_row_invalidates_catalog(self):
+        catalog = get_rules_catalog()
+        race = Race.objects.first()
+
+        RaceModifier.objects.create(race=race, ability='wisdom', modifier=3)
+
+        reloaded = get_rules_catalog()
+        self.assertNotEqual(catalog.version, reloaded.version)
+        self.assertIn(3, reloaded.race_modifiers[race.pk].values())
+
+    def test_per_process_state_cache_is_flagged(self):
+        locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/unused'}
+        for caches_setting, expected in (
+            ({'default': locmem, 'state': shared}, []),
+            ({'default': shared, 'state': locmem}, ['base.W001']),
+            ({'default': shared}, ['base.E001']),
+        ):
+            with self.subTest(caches=caches_setting), override_settings(CACHES=caches_setting):
+                self.assertEqual([message.id for message in check_shared_cache(None)], expected)
+
+
+class CharacterDerivedStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='derived', password='pass')
+        self.client.force_login(self.user)
+
+    def _create(self, name, dexterity):
+        return Character.objects.create(
+            user=self.user,
+            character_name=name,
+            character_class=CharacterClass.objects.get(name='Wizard'),
+            race=Race.objects.first(),
+            level=1,
+            strength=8, dexterity=dexterity, constitution=13,
+            intelligence=15, wisdom=10, charisma=8,
+            hit_points=0,
+            temporary_hit_points=0,
+        )
+
+    def test_stats_are_written_on_save_and_inventory_change(self):
+        character = self._create('Derived', dexterity=14)
+        stats = CharacterDerivedStats.objects.get(character=character)
+        self.assertEqual(stats.armor_class, character.armor_class)
+        self.assertEqual(stats.max_hit_points, character.calculate_hit_points)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryItem.objects.create(character=character, item=Item.objects.get(name='Shield'))
+
+        stats.refresh_from_db()
+        self.assertEqual(stats.armor_class, Character.objects.get(pk=character.pk).armor_class)
+
+    def test_list_sorts_and_filters_by_armor_class(self):
+        low = self._create('Clumsy', dexterity=8)
+        high = self._create('Nimble', dexterity=15)
+
+        resp = self.client.get(reverse('characters'), {'sort': 'ac'})
+        self.assertEqual(list(resp.context['characters']), [high, low])
+
+        resp = self.client.get(reverse('characters'), {'min_ac': high.derived_stats.armor_class})
+        self.assertEqual(list(resp.context['characters']), [high])
+
+    def test_rules_edits_refresh_only_affected_characters(self):
+        wizard = self._create('Wizard', dexterity=10)
+        fighter = self._create('Fighter', dexterity=10)
+        fighter.character_class = CharacterClass.objects.get(name='Fighter')
+        fighter.save()
+
+        def armor_classes():
+            return dict(CharacterDerivedStats.objects.values_list('character__character_name', 'armor_class'))
+
+        before = armor_classes()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ArmorClassBonus.objects.create(character_class=None, flat_bonus=5)
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bonus = ArmorClassBonus.objects.create(character_class=wizard.character_class, flat_bonus=1)
+        self.assertEqual(armor_classes(), {'Wizard': before['Wizard'] + 1, 'Fighter': before['Fighter']})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bonus.character_class = fighter.character_class
+            bonus.save()
+        self.assertEqual(armor_classes(), {'Wizard': before['Wizard'], 'Fighter': before['Fighter'] + 1})
+
+        skill = Skill.objects.get(name='Stealth')
+        skill.ability = 'wisdom'
+        with self.assertLogs('base.signals', 'WARNING'), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            skill.save()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_skill_proficiencies_are_replaced_with_one_version_bump(self):
+        character = self._create('Skilled', dexterity=10)
+        first, second, third = Skill.objects.order_by('pk')[:3]
+        set_skill_proficiencies(character, [first.pk, second.pk])
+        version = character.version
+
+        set_skill_proficiencies(character, [second.pk, third.pk])
+        self.assertEqual(character.version, version + 1)
+        self.assertEqual(
+            set(character.characterskillproficiency_set.values_list('skill_id', flat=True)),
+            {second.pk, third.pk},
+        )
+
+
+class BatchStatsEquivalenceTests(TestCase):
+    """Randomized check that the vectorized engine matches the Character properties."""
+
+    SEEDS = (1, 7, 42)
+    CHARACTERS_PER_SEED = 40
+
+    def _random_characters(self, rng, user):
+        classes = list(CharacterClass.objects.prefetch_related('subclasses'))
+        races = list(Race.objects.all()) + [None]
+        gear = list(Item.objects.filter(armor__isnull=False)) + list(Item.objects.filter(shield__isnull=False))
+        characters = []
+        for i in range(self.CHARACTERS_PER_SEED):
+            character_class = rng.choice(classes + [None])
+            subclasses = list(character_class.subclasses.all()) if character_class else []
+            characters.append(Character(
+                user=user,
+                character_name=f'Random {i}',
+                character_class=character_class,
+                subclass=rng.choice(subclasses + [None]) if subclasses else None,
+                race=rng.choice(races),
+                level=rng.randint(1, 20),
+                initiative=0, hit_points=1, temporary_hit_points=0, hit_dice=1,
+                **{ability: rng.randint(3, 20) for ability in AbilityScoreChoices.values},
+            ))
+        characters = Character.objects.bulk_create(characters)
+        InventoryItem.objects.bulk_create(
+            InventoryItem(character=character, item=item)
+            for character in characters
+            for item in rng.sample(gear, rng.randint(0, len(gear)))
+        )
+        return characters
+
+    def test_batch_engine_matches_scalar_properties(self):
+        user = User.objects.create_user(username='batch', password='pass')
+        fighter = CharacterClass.objects.get(name='Fighter')
+        ArmorClassBonus.objects.create(character_class=fighter, min_level=5, flat_bonus=1)
+        ArmorClassBonus.objects.create(
+            character_class=fighter, subclass=fighter.subclasses.first(), min_level=1, flat_bonus=2
+        )
+        for seed in self.SEEDS:
+            rng = random.Random(seed)
+            characters = self._random_characters(rng, user)
+            ids = [c.pk for c in characters]
+            stats = compute_stats_for(Character.objects.filter(pk__in=ids))
+
+            for i, character in enumerate(Character.objects.filter(pk__in=ids).order_by('pk')):
+                self.assertEqual(stats['character_id'][i], character.pk)
+                with self.subTest(seed=seed, character=character.pk):
+                    self.assertEqual(stats['armor_class'][i], character.armor_class)
+                    self.assertEqual(stats['hit_points'][i], character.calculate_hit_points)
+                    self.assertEqual(stats['hit_dice'][i], character.calculate_hit_dice)
+                    self.assertEqual(stats['proficiency_bonus'][i], character.proficiency_bonus)
+                    self.assertEqual(stats['initiative'][i], character.calculate_initiative)
+                    for position, ability in enumerate(AbilityScoreChoices.values):
+                        self.assertEqual(stats['totals'][i][position], getattr(character, f'total_{ability}'))
+                        self.assertEqual(stats['modifiers'][i][position], character.get_ability_modifier(ability))
+
+
+class CharacterListPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', password='pass')
+        self.client.force_login(self.user)
+        wizard = CharacterClass.objects.get(name='Wizard')
+        Character.objects.bulk_create(
+            Character(
+                user=self.user, character_name=f'{"Alpha" if i % 2 else "Beta"} {i:02d}',
+                character_class=wizard, level=1,
+                strength=10, dexterity=10, constitution=10,
+                intelligence=10, wisdom=10, charisma=10,
+                initiative=0, hit_points=6, temporary_hit_points=0, hit_dice=6,
+            )
+            for i in range(30)
+        )
+
+    def _walk_pages(self, params=None):
+        names = []
+        params = dict(params or {})
+        while True:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(reverse('characters'), params)
+            character_queries = [q for q in ctx.captured_queries if 'base_character' in q['sql']]
+            self.assertEqual(len(character_queries), 1)
+            names += [c.character_name for c in resp.context['characters']]
+            if 'next_page_query' not in resp.context:
+                return names
+            params['cursor'] = resp.context['next_page_query'].split('cursor=')[1].split('&')[0]
+
+    def test_keyset_pages_cover_every_character_once(self):
+        names = self._walk_pages()
+        self.assertEqual(len(names), 30)
+        self.assertEqual(len(set(names)), 30)
+
+    def test_prefix_search_is_case_insensitive(self):
+        names = self._walk_pages({'search': 'alp'})
+        self.assertEqual(len(names), 15)
+        self.assertTrue(all(name.startswith('Alpha') for name in names))
+
+    def test_prefix_search_handles_last_code_point(self):
+        last = chr(sys.maxunicode)
+        self.assertEqual(prefix_range(f'a{last}'), (f'a{last}', 'b'))
+        self.assertEqual(prefix_range(last * 2), (last * 2, None))
+        Character.objects.filter(character_name='Beta 00').update(character_name=f'{last}Beta')
+        for search in (last, f'{last}b', f'{last}{last}'):
+            with self.subTest(search=search):
+                resp = self.client.get(reverse('characters'), {'search': search})
+                self.assertEqual(resp.status_code, 200)
+                expected = [f'{last}Beta'] if search != f'{last}{last}' else []
+                self.assertEqual([c.character_name for c in resp.context['characters']], expected)
+
+    def test_forged_cursor_falls_back_to_first_page(self):
+        first_page = [c.character_name for c in self.client.get(reverse('characters')).context['characters']]
+        forged = {
+            'created': [['not-a-date', 5], [None, None], ['2024-01-01T00:00:00Z', 'x']],
+            'hp': [['many', '2024-01-01T00:00:00Z', 1], [None, '2024-01-01T00:00:00Z', 1]],
+            'ac': [[{'a': 1}, '2024-01-01T00:00:00Z', 1]],
+        }
+        for sort, cursors in forged.items():
+            for values in cursors:
+                with self.subTest(sort=sort, values=values):
+                    resp = self.client.get(reverse('characters'), {'sort': sort, 'cursor': encode_cursor(values)})
+                    self.assertEqual(resp.status_code, 200)
+                    self.assertEqual(len(resp.context['characters']), 25)
+                    if sort == 'created':
+                        self.assertEqual([c.character_name for c in resp.context['characters']], first_page)
+
+
+class SpellEligibilityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caster', password='pass')
+        self.client.force_login(self.user)
+        self.wizard = CharacterClass.objects.get(name='Wizard')
+        self.subclass = Subclass.objects.filter(character_class=self.wizard).first()
+        self.character = Character.objects.create(
+            user=self.user,
+            character_name='Caster',
+            character_class=self.wizard,
+            subclass=self.subclass,
+            race=Race.objects.first(),
+            background=Background.objects.first(),
+            level=1,
+            strength=8, dexterity=14, constitution=13,
+            intelligence=15, wisdom=12, charisma=10,
+            hit_points=0,
+            temporary_hit_points=0,
+        )
+
+    def test_index_matches_class_spell_rows(self):
+        eligible = set(ClassSpell.objects.filter(
+            character_class=self.wizard, subclass__isnull=True, unlock_level__lte=3,
+        ).values_list('spell_id', flat=True))
+        self.assertEqual(get_rules_catalog().eligible_spell_ids(self.wizard.pk, None, 3), eligible)
+
+    def test_subclass_spells_follow_class_spell_changes(self):
+        spell = Spell.objects.filter(level=1).exclude(classspell__character_class=self.wizard).first()
+        ClassSpell.objects.create(
+            character_class=self.wizard, subclass=self.subclass, spell=spell, unlock_level=1,
+        )
+        catalog = get_rules_catalog()
+        self.assertIn(spell.pk, catalog.eligible_spell_ids(self.wizard.pk, self.subclass.pk, 1))
+        self.assertNotIn(spell.pk, catalog.eligible_spell_ids(self.wizard.pk, None, 1))
+
+    def test_picker_rejects_ineligible_spell(self):
+        spell = Spell.objects.exclude(classspell__character_class=self.wizard).first()
+        resp = self.client.post(reverse('character_spells', args=[self.character.pk]), {'spells': [spell.pk]})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.context['form'].errors)
+        self.assertFalse(self.character.spells.exists())
+
+    def test_picker_saves_eligible_spell(self):
+        spell_id = min(get_rules_catalog().eligible_spell_ids(self.wizard.pk, self.subclass.pk, 1))
+        resp = self.client.post(reverse('character_spells', args=[self.character.pk]), {'spells': [spell_id]})
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(list(self.character.spells.values_list('pk', flat=True)), [spell_id])
+
+        resp = self.client.get(reverse('character_spells', args=[self.character.pk]))
+        self.assertEqual(resp.context['known_spell_ids'], {spell_id})
+
+
+class SpellPickerApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='picker', password='pass')
+        self.client.force_login(self.user)
+        self.wizard = CharacterClass.objects.get(name='Wizard')
+        self.character = Character.objects.create(
+            user=self.user,
+            character_name='Picker',
+            character_class=self.wizard,
+            race=Race.objects.first(),
+            background=Background.objects.first(),
+            level=20,
+            strength=8, dexterity=14, constitution=13,
+            intelligence=15, wisdom=12, charisma=10,
+            hit_points=0,
+            temporary_hit_points=0,
+        )
+        self.url = reverse('character_spells_api', args=[self.character.pk])
+        self.eligible = get_rules_catalog().eligible_spell_ids(self.wizard.pk, None, 20)
+
+    def post_delta(self, **delta):
+        return self.client.post(self.url, json.dumps(delta), content_type='application/json')
+
+    def test_pages_cover_every_eligible_spell_grouped_by_level(self):
+        seen, levels, cursor = [], [], None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            data = self.client.get(self.url, params).json()
+            for group in data['groups']:
+                levels.append(group['level'])
+                seen.extend(spell['id'] for spell in group['spells'])
+            cursor = data['next']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), len(self.eligible))
+        self.assertEqual(set(seen), self.eligible)
+        self.assertEqual(levels, sorted(levels))
+        self.assertNotIn('desc', data['groups'][0]['spells'][0])
+
+    def test_delta_adds_and_removes(self):
+        first, second = sorted(Spell.objects.filter(pk__in=self.eligible, level=1).values_list('pk', flat=True))[:2]
+        resp = self.post_delta(add=[first, second])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['known'], [first, second])
+
+        self.post_delta(remove=[first])
+        self.assertEqual(list(self.character.spells.values_list('pk', flat=True)), [second])
+
+    def test_delta_rejects_ineligible_and_over_limit(self):
+        ineligible = Spell.objects.exclude(pk__in=self.eligible).first()
+        self.assertEqual(self.post_delta(add=[ineligible.pk]).status_code, 400)
+
+        cantrips = list(Spell.objects.filter(pk__in=self.eligible, level=0).values_list('pk', flat=True))
+        too_many = cantrips[:self.character.max_cantrips_known + 1]
+        self.assertGreater(len(too_many), self.character.max_cantrips_known)
+        self.assertEqual(self.post_delta(add=too_many).status_code, 400)
+        self.assertFalse(self.character.spells.exists())
+
+    def test_detail_returns_description(self):
+        spell = Spell.objects.first()
+        data = self.client.get(reverse('spell_detail', args=[spell.pk])).json()
+        self.assertEqual(data['desc'], spell.desc)
+
+
+class RulesDataLoaderTests(TestCase):
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        for name in RULES_DATA_LOADERS:
+            shutil.copy(get_data_dir() / name, self.data_dir / name)
+
+    def test_reload_is_idempotent_and_skips_unchanged_files(self):
+        counts = (ClassSpell.objects.count(), ClassFeature.objects.count(), Feat.objects.count())
+        results = load_rules_data(self.data_dir)
+        self.assertTrue(all(results.values()))
+        self.assertEqual(
+            (ClassSpell.objects.count(), ClassFeature.objects.count(), Feat.objects.count()), counts,
+        )
+
+        with self.assertNumQueries(1):
+            results = load_rules_data(self.data_dir)
+        self.assertEqual(set(results.values()), {None})
+
+    def test_changed_file_is_upserted(self):
+        load_rules_data(self.data_dir)
+        feats = json.loads((self.data_dir / 'feats.json').read_text(encoding='utf-8'))
+        feats[0]['description'] = 'Rewritten description.'
+        feats.append({'name': 'Brand New Feat', 'description': 'Added later.'})
+        (self.data_dir / 'feats.json').write_text(json.dumps(feats), encoding='utf-8')
+
+        results = load_rules_data(self.data_dir)
+        self.assertEqual(results['feats.json'], len(feats))
+        self.assertIsNone(results['spells.json'])
+        self.assertEqual(Feat.objects.get(name=feats[0]['name']).description, 'Rewritten description.')
+        self.assertTrue(Feat.objects.filter(name='Brand New Feat').exists())
+
+    def test_spell_updates_reach_search_index(self):
+        data = json.loads((self.data_dir / 'spells.json').read_text(encoding='utf-8'))
+        data['spellbook']['level_1'][0][10] = 'Summons a qwertyuiop.'
+        (self.data_dir / 'spells.json').write_text(json.dumps(data), encoding='utf-8')
+
+        load_rules_data(self.data_dir)
+        spells, _ = search_spells('qwertyuiop')
+        self.assertEqual([s.name for s in spells], [data['spellbook']['level_1'][0][0]])
+
+
+class PdfExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='pass')
+        self.client.force_login(self.user)
+        self.wizard = CharacterClass.objects.get(name='Wizard')
+        self.character = Character.objects.create(
+            user=self.user,
+            character_name='Exported Wizard',
+            character_class=self.wizard,
+            race=Race.objects.first(),
+            background=Background.objects.first(),
+            level=3,
+            strength=8, dexterity=14, constitution=13,
+            intelligence=16, wisdom=12, charisma=10,
+            hit_points=0,
+            temporary_hit_points=0,
+        )
+        self.skill = Skill.objects.get(name='Arcana')
+        CharacterSkillProficiency.objects.create(character=self.character, skill=self.skill)
+        self.spell = Spell.objects.get(pk=min(get_rules_catalog().eligible_spell_ids(self.wizard.pk, None, 3)))
+        self.character.spells.add(self.spell)
+
+    def read_fields(self, data):
+        return PdfReader(io.BytesIO(data)).get_fields()
+
+    def test_single_sheet_is_filled_from_sheet_and_derived_stats(self):
+        resp = self.client.get(reverse('character-pdf', args=[self.character.pk]))
+        self.assertEqual(resp['Content-Type'], 'application/pdf')
+        fields = self.read_fields(resp.content)
+        stats = CharacterDerivedStats.objects.get(character=self.character)
+
+        self.assertEqual(fields['CharacterName']['/V'], 'Exported Wizard')
+        self.assertEqual(fields['AC']['/V'], str(stats.armor_class))
+        self.assertEqual(fields['INT']['/V'], str(stats.total_intelligence))
+        arcana_box = get_form_template().proficiency_boxes['Arcana']
+        self.assertEqual(fields[arcana_box]['/V'], '/Yes')
+        self.assertIn(self.spell.name, [f.get('/V') for name, f in fields.items() if name.startswith('Spells')])
+
+    def test_zip_streams_one_sheet_per_character(self):
+        other = Character.objects.create(
+            user=self.user, character_name='Second', character_class=self.wizard,
+            level=1, strength=10, dexterity=10, constitution=10,
+            intelligence=10, wisdom=10, charisma=10, hit_points=0, temporary_hit_points=0,
+        )
+        resp = self.client.get(reverse('characters-pdf-zip'))
+        self.assertTrue(resp.streaming)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(resp.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(len(archive.namelist()), 2)
+
+        names = {
+            self.read_fields(archive.read(name))['CharacterName']['/V'] for name in archive.namelist()
+        }
+        self.assertEqual(names, {'Exported Wizard', other.character_name})
+
+    def test_zip_switches_to_zip64_past_classic_limits(self):
+        def entry(name, text):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            return ZipEntry(name, zlib.crc32(text), len(text), compressor.compress(text) + compressor.flush())
+
+        writer = ZipStreamWriter()
+        data = b''.join(writer.add(entry(f'{i}.txt', b'')) for i in range(ZIP32_COUNT_LIMIT + 1))
+        archive = zipfile.ZipFile(io.BytesIO(data + writer.finish()))
+        self.assertEqual(len(archive.namelist()), ZIP32_COUNT_LIMIT + 1)
+
+        # Start past 4 GiB without writing it; readers treat the gap like data prepended to the archive
+        writer = ZipStreamWriter()
+        writer.offset = ZIP32_LIMIT + 1
+        data = writer.add(entry('far.txt', b'far away')) + writer.finish()
+        self.assertEqual(zipfile.ZipFile(io.BytesIO(data)).read('far.txt'), b'far away')
+
+
+class PdfImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='pass')
+        self.client.force_login(self.user)
+        wizard = CharacterClass.objects.get(name='Wizard')
+        self.original = Character.objects.create(
+            user=self.user,
+            character_name='Round Trip',
+            character_class=wizard,
+            race=Race.objects.first(),
+            background=Background.objects.first(),
+            level=3,
+            strength=8, dexterity=14, constitution=13,
+            intelligence=15, wisdom=12, charisma=10,
+            hit_points=0,
+            temporary_hit_points=0,
+        )
+        CharacterSkillProficiency.objects.create(character=self.original, skill=Skill.objects.get(name='Arcana'))
+        self.original.spells.add(min(get_rules_catalog().eligible_spell_ids(wizard.pk, None, 3)))
+
+    def upload(self, *files):
+        return self.client.post(reverse('character-import'), {'sheets': list(files)})
+
+    def test_exported_sheet_round_trips(self):
+        pdf = render_character_pdf(export_queryset(Character.objects.filter(pk=self.original.pk)).get())
+        resp = self.upload(SimpleUploadedFile('sheet.pdf', pdf, content_type='application/pdf'))
+        report = resp.context['report']
+        self.assertEqual(report.errors, {})
+        self.assertEqual(len(report.created), 1)
+
+        imported = Character.objects.get(pk=report.created[0][1])
+        self.assertEqual(imported.user, self.user)
+        for field in ('character_name', 'character_class_id', 'race_id', 'background_id', 'level',
+                      'strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma'):
+            self.assertEqual(getattr(imported, field), getattr(self.original, field), field)
+        self.assertEqual(
+            set(imported.characterskillproficiency_set.values_list('skill_id', flat=True)),
+            set(self.original.characterskillproficiency_set.values_list('skill_id', flat=True)),
+        )
+        self.assertEqual(set(imported.spells.all()), set(self.original.spells.all()))
+        self.assertTrue(CharacterDerivedStats.objects.filter(character=imported).exists())
+
+    def test_broken_file_is_reported_without_aborting_the_batch(self):
+        pdf = render_character_pdf(export_queryset(Character.objects.filter(pk=self.original.pk)).get())
+        resp = self.upload(
+            SimpleUploadedFile('good.pdf', pdf, content_type='application/pdf'),
+            SimpleUploadedFile('broken.pdf', b'not a pdf', content_type='application/pdf'),
+        )
+        report = resp.context['report']
+        self.assertEqual([name for name, _ in report.created], ['good.pdf'])
+        self.assertIn('broken.pdf', report.errors)
+        self.assertEqual(Character.objects.filter(user=self.user).count(), 2)
+
+    def sheet_values(self):
+        pdf = render_character_pdf(export_queryset(Character.objects.filter(pk=self.original.pk)).get())
+        _, values, error = read_form_source(('sheet.pdf', pdf))
+        self.assertIsNone(error)
+        return values
+
+    def test_out_of_range_values_are_rejected(self):
+        values, index = self.sheet_values(), NameIndex.load()
+        for field, value in (('XP', '-5'), ('HPCurrent', '-3'), ('HPTemp', '-1'), ('Equipment', 'Dagger x0')):
+            with self.subTest(field=field), self.assertRaises(SheetImportError):
+                sheet_to_record(dict(values, **{field: value}), self.user, index)
+
+    def test_failed_batch_is_retried_one_record_at_a_time(self):
+        values, index = self.sheet_values(), NameIndex.load()
+        batch = [(name, sheet_to_record(values, self.user, index)[0]) for name in ('a.pdf', 'b.pdf', 'c.pdf')]
+        # Gets past validation but not past the CHECK constraint
+        batch[1][1].character.hit_points = -4
+        report = ImportReport()
+        write_records(batch, report)
+        self.assertEqual([name for name, _ in report.created], ['a.pdf', 'c.pdf'])
+        self.assertEqual(list(report.errors), ['b.pdf'])
+        self.assertIn('IntegrityError', report.errors['b.pdf'])
+
+
+class CharacterExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='backup', password='pass')
+        self.client.force_login(self.user)
+        self.fighter = CharacterClass.objects.get(name='Fighter')
+        self.item = Item.objects.first()
+        self.spell = Spell.objects.first()
+        self.skill = Skill.objects.get(name='Athletics')
+
+    def make_characters(self, count, user=None):
+        for i in range(count):
+            character = Character.objects.create(
+                user=user or self.user, character_name=f'Hero {i}', character_class=self.fighter,
+                race=Race.objects.first(), level=2,
+                strength=15, dexterity=12, constitution=14, intelligence=8, wisdom=10, charisma=10,
+                hit_points=0, temporary_hit_points=0,
+            )
+            InventoryItem.objects.create(character=character, item=self.item, quantity=3)
+            CharacterSkillProficiency.objects.create(character=character, skill=self.skill)
+            character.spells.add(self.spell)
+
+    def export(self, **params):
+        resp = self.client.get(reverse('characters-export'), params)
+        self.assertTrue(resp.streaming)
+        return b''.join(resp.streaming_content).decode()
+
+    def test_ndjson_uses_names_and_only_own_characters(self):
+        self.make_characters(2)
+        self.make_characters(1, user=User.objects.create_user(username='someone', password='pass'))
+        records = [json.loads(line) for line in self.export().splitlines()]
+
+        self.assertEqual([r['character_name'] for r in records], ['Hero 0', 'Hero 1'])
+        self.assertEqual(records[0]['character_class'], 'Fighter')
+        self.assertEqual(records[0]['user'], 'backup')
+        self.assertIn({'item': self.item.name, 'quantity': 3}, records[0]['inventory'])
+        self.assertEqual(records[0]['skills'], ['Athletics'])
+        self.assertEqual(records[0]['spells'], [self.spell.name])
+
+    def test_csv_has_header_and_json_list_columns(self):
+        self.make_characters(2)
+        rows = list(csv.DictReader(io.StringIO(self.export(format='csv'))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1]['character_name'], 'Hero 1')
+        self.assertEqual(json.loads(rows[1]['skills']), ['Athletics'])
+
+    def test_query_count_does_not_grow_with_characters(self):
+        self.make_characters(3)
+        with CaptureQueriesContext(connection) as small:
+            self.export()
+        self.make_characters(10)
+        with CaptureQueriesContext(connection) as large:
+            self.export()
+        self.assertEqual(len(small), len(large))
+
+    def test_unknown_format_is_rejected(self):
+        resp = self.client.get(reverse('characters-export'), {'format': 'xml'})
+        self.assertEqual(resp.status_code, 400)
+
+
+class CharacterImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='source', password='pass')
+        self.target = User.objects.create_user(username='target', password='pass')
+        self.fighter = CharacterClass.objects.get(name='Fighter')
+        self.record = {
+            'user': 'source', 'character_name': 'Imported', 'character_class': 'Fighter',
+            'race': Race.objects.first().name, 'level': 3,
+            'strength': 15, 'dexterity': 12, 'constitution': 14, 'intelligence': 8, 'wisdom': 10, 'charisma': 10,
+            'skills': ['Athletics'], 'inventory': [{'item': Item.objects.first().name, 'quantity': 2}],
+            'languages': [], 'spells': [], 'feats': [],
+        }
+
+    def lines(self, *records):
+        return [json.dumps(record) + '\n' for record in records]
+
+    def test_exported_characters_round_trip(self):
+        character = Character.objects.create(
+            user=self.user, character_name='Original', character_class=self.fighter,
+            race=Race.objects.first(), background=Background.objects.first(), level=2,
+            strength=15, dexterity=12, constitution=14, intelligence=8, wisdom=10, charisma=10,
+            hit_points=0, temporary_hit_points=0,
+        )
+        CharacterSkillProficiency.objects.create(character=character, skill=Skill.objects.get(name='Athletics'))
+        exported = list(iter_ndjson(Character.objects.filter(pk=character.pk)))
+
+        report = import_characters(exported, owner=self.target, workers=0)
+        self.assertEqual(report.errors, {})
+        imported = Character.objects.get(pk=report.created[0][1])
+        self.assertEqual(imported.user, self.target)
+        original, copy = json.loads(exported[0]), json.loads(next(iter_ndjson(Character.objects.filter(pk=imported.pk))))
+        for key in ('id', 'user', 'created_at'):
+            del original[key], copy[key]
+        self.assertEqual(copy, original)
+        self.assertTrue(CharacterDerivedStats.objects.filter(character=imported).exists())
+
+    def test_invalid_records_are_reported_by_line(self):
+        too_strong = dict(self.record, strength=18)
+        unknown_class = dict(self.record, character_class='Necromancer')
+        cantrips = list(Spell.objects.filter(level=0, classspell__character_class__name='Wizard')
+                        .distinct().values_list('name', flat=True)[:5])
+        too_many_cantrips = dict(self.record, character_class='Wizard', spells=cantrips)
+        lines = self.lines(self.record, too_strong, unknown_class, too_many_cantrips) + ['{broken\n']
+
+        report = import_characters(lines, workers=0)
+        self.assertEqual([line for line, _ in report.created], [1])
+        self.assertEqual(sorted(report.errors), [2, 3, 4, 5])
+        self.assertIn('Point Buy', report.errors[2])
+        self.assertIn('Unknown class', report.errors[3])
+        self.assertIn('Cantrips', report.errors[4])
+        self.assertEqual(Character.objects.get(pk=report.created[0][1]).user, self.user)
+
+    def test_inventory_quantity_below_one_is_rejected(self):
+        records = [dict(self.record, inventory=[{'item': Item.objects.first().name, 'quantity': q}]) for q in (2, -1, 0)]
+        report = import_characters(self.lines(*records), workers=0)
+        self.assertEqual([line for line, _ in report.created], [1])
+        self.assertEqual(sorted(report.errors), [2, 3])
+        self.assertIn('at least 1', report.errors[2])
+
+    def test_query_count_does_not_grow_with_records(self):
+        with CaptureQueriesContext(connection) as small:
+            import_characters(self.lines(*[self.record] * 2), workers=0)
+        with CaptureQueriesContext(connection) as large:
+            import_characters(self.lines(*[self.record] * 20), workers=0)
+        self.assertEqual(len(small), len(large))
+
+
+class CharacterSheetApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='poller', password='pass')
+        self.client.force_login(self.user)
+        self.character = Character.objects.create(
+            user=self.user, character_name='Polled', character_class=CharacterClass.objects.get(name='Wizard'),
+            race=Race.objects.first(), level=3,
+            strength=8, dexterity=14, constitution=13, intelligence=15, wisdom=12, charisma=10,
+            hit_points=0, temporary_hit_points=0,
+        )
+        self.url = reverse('character_sheet_api', args=[self.character.pk])
+
+    def etag(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        return resp['ETag']
+
+    def test_sheet_has_computed_values_and_etag(self):
+        resp = self.client.get(self.url)
+        data = resp.json()
+        stats = CharacterDerivedStats.objects.get(character=self.character)
+        self.assertEqual(data['armor_class'], stats.armor_class)
+        self.assertEqual(data['abilities']['intelligence']['total'], stats.total_intelligence)
+        self.assertEqual(len(data['skills']), Skill.objects.count())
+        self.assertIn(f'"{self.character.pk}-{data["version"]}-', resp['ETag'])
+
+    def test_matching_poll_is_304_after_only_a_version_lookup(self):
+        etag = self.etag()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+        character_queries = [q['sql'] for q in ctx.captured_queries if 'base_' in q['sql']]
+        self.assertEqual(len(character_queries), 1)
+        self.assertIn('"version"', character_queries[0])
+        self.assertNotIn('"character_name"', character_queries[0])
+
+    def test_changes_to_character_and_related_rows_change_the_etag(self):
+        etags = [self.etag()]
+
+        self.character.hit_points = 5
+        self.character.save()
+        etags.append(self.etag())
+
+        inventory = InventoryItem.objects.create(character=self.character, item=Item.objects.first())
+        etags.append(self.etag())
+        inventory.delete()
+        etags.append(self.etag())
+
+        CharacterSkillProficiency.objects.create(character=self.character, skill=Skill.objects.get(name='Arcana'))
+        etags.append(self.etag())
+
+        spell = Spell.objects.first()
+        self.character.spells.add(spell)
+        etags.append(self.etag())
+        spell.learned_by_characters.clear()
+        etags.append(self.etag())
+
+        bump_rules_version()
+        etags.append(self.etag())
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_other_users_character_is_not_found(self):
+        self.client.force_login(User.objects.create_user(username='stranger', password='pass'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_fragment_stats()
+        self.user = User.objects.create_user(username='viewer', password='pass')
+        self.client.force_login(self.user)
+        self.character = Character.objects.create(
+            user=self.user, character_name='Cached', character_class=CharacterClass.objects.get(name='Wizard'),
+            race=Race.objects.first(), background=Background.objects.first(), level=3,
+            strength=8, dexterity=14, constitution=13, intelligence=15, wisdom=12, charisma=10,
+            hit_points=0, temporary_hit_points=0,
+        )
+        self.url = reverse('character', args=[self.character.pk])
+
+    def test_second_view_is_served_from_cache_without_prefetching(self):
+        with CaptureQueriesContext(connection) as cold:
+            first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as warm:
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        self.assertLess(len(warm), len(cold))
+        self.assertFalse([q for q in warm.captured_queries if 'base_inventoryitem' in q['sql']])
+
+        stats = fragment_stats()
+        self.assertEqual({s['miss'] for s in stats.values()}, {1})
+        self.assertEqual({s['hit'] for s in stats.values()}, {1})
+
+        # Counters live outside the fragment cache and survive it being emptied
+        cache.clear()
+        self.assertEqual(fragment_stats(), stats)
+
+    def test_related_row_change_rerenders_sections(self):
+        self.client.get(self.url)
+        item = Item.objects.create(name='Unmistakable Lantern')
+        InventoryItem.objects.create(character=self.character, item=item)
+        self.assertContains(self.client.get(self.url), 'Unmistakable Lantern')
+
+        feat = Feat.objects.first()
+        self.character.feats.add(feat)
+        self.assertContains(self.client.get(self.url), feat.name)
+
+    def test_waiter_uses_the_fragment_rendered_by_the_lock_holder(self):
+        key = fragment_key('skills', self.character)
+        cache.add(f'{key}:lock', 1)
+        cache.set(key, 'rendered elsewhere')
+        html = render_fragment('skills', key, lambda: self.fail('should not render'))
+        self.assertEqual(html, 'rendered elsewhere')
+        self.assertEqual(fragment_stats()['skills']['wait'], 1)
+
+
+class RulesLookupTests(TestCase):
+    def setUp(self):
+        self.wizard = CharacterClass.objects.get(name='Wizard')
+
+    def test_lookups_return_class_rows(self):
+        subclasses = self.client.get(reverse('subclasses_for_class'), {'class_id': self.wizard.pk}).json()
+        self.assertEqual(
+            [s['name'] for s in subclasses],
+            list(Subclass.objects.filter(character_class=self.wizard).order_by('pk').values_list('name', flat=True)),
+        )
+        skills = self.client.get(reverse('skills_for_class'), {'class_id': self.wizard.pk}).json()
+        self.assertIn('Arcana', [s['name'] for s in skills])
+        self.assertEqual(self.client.get(reverse('skills_for_class'), {'class_id': 'x'}).json(), [])
+
+    def test_versioned_requests_are_cacheable_and_revalidate(self):
+        url = reverse('skills_for_class')
+        version = str(get_rules_version())
+        resp = self.client.get(url, {'class_id': self.wizard.pk, 'v': version})
+        self.assertIn('immutable', resp['Cache-Control'])
+
+        unversioned = self.client.get(url, {'class_id': self.wizard.pk})
+        self.assertIn('no-cache', unversioned['Cache-Control'])
+        revalidated = self.client.get(url, {'class_id': self.wizard.pk}, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        bump_rules_version()
+        self.assertEqual(self.client.get(url, {'class_id': self.wizard.pk}, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 200)
+
+
+
+class RulesBundleTests(TestCase):
+    def test_bundle_has_classes_and_point_costs(self):
+        data = bundle_data()
+        wizard = next(c for c in data['classes'] if c['name'] == 'Wizard')
+        self.assertEqual(
+            {s['name'] for s in wizard['subclasses']},
+            set(Subclass.objects.filter(character_class__name='Wizard').values_list('name', flat=True)),
+        )
+        self.assertEqual(len(wizard['skills']), ClassSkillChoice.objects.filter(character_class__name='Wizard').count())
+        self.assertEqual(data['point_buy']['costs'][15], 9)
+        self.assertEqual(data['cantrips_known'], CANTRIPS_KNOWN_TABLE)
+
+    def test_write_bundle_writes_hashed_file_and_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_bundle(Path(tmp))
+            text, name = current_bundle()
+            self.assertEqual(path.name, name)
+            self.assertEqual(path.read_text(encoding='utf-8'), text)
+            manifest = json.loads((Path(tmp) / 'manifest.json').read_text())
+            self.assertEqual(manifest['rules.js'], f'bundles/{name}')
+
+    def test_filename_follows_content(self):
+        data = bundle_data()
+        before = bundle_filename(render_bundle(data))
+        data['levels_per_feat'] += 1
+        self.assertNotEqual(before, bundle_filename(render_bundle(data)))
+
+    def test_form_embeds_bundle_without_lookups(self):
+        self.client.force_login(User.objects.create_user(username='creator', password='pass'))
+        resp = self.client.get(reverse('character-create'))
+        self.assertContains(resp, 'window.RULES_BUNDLE=')
+        self.assertNotContains(resp, 'fetch(')
+
+    def test_form_shows_point_buy_budget(self):
+        self.client.force_login(User.objects.create_user(username='budgeter', password='pass'))
+        resp = self.client.get(reverse('character-create'))
+        self.assertEqual(resp.context['point_buy_budget'], POINT_BUY_BUDGET)
+        self.assertContains(resp, f'1.2em;">{POINT_BUY_BUDGET}</span> / {POINT_BUY_BUDGET}')
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='profiled', password='pass')
+        self.character = Character.objects.create(
+            user=self.user, character_name='Timed', character_class=CharacterClass.objects.get(name='Fighter'),
+            race=Race.objects.first(), level=2,
+            strength=15, dexterity=14, constitution=13, intelligence=8, wisdom=12, charisma=10,
+            hit_points=0, temporary_hit_points=0,
+        )
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.addCleanup(self.close_log_handlers)
+        cache.clear()
+
+    def close_log_handlers(self):
+        for handler in list(profile_logger.handlers):
+            profile_logger.removeHandler(handler)
+            handler.close()
+
+    def test_disabled_by_default(self):
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse('character', args=[self.character.pk]))
+        self.assertNotIn('Server-Timing', resp)
+
+    def test_server_timing_and_report(self):
+        log = self.tmp / 'profile.jsonl'
+        with self.settings(PROFILER_ENABLED=True, PROFILER_LOG=log):
+            client = Client()
+            client.force_login(self.user)
+            resp = client.get(reverse('character', args=[self.character.pk]))
+        timing = resp['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+        record = json.loads(log.read_text().splitlines()[-1])
+        self.assertEqual(record['endpoint'], '/character/<int:pk>/')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+
+        out = io.StringIO()
+        call_command('profile_report', log=log, stdout=out)
+        self.assertIn('GET /character/<int:pk>/', out.getvalue())
+
+    def test_profiled_sections_count_outermost_calls(self):
+        profile, token = start_profile()
+        try:
+            sheet = CharacterSheet(CharacterSheet.prefetch(Character.objects.filter(pk=self.character.pk)).get())
+            _ = sheet.armor_class
+            _ = sheet.skills
+        finally:
+            stop_profile(token)
+        self.assertEqual(profile.sections['armor_class'].calls, 1)
+        self.assertEqual(profile.sections['skill_bonus'].calls, Skill.objects.count())
+        self.assertIsNone(current_profile())
+
+
+class QueryBudgetMixin:
+    """assertQueryBudget() fails listing every query with the project frames that issued it."""
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            frames = [
+                frame for frame in traceback.extract_stack()[:-1]
+                if frame.filename.startswith(APP_DIR) and frame.filename != __file__
+            ]
+            queries.append((sql, frames))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            yield queries
+
+        if len(queries) > budget:
+            lines = [f'{len(queries)} queries, budget is {budget}:']
+            for number, (sql, frames) in enumerate(queries, 1):
+                lines.append(f'{number}. {sql}')
+                lines += [f'      {frame.filename}:{frame.lineno} in {frame.name}' for frame in frames]
+            self.fail('\n'.join(lines))
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Every view has a fixed query budget. The rich character has a large
+    inventory, many spells, skills, feats and languages; the sparse one has
+    none, and both must cost the same.
+    """
+    BUDGETS = {
+        'list': 3,
+        'detail': 12,
+        'sheet_api': 13,
+        'create_get': 10,
+        'create_post': 72,
+        'update_get': 13,
+        'update_post': 73,
+        'spells_get': 6,
+        'spells_post': 23,
+        'spells_api_get': 5,
+        'spells_api_post': 8,
+        'subclasses': 1,
+        'skills': 1,
+        'spell_search': 3,
+        'spell_detail': 3,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='budget', password='pass')
+        cls.wizard = CharacterClass.objects.get(name='Wizard')
+        stats = dict(strength=8, dexterity=14, constitution=13, intelligence=15, wisdom=12, charisma=10)
+        cls.sparse = Character.objects.create(
+            user=cls.user, character_name='Sparse', character_class=cls.wizard, race=Race.objects.first(),
+            background=Background.objects.first(), level=10, hit_points=0, temporary_hit_points=0, **stats,
+        )
+        cls.rich = Character.objects.create(
+            user=cls.user, character_name='Rich', character_class=cls.wizard, race=Race.objects.first(),
+            background=Background.objects.first(), level=10, hit_points=0, temporary_hit_points=0, **stats,
+        )
+        items = Item.objects.bulk_create(Item(name=f'Budget trinket {i}') for i in range(80))
+        InventoryItem.objects.bulk_create(InventoryItem(character=cls.rich, item=item) for item in items)
+        cls.class_skills = list(Skill.objects.filter(classskillchoice__character_class=cls.wizard))
+        CharacterSkillProficiency.objects.bulk_create(
+            CharacterSkillProficiency(character=cls.rich, skill=skill) for skill in cls.class_skills
+        )
+        eligible = get_rules_catalog().eligible_spell_ids(cls.wizard.pk, None, 10)
+        cls.rich_spells = list(Spell.objects.filter(pk__in=eligible, level__gt=0).order_by('pk')[:15])
+        cls.rich.spells.set(cls.rich_spells + list(Spell.objects.filter(pk__in=eligible, level=0)[:4]))
+        cls.rich.feats.set(Feat.objects.all()[:2])
+        cls.rich.languages.set(Language.objects.all())
+        extras = [
+            Character(user=cls.user, character_name=f'Extra {i}', character_class=cls.wizard, level=1,
+                      hit_points=0, temporary_hit_points=0, **stats)
+            for i in range(40)
+        ]
+        for character in extras:
+            character.apply_calculated_fields()
+        Character.objects.bulk_create(extras)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def form_data(self, character, **changes):
+        data = {
+            'character_name': character.character_name, 'character_class': self.wizard.pk,
+            'race': character.race_id, 'background': character.background_id, 'level': character.level,
+            'alignment': character.alignment, 'experience_points': 0,
+            'strength': 8, 'dexterity': 14, 'constitution': 13, 'intelligence': 15, 'wisdom': 12, 'charisma': 10,
+            'skills': [skill.pk for skill in self.class_skills[:2]],
+            'languages': list(Language.objects.values_list('pk', flat=True)),
+        }
+        data.update(changes)
+        return data
+
+    def assertViewBudget(self, budget_name, method, url_for, data_for=None, same_for_both=True, **extra):
+        """Requests the view for the sparse and the rich character; both must fit the budget."""
+        counts = []
+        for character in (self.sparse, self.rich):
+            cache.clear()  # cold fragment cache, but a loaded rules catalog
+            get_rules_catalog()
+            data = data_for(character) if data_for else None
+            with self.assertQueryBudget(self.BUDGETS[budget_name]) as queries:
+                resp = getattr(self.client, method)(url_for(character), data, **extra)
+            self.assertLess(resp.status_code, 400, resp.content[:500])
+            counts.append(len(queries))
+        if same_for_both:
+            self.assertEqual(counts[0], counts[1], f'{budget_name}: query count depends on related rows')
+
+    def test_character_pages(self):
+        self.assertViewBudget('list', 'get', lambda c: reverse('characters'))
+        self.assertViewBudget('detail', 'get', lambda c: reverse('character', args=[c.pk]))
+        self.assertViewBudget('sheet_api', 'get', lambda c: reverse('character_sheet_api', args=[c.pk]))
+
+    def test_character_forms(self):
+        self.assertViewBudget('create_get', 'get', lambda c: reverse('character-create'))
+        self.assertViewBudget(
+            'create_post', 'post', lambda c: reverse('character-create'),
+            lambda c: self.form_data(c, character_name=f'Copy of {c.character_name}'),
+        )
+        self.assertViewBudget('update_get', 'get', lambda c: reverse('character-update', args=[c.pk]))
+        # Adding and removing rows differ slightly; neither may grow with the row count
+        self.assertViewBudget(
+            'update_post', 'post', lambda c: reverse('character-update', args=[c.pk]), self.form_data,
+            same_for_both=False,
+        )
+
+    def test_spell_pages(self):
+        self.assertViewBudget('spells_get', 'get', lambda c: reverse('character_spells', args=[c.pk]))
+        self.assertViewBudget(
+            'spells_post', 'post', lambda c: reverse('character_spells', args=[c.pk]),
+            lambda c: {'spells': [spell.pk for spell in self.rich_spells[:5]]}, same_for_both=False,
+        )
+        self.assertViewBudget('spells_api_get', 'get', lambda c: reverse('character_spells_api', args=[c.pk]))
+        self.assertViewBudget(
+            'spells_api_post', 'post', lambda c: reverse('character_spells_api', args=[c.pk]),
+            lambda c: json.dumps({'add': [self.rich_spells[6].pk]}), content_type='application/json',
+        )
+
+    def test_lookups(self):
+        class_lookup = {'class_id': self.wizard.pk}
+        self.assertViewBudget('subclasses', 'get', lambda c: reverse('subclasses_for_class'), lambda c: class_lookup)
+        self.assertViewBudget('skills', 'get', lambda c: reverse('skills_for_class'), lambda c: class_lookup)
+        self.assertViewBudget('spell_search', 'get', lambda c: reverse('spell_search'), lambda c: {'q': 'fire'})
+        self.assertViewBudget('spell_detail', 'get', lambda c: reverse('spell_detail', args=[self.rich_spells[0].pk]))
+
+
+class BenchmarkTests(TestCase):
+    def test_generated_characters_are_valid(self):
+        users = generate_characters(12, users=2, seed=3, batch_size=5)
+        characters = Character.objects.filter(user__in=users).prefetch_related('spells')
+        self.assertEqual(characters.count(), 12)
+        for character in characters:
+            character.validate_point_buy()
+            spells = list(character.spells.all())
+            cantrips = sum(1 for spell in spells if spell.level == 0)
+            self.assertEqual(spell_limit_errors(character, cantrips, len(spells) - cantrips), [])
+        self.assertTrue(CharacterDerivedStats.objects.filter(character__in=characters).exists())
+
+    def test_run_and_compare(self):
+        users = generate_characters(4, users=1, prefix='timed')
+        result = run_benchmark(users[0], requests=2, names={'detail', 'update', 'ajax_skills'})
+        self.assertEqual(set(result['views']), {'detail', 'update', 'ajax_skills'})
+        for row in result['views'].values():
+            self.assertEqual(row['errors'], 0)
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+
+        baseline = json.loads(json.dumps(result))
+        baseline['views']['detail']['queries'] -= 1
+        regressed = {row['view'] for row in compare_results(result, baseline) if row['regressed']}
+        self.assertEqual(regressed, {'detail'})
+
+
+class MicrobenchTests(TestCase):
+    def test_cases_run_without_queries(self):
+        results = run_microbenchmarks({'speed', 'validate_point_buy'}, repeat=1)
+        self.assertEqual(set(results), {'speed', 'validate_point_buy'})
+        for result in results.values():
+            self.assertGreater(result['ns_per_op'], 0)
+            self.assertGreaterEqual(result['alloc_bytes_per_op'], 0)
+
+    def test_querying_case_fails(self):
+        with self.assertRaises(QueryInBenchmark):
+            measure(lambda: Skill.objects.count(), repeat=1)
+
+    def test_regressions_against_baseline(self):
+        baseline = {
+            'speed': {'ns_per_op': 1000.0, 'alloc_bytes_per_op': 500},
+            'armor_class': {'ns_per_op': 1000.0, 'alloc_bytes_per_op': 500},
+        }
+        results = {
+            'speed': {'ns_per_op': 1200.0, 'alloc_bytes_per_op': 520},
+            'armor_class': {'ns_per_op': 1500.0, 'alloc_bytes_per_op': 500},
+        }
+        self.assertEqual(list(find_regressions(results, baseline, threshold=0.3)), ['armor_class'])
+
+    def test_committed_baseline_covers_every_case(self):
+        baseline = json.loads(MICROBENCH_BASELINE.read_text())
+        self.assertEqual(set(baseline['cases']), {case.name for case in MICRO_CASES})
+
+
+class LoadTestTests(TestCase):
+    def setUp(self):
+        generate_characters(3, users=1, prefix='player')
+        # Like the test client: raw WSGI requests would otherwise close the test connection
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+    def test_player_session(self):
+        config = LoadConfig(usernames=('player-0',), password='player', duration=60, requests=15, seed=2)
+        result = run_player(0, config)
+        actions = [action for action, _, _, _ in result['records']]
+        self.assertGreaterEqual(len(actions), 15)
+        self.assertEqual([record for record in result['records'] if record[2] >= 400], [])
+        # Logged in: pages render instead of redirecting to the login form
+        pages = [record for record in result['records'] if record[0] in ('list', 'sheet', 'edit_form')]
+        self.assertTrue(pages)
+        self.assertEqual({status for _, _, status, _ in pages}, {200})
+
+        summary = summarize_load([result], workers=1)
+        self.assertEqual(summary['requests'], len(actions))
+        self.assertEqual(summary['lock_errors'], 0)
+        self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+
+    def test_transaction_start_and_commit_count_as_write_time(self):
+        player = Player(None, 'player-0', 'player', random.Random(0))
+        slow = lambda *args: time.sleep(0.01)  # noqa: E731
+        player.statement_wrapper(slow, 'SELECT 1', None, False, {})
+        self.assertEqual(player.write_time, 0)
+        player.statement_wrapper(slow, 'BEGIN IMMEDIATE', None, False, {})
+        player.timed_commit(slow)()
+        self.assertGreaterEqual(player.write_time, 0.02)
+
+    def test_lock_errors_are_counted(self):
+        from DnD_character_sheet_creator.wsgi import application
+
+        def locked(execute, sql, params, many, context):
+            if sql.startswith('UPDATE "base_character"'):
+                raise OperationalError('database is locked')
+            return execute(sql, params, many, context)
+
+        player = Player(application, 'player-0', 'player', random.Random(0))
+        player.login()
+        with connection.execute_wrapper(player.statement_wrapper), connection.execute_wrapper(locked):
+            with self.assertLogs('django.request', 'ERROR'):
+                character = Character.objects.prefetch_related(
+                    'characterskillproficiency_set', 'feats', 'languages'
+                ).get(pk=player.character_ids[0])
+                player.post('edit', reverse('character-update', args=[character.pk]), character_form_data(character))
+
+        self.assertEqual(player.records[-1][2:], (500, True))
+        result = {'records': player.records, 'write_time_ms': player.write_time * 1000, 'seconds': 1}
+        summary = summarize_load([result], workers=1)
+        self.assertEqual((summary['errors'], summary['lock_errors']), (1, 1))
+        self.assertGreater(summary['write_time_ms'], 0)
+
+
+class SqliteProfileTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_new_connections(self):
+        default = self.pragma('cache_size')
+        self.addCleanup(connection.cursor().execute, f'PRAGMA cache_size = {default}')
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -1234, 'busy_timeout': 2500}):
+            connection_created.send(sender=connection.__class__, connection=connection)
+        self.assertEqual((self.pragma('cache_size'), self.pragma('busy_timeout')), (-1234, 2500))
+
+    def test_stock_profile_leaves_connections_alone(self):
+        default = self.pragma('cache_size')
+        with override_settings(SQLITE_PRAGMAS={}):
+            connection_created.send(sender=connection.__class__, connection=connection)
+        self.assertEqual(self.pragma('cache_size'), default)
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN for every query the hot views run."""
+    # Reference tables read whole on purpose, as form dropdown choices
+    WHOLE_TABLE_READS = {model._meta.db_table for model in (CharacterClass, Subclass, Background, Language, Feat)}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = generate_characters(40, users=1, prefix='planner')[0]
+        cls.character = Character.objects.filter(user=cls.user, spells__isnull=False).first()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        cache.clear()  # cold fragment cache, but a loaded rules catalog
+        get_rules_catalog()
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
+
+    def capture_plans(self, method, url, data=None, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            resp = getattr(self.client, method)(url, data, **extra)
+        self.assertLess(resp.status_code, 400)
+        return [
+            (query['sql'], self.query_plan(query['sql']))
+            for query in queries.captured_queries if query['sql'].startswith('SELECT')
+        ]
+
+    def assertNoFullScans(self, method, url, data=None, **extra):
+        for sql, plan in self.capture_plans(method, url, data, **extra):
+            for step in plan:
+                # "SCAN t" reads the whole table; "SCAN t USING [COVERING] INDEX" walks an index
+                if step.startswith('SCAN ') and ' INDEX ' not in step and step != 'SCAN CONSTANT ROW':
+                    self.assertIn(step.split()[1], self.WHOLE_TABLE_READS, f'{url}: {step}\n{sql}')
+
+    def test_character_list(self):
+        for params in ({}, {'sort': 'hp'}, {'sort': 'ac'}, {'search': 'synth'}, {'min_ac': 10}, {'min_hp': 5}):
+            self.assertNoFullScans('get', reverse('characters'), params)
+
+    def test_character_pages(self):
+        for name in ('character', 'character_sheet_api', 'character-update', 'character_spells', 'character_spells_api'):
+            self.assertNoFullScans('get', reverse(name, args=[self.character.pk]))
+        character = Character.objects.prefetch_related('characterskillproficiency_set', 'feats', 'languages').get(
+            pk=self.character.pk
+        )
+        self.assertNoFullScans('post', reverse('character-update', args=[character.pk]), character_form_data(character))
+        self.assertNoFullScans(
+            'post', reverse('character_spells', args=[character.pk]),
+            {'spells': list(character.spells.values_list('pk', flat=True))},
+        )
+
+    def test_lookups(self):
+        class_lookup = {'class_id': self.character.character_class_id}
+        self.assertNoFullScans('get', reverse('subclasses_for_class'), class_lookup)
+        self.assertNoFullScans('get', reverse('skills_for_class'), class_lookup)
+        self.assertNoFullScans('get', reverse('spell_search'), {'q': 'fire'})
+        self.assertNoFullScans('get', reverse('spell_detail', args=[self.character.spells.first().pk]))
+
+    def test_sorted_pages_follow_an_index(self):
+        for sort, index in (('created', 'character_user_created_idx'), ('hp', 'character_user_hp_idx')):
+            resp = self.client.get(reverse('characters'), {'sort': sort})
+            next_page = f"{reverse('characters')}?{resp.context['next_page_query']}"
+            for url, data in ((reverse('characters'), {'sort': sort}), (next_page, None)):
+                page_query = [
+                    plan for sql, plan in self.capture_plans('get', url, data)
+                    if sql.startswith('SELECT "base_character"."id"') and 'LIMIT' in sql
+                ]
+                self.assertEqual(len(page_query), 1)
+                self.assertIn(index, page_query[0][0])
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', page_query[0])
+
+
+class SpellSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='pass')
+        self.client.force_login(self.user)
+
+    def test_search_ranks_name_matches_first(self):
+        resp = self.client.get(reverse('spell_search'), {'q': 'fire'})
+        results = resp.json()['results']
+        self.assertTrue(results)
+        self.assertIn('fire', results[0]['name'].lower())
+
+    def test_search_filters_by_class_eligibility(self):
+        wizard = CharacterClass.objects.get(name='Wizard')
+        resp = self.client.get(reverse('spell_search'), {'q': 'damage', 'class_id': wizard.pk, 'level': 1})
+        ids = [r['id'] for r in resp.json()['results']]
+        self.assertTrue(ids)
+        eligible = set(ClassSpell.objects.filter(
+            character_class=wizard, unlock_level__lte=1
+        ).values_list('spell_id', flat=True))
+        self.assertTrue(set(ids) <= eligible)
+
+    def test_page_is_validated_and_clamped(self):
+        url = reverse('spell_search')
+        self.assertEqual(self.client.get(url, {'q': 'fire', 'page': 'two'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'fire', 'page': 0}).json()['page'], 1)
+        resp = self.client.get(url, {'q': 'fire', 'page': '9' * 20})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.json()['page'], resp.json()['results']), (MAX_PAGE, []))
+        self.assertEqual(self.client.post(url, {'q': 'fire'}).status_code, 405)
+
+    def test_non_integer_character_is_a_bad_request(self):
+        resp = self.client.get(reverse('spell_search'), {'q': 'fire', 'character': 'abc'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('error', resp.json())
+
+    def test_index_follows_spell_changes(self):
+        spell = Spell.objects.create(
+            name='Zyxwv Blast', desc='A test spell.', page='1', range='Self',
+            components='V', duration='Instantaneous', casting_time='1 action',
+            level=1, school='Evocation',
+        )
+        spells, _ = search_spells('zyxwv')
+        self.assertEqual([s.pk for s in spells], [spell.pk])
+
+        spell.name = 'Renamed Blast'
+        spell.save()
+        self.assertEqual(search_spells('zyxwv')[0], [])
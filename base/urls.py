@@ -18,5 +18,14 @@ urlpatterns = [
     path('character-delete/<int:pk>/', CharacterDelete.as_view(), name='character-delete'),
     path("ajax/subclasses/", views.subclasses_for_class, name="subclasses_for_class"),
     path('character/<int:pk>/spells/', character_spells, name='character_spells'),
+    path('character/<int:pk>/pdf/', views.character_pdf, name='character-pdf'),
+    path('characters/export.zip', views.characters_pdf_zip, name='characters-pdf-zip'),
+    path('characters/export/', views.characters_export, name='characters-export'),
+    path('characters/import/', views.character_import, name='character-import'),
     path('api/skills-for-class/', views.skills_for_class, name='skills_for_class'),
+    path('api/characters/<int:pk>/sheet/', views.character_sheet_api, name='character_sheet_api'),
+    path('api/characters/<int:pk>/spells/', views.character_spells_api, name='character_spells_api'),
+    path('api/spells/search/', views.spell_search, name='spell_search'),
+    path('api/spells/<int:pk>/', views.spell_detail, name='spell_detail'),
+    path('api/fragment-cache/stats/', views.fragment_cache_stats, name='fragment_cache_stats'),
 ]
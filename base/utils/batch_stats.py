@@ -0,0 +1,231 @@
+"""
+Vectorized stat engine for recomputing many characters at once.
+
+Takes columnar arrays (one entry per character) instead of Character
+instances and computes ability totals/modifiers, hit dice, hit points,
+proficiency bonus, initiative and best AC in a single NumPy pass. The
+formulas mirror the scalar Character properties exactly.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.db.models import Q
+
+from base.models import (
+    DEFAULT_HIT_DIE,
+    HIT_DICE_TABLE,
+    AbilityScoreChoices,
+    Armor,
+    Character,
+    InventoryItem,
+    Shield,
+)
+from base.utils.rules_catalog import get_rules_catalog
+
+ABILITIES = tuple(AbilityScoreChoices.values)
+
+# Stand-in for "no Dex cap" so min(dex_mod, cap) is a no-op
+NO_DEX_CAP = np.iinfo(np.int64).max
+
+
+@dataclass(frozen=True)
+class CharacterColumns:
+    """
+    Columnar character data. `scores` is (N, 6) in ABILITIES order; missing
+    class/subclass/race ids are 0. Inventory gear is given as parallel
+    (owner index, item id) arrays, one entry per inventory row.
+    """
+    character_ids: np.ndarray
+    scores: np.ndarray
+    levels: np.ndarray
+    class_ids: np.ndarray
+    subclass_ids: np.ndarray
+    race_ids: np.ndarray
+    gear_owners: np.ndarray
+    gear_item_ids: np.ndarray
+
+    def __len__(self):
+        return len(self.character_ids)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Loads columns for a Character queryset in two queries."""
+        rows = list(
+            queryset.order_by('pk').values_list(
+                'pk', *ABILITIES, 'level',
+                'character_class_id', 'subclass_id', 'race_id',
+            )
+        )
+        data = np.array(
+            [[value or 0 for value in row] for row in rows], dtype=np.int64
+        ).reshape(len(rows), len(ABILITIES) + 5)
+
+        character_ids = data[:, 0]
+        gear = np.array(
+            InventoryItem.objects.filter(
+                character__in=queryset.values('pk'),
+            ).filter(
+                Q(item__armor__isnull=False) | Q(item__shield__isnull=False)
+            ).values_list('character_id', 'item_id'),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+
+        return cls(
+            character_ids=character_ids,
+            scores=data[:, 1:7],
+            levels=data[:, 7],
+            class_ids=data[:, 8],
+            subclass_ids=data[:, 9],
+            race_ids=data[:, 10],
+            gear_owners=np.searchsorted(character_ids, gear[:, 0]),
+            gear_item_ids=gear[:, 1],
+        )
+
+
+@dataclass(frozen=True)
+class GearTable:
+    """Armor and shield stats as dense arrays indexed by item id."""
+    is_armor: np.ndarray
+    base_ac: np.ndarray
+    adds_dex: np.ndarray
+    dex_cap: np.ndarray
+    shield_bonus: np.ndarray
+
+    @classmethod
+    def load(cls):
+        armors = list(Armor.objects.all())
+        shields = list(Shield.objects.all())
+        size = max([a.item_id for a in armors] + [s.item_id for s in shields] + [0]) + 1
+
+        table = cls(
+            is_armor=np.zeros(size, dtype=bool),
+            base_ac=np.zeros(size, dtype=np.int64),
+            adds_dex=np.zeros(size, dtype=bool),
+            dex_cap=np.full(size, NO_DEX_CAP, dtype=np.int64),
+            shield_bonus=np.zeros(size, dtype=np.int64),
+        )
+        for armor in armors:
+            table.is_armor[armor.item_id] = True
+            table.base_ac[armor.item_id] = armor.base_ac
+            table.adds_dex[armor.item_id] = armor.adds_dex
+            if armor.max_dex_bonus is not None:
+                table.dex_cap[armor.item_id] = armor.max_dex_bonus
+        for shield in shields:
+            table.shield_bonus[shield.item_id] = shield.ac_bonus
+        return table
+
+    def lookup(self, array, item_ids, default=0):
+        """Reads `array` at item_ids, using `default` for ids outside the table."""
+        known = item_ids < len(array)
+        return np.where(known, array[np.where(known, item_ids, 0)], default)
+
+
+def _table_by_id(values, default, dtype=np.int64):
+    """Dense lookup array from an {id: value} mapping; index 0 holds the default."""
+    size = max(list(values) + [0]) + 1
+    table = np.full(size, default, dtype=dtype)
+    for key, value in values.items():
+        table[key] = value
+    return table
+
+
+def _unique_rows(index):
+    """Distinct rule rows of a (class_id, subclass_id, level) index that belong to a class."""
+    rows = {}
+    for group in index.values():
+        for row in group:
+            if row.character_class_id:
+                rows[row.pk] = row
+    return list(rows.values())
+
+
+def compute_batch_stats(columns, catalog=None, gear=None):
+    """
+    Computes stats for every character in `columns`. Returns a dict of
+    arrays aligned with `columns.character_ids`.
+    """
+    catalog = catalog or get_rules_catalog()
+    gear = gear or GearTable.load()
+    n = len(columns)
+
+    # Racial totals and modifiers
+    race_table = np.zeros((max(list(catalog.race_modifiers) + [0]) + 1, len(ABILITIES)), dtype=np.int64)
+    for race_id, modifiers in catalog.race_modifiers.items():
+        for position, ability in enumerate(ABILITIES):
+            race_table[race_id, position] = modifiers.get(ability, 0)
+    race_ids = np.where(columns.race_ids < len(race_table), columns.race_ids, 0)
+    totals = columns.scores + race_table[race_ids]
+    modifiers = (totals - 10) // 2
+    dex_i, con_i, int_i, wis_i = (ABILITIES.index(a) for a in (
+        'dexterity', 'constitution', 'intelligence', 'wisdom'))
+
+    # Hit dice / hit points (base Constitution, as in calculate_hit_points)
+    hit_die_table = _table_by_id(
+        {pk: HIT_DICE_TABLE.get(c.name, DEFAULT_HIT_DIE) for pk, c in catalog.classes.items()},
+        DEFAULT_HIT_DIE,
+    )
+    class_ids = np.where(columns.class_ids < len(hit_die_table), columns.class_ids, 0)
+    hit_dice = hit_die_table[class_ids]
+    base_con_mod = (columns.scores[:, con_i] - 10) // 2
+    hit_points = hit_dice + base_con_mod + (columns.levels - 1) * ((hit_dice // 2) + 1 + base_con_mod)
+
+    proficiency_bonus = 2 + (columns.levels - 1) // 4
+    initiative = (columns.scores[:, dex_i] - 10) // 2
+
+    # Armor Class: unarmored, armor (+shield), class formulas, then flat bonuses
+    dex_mod = modifiers[:, dex_i]
+    best_ac = 10 + dex_mod
+
+    owners = columns.gear_owners
+    item_ids = columns.gear_item_ids
+    shield_bonus = np.zeros(n, dtype=np.int64)
+    np.maximum.at(shield_bonus, owners, gear.lookup(gear.shield_bonus, item_ids))
+
+    is_armor = gear.lookup(gear.is_armor, item_ids, default=False).astype(bool)
+    armor_owners = owners[is_armor]
+    armor_items = item_ids[is_armor]
+    owner_dex = dex_mod[armor_owners]
+    armor_ac = (
+        gear.base_ac[armor_items]
+        + np.where(gear.adds_dex[armor_items], np.minimum(owner_dex, gear.dex_cap[armor_items]), 0)
+        + shield_bonus[armor_owners]
+    )
+    np.maximum.at(best_ac, armor_owners, armor_ac)
+
+    def rule_applies(row):
+        mask = (columns.class_ids == row.character_class_id) & (columns.levels >= row.min_level)
+        if row.subclass_id:
+            mask &= columns.subclass_ids == row.subclass_id
+        return mask
+
+    for formula in _unique_rows(catalog.ac_formulas):
+        ac = (
+            formula.base
+            + formula.use_dex * dex_mod
+            + formula.use_wis * modifiers[:, wis_i]
+            + formula.use_con * modifiers[:, con_i]
+            + formula.use_int * modifiers[:, int_i]
+        )
+        best_ac = np.where(rule_applies(formula), np.maximum(best_ac, ac), best_ac)
+
+    flat_bonus = np.zeros(n, dtype=np.int64)
+    for bonus in _unique_rows(catalog.ac_bonuses):
+        flat_bonus += np.where(rule_applies(bonus), bonus.flat_bonus, 0)
+
+    return {
+        'character_id': columns.character_ids,
+        'totals': totals,
+        'modifiers': modifiers,
+        'hit_dice': hit_dice,
+        'hit_points': hit_points,
+        'proficiency_bonus': proficiency_bonus,
+        'initiative': initiative,
+        'armor_class': best_ac + flat_bonus,
+    }
+
+
+def compute_stats_for(queryset=None):
+    """Convenience wrapper: loads columns for a queryset and computes them."""
+    if queryset is None:
+        queryset = Character.objects.all()
+    return compute_batch_stats(CharacterColumns.from_queryset(queryset))
@@ -0,0 +1,226 @@
+"""
+End-to-end benchmark of the character views.
+
+Every scenario is a request sent through the Django test client, so the
+timings cover middleware, views, forms, templates and the database, but no
+network or server process. Characters are picked at random (seeded) from
+one benchmark account; each request is timed and its queries counted.
+Results are plain JSON so they can be saved as a baseline and compared.
+"""
+import platform
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import get_runner
+from django.urls import reverse
+
+from base.models import Character
+from base.utils.profiling import percentile
+from base.utils.rules_catalog import get_rules_catalog
+
+SPELL_SEARCH_TERMS = ("fire", "heal", "light", "shield", "charm", "cold", "water", "speak")
+
+
+@contextmanager
+def benchmark_database(path, keepdb=False):
+    """
+    Points the default database at a separate SQLite file for the block. The
+    test runner creates (or, with `keepdb`, reuses) it, so the real database
+    is never touched.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection.settings_dict.setdefault("TEST", {})["NAME"] = str(path)
+    runner = get_runner(settings)(verbosity=0, keepdb=keepdb)
+    runner.setup_test_environment()
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        runner.teardown_test_environment()
+
+
+def character_form_data(character, **changes):
+    """POST data for CharacterForm that re-submits a saved character."""
+    data = {
+        "character_name": character.character_name,
+        "character_class": character.character_class_id,
+        "subclass": character.subclass_id,
+        "race": character.race_id,
+        "background": character.background_id,
+        "level": character.level,
+        "alignment": character.alignment,
+        "experience_points": character.experience_points,
+        "backstory": character.backstory,
+        "skills": [row.skill_id for row in character.characterskillproficiency_set.all()],
+        "feats": [feat.pk for feat in character.feats.all()],
+        "languages": [language.pk for language in character.languages.all()],
+    }
+    for ability in ("strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma"):
+        data[ability] = getattr(character, ability)
+    if character.inspiration:
+        data["inspiration"] = "on"
+    data.update(changes)
+    return {name: "" if value is None else value for name, value in data.items()}
+
+
+class BenchContext:
+    """State shared by the scenarios: the client, the account and a seeded RNG."""
+
+    def __init__(self, user, seed=0):
+        self.user = user
+        self.rng = random.Random(seed)
+        self.client = Client()
+        self.client.force_login(user)
+        self.character_ids = list(Character.objects.filter(user=user).values_list("pk", flat=True))
+        if not self.character_ids:
+            raise ValueError(f"{user} has no characters to benchmark")
+        self.class_ids = sorted(get_rules_catalog().classes)
+
+    def character_id(self):
+        return self.rng.choice(self.character_ids)
+
+    def character(self):
+        return Character.objects.prefetch_related(
+            "characterskillproficiency_set", "feats", "languages", "spells"
+        ).get(pk=self.character_id())
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    method: str
+    # BenchContext -> (url, data); runs before the timer starts
+    build: object
+
+
+def _create(ctx):
+    return reverse("character-create"), character_form_data(ctx.character(), character_name="Bench copy")
+
+
+def _update(ctx):
+    character = ctx.character()
+    return reverse("character-update", args=[character.pk]), character_form_data(character)
+
+
+def _spells_save(ctx):
+    character = ctx.character()
+    return reverse("character_spells", args=[character.pk]), {"spells": [s.pk for s in character.spells.all()]}
+
+
+def _class_lookup(url_name):
+    return lambda ctx: (reverse(url_name), {"class_id": ctx.rng.choice(ctx.class_ids)})
+
+
+def _character_page(url_name):
+    return lambda ctx: (reverse(url_name, args=[ctx.character_id()]), None)
+
+
+SCENARIOS = (
+    Scenario("list", "get", lambda ctx: (reverse("characters"), None)),
+    Scenario("list_sorted_by_ac", "get", lambda ctx: (reverse("characters"), {"sort": "ac"})),
+    Scenario("detail", "get", _character_page("character")),
+    Scenario("sheet_api", "get", _character_page("character_sheet_api")),
+    Scenario("create_form", "get", lambda ctx: (reverse("character-create"), None)),
+    Scenario("create", "post", _create),
+    Scenario("update_form", "get", _character_page("character-update")),
+    Scenario("update", "post", _update),
+    Scenario("spells", "get", _character_page("character_spells")),
+    Scenario("spells_save", "post", _spells_save),
+    Scenario("ajax_subclasses", "get", _class_lookup("subclasses_for_class")),
+    Scenario("ajax_skills", "get", _class_lookup("skills_for_class")),
+    Scenario("spell_search", "get", lambda ctx: (reverse("spell_search"), {"q": ctx.rng.choice(SPELL_SEARCH_TERMS)})),
+)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_scenario(ctx, scenario, requests):
+    """Times `requests` requests (after one untimed warm-up). Returns the summary dict."""
+    timings, queries, errors = [], [], 0
+    for i in range(requests + 1):
+        url, data = scenario.build(ctx)
+        counter = _QueryCounter()
+        with connections["default"].execute_wrapper(counter):
+            started = time.perf_counter()
+            response = getattr(ctx.client, scenario.method)(url, data)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            errors += 1
+        if i:
+            timings.append(elapsed * 1000)
+            queries.append(counter.count)
+
+    timings.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "queries": max(queries),
+    }
+
+
+def run_benchmark(user, requests=50, seed=0, names=None, progress=None):
+    """Runs the scenarios (all, or those in `names`) as `user`; returns the result dict."""
+    ctx = BenchContext(user, seed)
+    views = {}
+    for scenario in SCENARIOS:
+        if names and scenario.name not in names:
+            continue
+        views[scenario.name] = run_scenario(ctx, scenario, requests)
+        if progress:
+            progress(scenario.name, views[scenario.name])
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "characters": Character.objects.count(),
+            "user_characters": len(ctx.character_ids),
+            "requests": requests,
+            "seed": seed,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "views": views,
+    }
+
+
+def compare_results(result, baseline, tolerance=0.25):
+    """
+    Rows comparing each view with the baseline. A view regresses when its
+    p95 grows by more than `tolerance` or it issues more queries.
+    """
+    rows = []
+    for name, current in result["views"].items():
+        previous = baseline.get("views", {}).get(name)
+        if previous is None:
+            continue
+        change = current["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        rows.append({
+            "view": name,
+            "p95_ms": current["p95_ms"],
+            "baseline_p95_ms": previous["p95_ms"],
+            "change": change,
+            "queries": current["queries"],
+            "baseline_queries": previous["queries"],
+            "regressed": change > tolerance or current["queries"] > previous["queries"],
+        })
+    return rows
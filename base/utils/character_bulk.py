@@ -0,0 +1,191 @@
+"""
+Bulk creation of characters together with their related rows.
+
+Importers resolve names through a `NameIndex`, build unsaved
+`CharacterRecord`s and hand them over in batches; each batch is written with
+one bulk_create per table inside a transaction instead of a Character.save()
+(plus its queries) per character.
+"""
+from dataclasses import dataclass, field
+
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from base.models import (
+    Background,
+    BackgroundSkillProficiency,
+    Character,
+    CharacterClass,
+    CharacterSkillProficiency,
+    Feat,
+    InventoryItem,
+    Item,
+    Language,
+    Race,
+    Skill,
+    Spell,
+    Subclass,
+)
+from base.signals import character_row_signals_muted
+from base.utils.derived_stats import refresh_derived_stats
+
+BULK_BATCH_SIZE = 200
+
+# Resolved through the NameIndex already; validating them would query per record
+RESOLVED_FIELDS = ["user", "character_class", "subclass", "race", "background"]
+
+
+def validation_message(exc):
+    if hasattr(exc, "error_dict"):
+        return "; ".join(f"{name}: {' '.join(messages)}" for name, messages in exc.message_dict.items())
+    return "; ".join(exc.messages)
+
+
+def _by_name(queryset):
+    return {obj.name.strip().lower(): obj for obj in queryset}
+
+
+@dataclass(frozen=True)
+class NameIndex:
+    """Lower-cased name -> row lookups for everything an imported character refers to."""
+    classes: dict
+    subclasses: dict  # (class_id, name)
+    races: dict
+    backgrounds: dict
+    background_skills: dict  # background_id -> {skill_id}
+    items: dict
+    languages: dict
+    skills: dict
+    spells: dict
+    feats: dict
+
+    @classmethod
+    def load(cls):
+        background_skills = {}
+        for row in BackgroundSkillProficiency.objects.all():
+            background_skills.setdefault(row.background_id, set()).add(row.skill_id)
+        return cls(
+            classes=_by_name(CharacterClass.objects.all()),
+            subclasses={
+                (s.character_class_id, s.name.strip().lower()): s for s in Subclass.objects.all()
+            },
+            races=_by_name(Race.objects.all()),
+            backgrounds=_by_name(Background.objects.all()),
+            background_skills=background_skills,
+            items=_by_name(Item.objects.order_by('-pk')),  # first row wins on duplicate names
+            languages=_by_name(Language.objects.all()),
+            skills=_by_name(Skill.objects.all()),
+            spells=_by_name(Spell.objects.only('pk', 'name', 'level')),
+            feats=_by_name(Feat.objects.only('pk', 'name')),
+        )
+
+
+@dataclass
+class CharacterRecord:
+    character: Character
+    skill_ids: list = field(default_factory=list)
+    inventory: list = field(default_factory=list)  # (item_id, quantity) pairs
+    language_ids: list = field(default_factory=list)
+    spell_ids: list = field(default_factory=list)
+    feat_ids: list = field(default_factory=list)
+
+
+def bulk_create_characters(records):
+    """
+    Creates the characters of `records` and all their related rows in one
+    transaction, then materializes their derived stats. Returns the saved
+    characters.
+    """
+    characters = [record.character for record in records]
+    for character in characters:
+        character.apply_calculated_fields()
+
+    with transaction.atomic():
+        Character.objects.bulk_create(characters)
+
+        skills, inventory, languages, spells, feats = [], [], [], [], []
+        Languages = Character.languages.through
+        Spells = Character.spells.through
+        Feats = Character.feats.through
+        for record in records:
+            character_id = record.character.pk
+            skills += [
+                CharacterSkillProficiency(character_id=character_id, skill_id=skill_id)
+                for skill_id in set(record.skill_ids)
+            ]
+            inventory += [
+                InventoryItem(character_id=character_id, item_id=item_id, quantity=quantity)
+                for item_id, quantity in record.inventory
+            ]
+            languages += [
+                Languages(character_id=character_id, language_id=pk) for pk in set(record.language_ids)
+            ]
+            spells += [Spells(character_id=character_id, spell_id=pk) for pk in set(record.spell_ids)]
+            feats += [Feats(character_id=character_id, feat_id=pk) for pk in set(record.feat_ids)]
+
+        CharacterSkillProficiency.objects.bulk_create(skills)
+        InventoryItem.objects.bulk_create(inventory)
+        Languages.objects.bulk_create(languages)
+        Spells.objects.bulk_create(spells)
+        Feats.objects.bulk_create(feats)
+
+        refresh_derived_stats([character.pk for character in characters])
+    return characters
+
+
+def set_skill_proficiencies(character, skill_ids):
+    """
+    Replaces the class skill proficiencies of a saved character with one
+    DELETE and one bulk INSERT. The per-row signal handlers are muted, so the
+    version bump and derived stats refresh run once here instead of per row.
+    """
+    selected = set(skill_ids)
+    current = set(
+        CharacterSkillProficiency.objects.filter(character=character).values_list('skill_id', flat=True)
+    )
+    if selected == current:
+        return
+
+    with transaction.atomic(), character_row_signals_muted():
+        CharacterSkillProficiency.objects.filter(character=character, skill_id__in=current - selected).delete()
+        CharacterSkillProficiency.objects.bulk_create(
+            CharacterSkillProficiency(character=character, skill_id=skill_id) for skill_id in selected - current
+        )
+        Character.objects.filter(pk=character.pk).update(version=F('version') + 1)
+        refresh_derived_stats([character.pk])
+    character.refresh_from_db(fields=['version'])
+
+
+@dataclass
+class ImportReport:
+    """Created characters, per-source errors and warnings, and throughput of an import."""
+    created: list = field(default_factory=list)   # (source, character id)
+    errors: dict = field(default_factory=dict)     # source -> message
+    warnings: dict = field(default_factory=dict)   # source -> [messages]
+    elapsed: float = 0.0
+
+    @property
+    def per_second(self):
+        return len(self.created) / self.elapsed if self.elapsed else 0.0
+
+
+def write_records(batch, report):
+    """
+    Writes `batch`, a list of (source, CharacterRecord), with
+    bulk_create_characters and records the outcome in `report`. When the
+    batch fails in the database, its records are retried one at a time so
+    only the sources that cannot be written are reported as errors.
+    """
+    try:
+        characters = bulk_create_characters([record for _, record in batch])
+    except DatabaseError as exc:
+        if len(batch) == 1:
+            report.errors[batch[0][0]] = f"{type(exc).__name__}: {exc}"
+            return
+        for source, record in batch:
+            # The rolled-back insert may have assigned primary keys
+            record.character.pk = None
+            record.character._state.adding = True
+            write_records([(source, record)], report)
+    else:
+        report.created += [(source, character.pk) for (source, _), character in zip(batch, characters)]
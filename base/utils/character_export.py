@@ -0,0 +1,120 @@
+"""
+Streaming NDJSON / CSV export of characters.
+
+Characters are walked with .iterator(chunk_size=...) so only one chunk and
+its prefetched rows are in memory at a time; Django runs the prefetches
+once per chunk. Related rows are exported by name, which keeps the records
+valid across databases whose ids differ.
+"""
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from base.models import CharacterSkillProficiency, Feat, InventoryItem, Language, Spell
+
+CHARACTER_EXPORT_CHUNK_SIZE = 500
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+SCALAR_FIELDS = (
+    "id", "user", "character_name", "character_class", "subclass", "race", "background",
+    "level", "alignment", "experience_points",
+    "strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma",
+    "hit_points", "temporary_hit_points", "death_saves_success", "death_saves_failure",
+    "inspiration", "backstory", "created_at",
+)
+# Exported as JSON arrays (in CSV too, so names containing commas survive)
+LIST_FIELDS = ("skills", "inventory", "languages", "spells", "feats")
+
+
+def export_characters_queryset(queryset):
+    return queryset.select_related(
+        "user", "character_class", "subclass", "race", "background",
+    ).prefetch_related(
+        Prefetch(
+            "characterskillproficiency_set",
+            queryset=CharacterSkillProficiency.objects.select_related("skill"),
+        ),
+        Prefetch("inventory", queryset=InventoryItem.objects.select_related("item").only(
+            "character_id", "item", "quantity", "item__name",
+        )),
+        Prefetch("languages", queryset=Language.objects.only("name")),
+        Prefetch("spells", queryset=Spell.objects.only("name")),
+        Prefetch("feats", queryset=Feat.objects.only("name")),
+    ).order_by("pk")
+
+
+def _name(obj):
+    return obj.name if obj is not None else None
+
+
+def character_record(character):
+    """A character loaded through export_characters_queryset() as a plain dict."""
+    return {
+        "id": character.pk,
+        "user": character.user.username,
+        "character_name": character.character_name,
+        "character_class": _name(character.character_class),
+        "subclass": _name(character.subclass),
+        "race": _name(character.race),
+        "background": _name(character.background),
+        "level": character.level,
+        "alignment": character.alignment,
+        "experience_points": character.experience_points,
+        "strength": character.strength,
+        "dexterity": character.dexterity,
+        "constitution": character.constitution,
+        "intelligence": character.intelligence,
+        "wisdom": character.wisdom,
+        "charisma": character.charisma,
+        "hit_points": character.hit_points,
+        "temporary_hit_points": character.temporary_hit_points,
+        "death_saves_success": character.death_saves_success,
+        "death_saves_failure": character.death_saves_failure,
+        "inspiration": character.inspiration,
+        "backstory": character.backstory,
+        "created_at": character.created_at.isoformat() if character.created_at else None,
+        "skills": sorted(row.skill.name for row in character.characterskillproficiency_set.all()),
+        "inventory": [
+            {"item": row.item.name, "quantity": row.quantity} for row in character.inventory.all()
+        ],
+        "languages": sorted(language.name for language in character.languages.all()),
+        "spells": sorted(spell.name for spell in character.spells.all()),
+        "feats": sorted(feat.name for feat in character.feats.all()),
+    }
+
+
+def iter_character_records(queryset, chunk_size=CHARACTER_EXPORT_CHUNK_SIZE):
+    for character in export_characters_queryset(queryset).iterator(chunk_size=chunk_size):
+        yield character_record(character)
+
+
+def iter_ndjson(queryset, chunk_size=CHARACTER_EXPORT_CHUNK_SIZE):
+    for record in iter_character_records(queryset, chunk_size):
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, chunk_size=CHARACTER_EXPORT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(SCALAR_FIELDS + LIST_FIELDS)
+    for record in iter_character_records(queryset, chunk_size):
+        yield writer.writerow(
+            [record[name] for name in SCALAR_FIELDS]
+            + [json.dumps(record[name], ensure_ascii=False) for name in LIST_FIELDS]
+        )
+
+
+EXPORT_WRITERS = {
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+}
@@ -0,0 +1,223 @@
+"""
+Parallel import of characters from NDJSON (the export_characters format).
+
+The file is read in chunks of lines. Each chunk is validated in a worker
+process: names are resolved through a NameIndex, then field validators,
+Character.validate_point_buy and the spell limits run on the unsaved
+character. Workers send back plain field values and related ids; the main
+process writes them with bulk_create_characters in batches. At most a few
+chunks are in flight, so memory does not grow with the file.
+"""
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+import django
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+
+from base.forms import spell_limit_errors
+from base.models import Alignment, Character
+from base.utils.character_bulk import (
+    RESOLVED_FIELDS,
+    CharacterRecord,
+    ImportReport,
+    NameIndex,
+    validation_message,
+    write_records,
+)
+
+IMPORT_CHUNK_LINES = 500
+IMPORT_BATCH_SIZE = 2000
+MAX_WORKERS = 8
+
+SCORE_FIELDS = ("strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma")
+PLAIN_FIELDS = SCORE_FIELDS + (
+    "character_name", "level", "alignment", "experience_points", "hit_points",
+    "temporary_hit_points", "death_saves_success", "death_saves_failure",
+    "inspiration", "backstory",
+)
+
+# Loaded once per worker process by _get_worker_index()
+_worker_index = None
+
+
+class RecordImportError(ValueError):
+    pass
+
+
+def _lookup(index, name, kind):
+    obj = index.get(str(name).strip().lower())
+    if obj is None:
+        raise RecordImportError(f"Unknown {kind}: {name}")
+    return obj
+
+
+def _optional(index, name, kind):
+    return _lookup(index, name, kind) if name else None
+
+
+def _inventory_row(index, row):
+    quantity = int(row.get("quantity", 1))
+    if quantity < 1:
+        raise RecordImportError(f"Inventory quantity must be at least 1: {row['item']} x{quantity}")
+    return _lookup(index.items, row["item"], "item").pk, quantity
+
+
+def validate_record(data, index, user_id):
+    """
+    Validates one decoded record. Returns (fields, related) where `fields`
+    are Character constructor arguments and `related` the CharacterRecord ids.
+    """
+    if not data.get("character_class"):
+        raise RecordImportError("character_class is required")
+
+    character_class = _lookup(index.classes, data["character_class"], "class")
+    subclass = None
+    if data.get("subclass"):
+        subclass = index.subclasses.get((character_class.pk, str(data["subclass"]).strip().lower()))
+        if subclass is None:
+            raise RecordImportError(f"Unknown subclass: {data['subclass']}")
+
+    fields = {name: data[name] for name in PLAIN_FIELDS if data.get(name) is not None}
+    fields.update(
+        user_id=user_id,
+        character_class_id=character_class.pk,
+        subclass_id=subclass.pk if subclass else None,
+        race_id=getattr(_optional(index.races, data.get("race"), "race"), "pk", None),
+        background_id=getattr(_optional(index.backgrounds, data.get("background"), "background"), "pk", None),
+    )
+    fields.setdefault("alignment", Alignment.TRUE_NEUTRAL)
+
+    spells = [_lookup(index.spells, name, "spell") for name in data.get("spells") or ()]
+    related = {
+        "skill_ids": [_lookup(index.skills, name, "skill").pk for name in data.get("skills") or ()],
+        "inventory": [_inventory_row(index, row) for row in data.get("inventory") or ()],
+        "language_ids": [_lookup(index.languages, name, "language").pk for name in data.get("languages") or ()],
+        "spell_ids": [spell.pk for spell in spells],
+        "feat_ids": [_lookup(index.feats, name, "feat").pk for name in data.get("feats") or ()],
+    }
+
+    character = Character(**fields)
+    character.character_class = character_class
+    character.apply_calculated_fields()
+    try:
+        character.clean_fields(exclude=RESOLVED_FIELDS)
+        character.validate_point_buy()
+    except ValidationError as exc:
+        raise RecordImportError(validation_message(exc))
+
+    cantrips = sum(1 for spell in spells if spell.level == 0)
+    errors = spell_limit_errors(character, cantrips, len(spells) - cantrips)
+    if errors:
+        raise RecordImportError(" ".join(errors))
+    return fields, related
+
+
+def _user_ids(chunk):
+    names = set()
+    for _, data in chunk:
+        if isinstance(data, dict) and data.get("user"):
+            names.add(data["user"])
+    return dict(User.objects.filter(username__in=names).values_list("username", "pk"))
+
+
+def validate_chunk(chunk, owner_id=None, index=None):
+    """
+    [(line number, text)] -> [(line number, fields, related, error)].
+    Runs in a worker; `index` is only passed when validating inline.
+    """
+    index = index or _get_worker_index()
+    decoded = []
+    for line_no, text in chunk:
+        try:
+            decoded.append((line_no, json.loads(text)))
+        except ValueError as exc:
+            decoded.append((line_no, exc))
+    users = {} if owner_id else _user_ids(decoded)
+
+    results = []
+    for line_no, data in decoded:
+        try:
+            if isinstance(data, Exception):
+                raise RecordImportError(f"Invalid JSON: {data}")
+            if not isinstance(data, dict):
+                raise RecordImportError("Record is not a JSON object")
+            user_id = owner_id or users.get(data.get("user"))
+            if user_id is None:
+                raise RecordImportError(f"Unknown user: {data.get('user')}")
+            fields, related = validate_record(data, index, user_id)
+        except (RecordImportError, TypeError, ValueError, KeyError) as exc:
+            results.append((line_no, None, None, str(exc)))
+        else:
+            results.append((line_no, fields, related, None))
+    return results
+
+
+def _get_worker_index():
+    global _worker_index
+    if _worker_index is None:
+        _worker_index = NameIndex.load()
+    return _worker_index
+
+
+def _chunks(lines, size):
+    numbered = ((line_no, text) for line_no, text in enumerate(lines, 1) if text.strip())
+    while chunk := list(islice(numbered, size)):
+        yield chunk
+
+
+def _validated(lines, owner_id, workers, chunk_lines):
+    if workers == 0:
+        index = NameIndex.load()
+        for chunk in _chunks(lines, chunk_lines):
+            yield from validate_chunk(chunk, owner_id, index)
+        return
+
+    # Workers are set up before the task (and with it this module) is unpickled
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as executor:
+        pending = deque()
+        for chunk in _chunks(lines, chunk_lines):
+            pending.append(executor.submit(partial(validate_chunk, owner_id=owner_id), chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def import_characters(lines, owner=None, workers=None, batch_size=IMPORT_BATCH_SIZE,
+                      chunk_lines=IMPORT_CHUNK_LINES):
+    """
+    Imports NDJSON `lines` (any iterable of str, e.g. an open file). Records
+    belong to the user named in each record unless `owner` is given.
+    `workers=0` validates in this process. Errors are keyed by line number.
+    """
+    if workers is None:
+        workers = min(os.cpu_count() or 1, MAX_WORKERS)
+    started = time.perf_counter()
+    report = ImportReport()
+    batch = []
+
+    def flush():
+        write_records(batch, report)
+        batch.clear()
+
+    owner_id = owner.pk if owner else None
+    for line_no, fields, related, error in _validated(lines, owner_id, workers, chunk_lines):
+        if error:
+            report.errors[line_no] = error
+            continue
+        batch.append((line_no, CharacterRecord(character=Character(**fields), **related)))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,106 @@
+from functools import cached_property
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from base.models import AbilityScoreChoices, InventoryItem
+from base.utils.profiling import profiled
+from base.utils.rules_catalog import get_rules_catalog
+
+
+class CharacterSheet:
+    """
+    In-memory snapshot of everything the character sheet needs.
+
+    Load the character through `CharacterSheet.prefetch(queryset)` and wrap
+    the fetched instance. All derived values are computed from the prefetched
+    rows, so the number of queries stays the same no matter how many items,
+    spells or skills the character has.
+    """
+
+    SELECT_RELATED = ('user', 'character_class', 'subclass', 'race', 'background')
+
+    @staticmethod
+    def prefetch_lookups():
+        return [
+            Prefetch(
+                'inventory',
+                queryset=InventoryItem.objects.select_related(
+                    'item__armor', 'item__shield'
+                ),
+            ),
+            'characterskillproficiency_set',
+            'background__backgroundskillproficiency_set',
+            'background__backgroundtoolproficiency_set__tool',
+            'background__starting_equipment__item',
+            'languages',
+            'feats',
+            'spells',
+        ]
+
+    @classmethod
+    def prefetch(cls, queryset):
+        return queryset.select_related(*cls.SELECT_RELATED).prefetch_related(*cls.prefetch_lookups())
+
+    @classmethod
+    def prefetch_into(cls, characters):
+        """Loads the related rows into characters fetched with SELECT_RELATED only."""
+        prefetch_related_objects(characters, *cls.prefetch_lookups())
+
+    def __init__(self, character):
+        self.character = character
+
+    @cached_property
+    def inventory(self):
+        return list(self.character.inventory.all())
+
+    @cached_property
+    def total_weight(self):
+        return sum(inv.item.weight * inv.quantity for inv in self.inventory)
+
+    @cached_property
+    def ability_scores(self):
+        """Ability scores including racial bonuses, keyed by ability name."""
+        return {
+            ability: getattr(self.character, f'total_{ability}')
+            for ability in AbilityScoreChoices.values
+        }
+
+    @cached_property
+    @profiled('armor_class')
+    def armor_class(self):
+        formulas, bonuses = self.character.get_armor_class_rules()
+        return self.character.best_armor_class(self.inventory, formulas, bonuses)
+
+    @cached_property
+    def speed(self):
+        # speed depends on the armor picked for the best AC
+        _ = self.armor_class
+        return self.character.speed
+
+    @cached_property
+    def proficient_skill_ids(self):
+        return self.character.get_skill_proficiency_ids()
+
+    @cached_property
+    def skills(self):
+        rows = []
+        for skill in get_rules_catalog().skills:
+            rows.append({
+                "skill": skill,
+                "ability": skill.get_ability_display(),
+                "is_proficient": skill.pk in self.proficient_skill_ids,
+                "bonus": self.character.get_skill_bonus(skill, self.proficient_skill_ids),
+            })
+        return rows
+
+    @cached_property
+    def class_features(self):
+        return list(self.character.get_class_features())
+
+    @cached_property
+    def spells(self):
+        return list(self.character.spells.all())
+
+    @cached_property
+    def class_has_spells(self):
+        return bool(get_rules_catalog().class_spells.get(self.character.character_class_id))
@@ -0,0 +1,121 @@
+"""
+Write-time maintenance of CharacterDerivedStats.
+
+Derived values are recomputed from a CharacterSheet snapshot whenever one of
+their inputs changes: the character row itself (Character.save), its
+inventory and skill proficiencies, or the rules rows they depend on (race
+modifiers, AC rules, armor, background skills). Signal handlers in
+base/signals.py call `schedule_refresh`, which defers the work until the
+surrounding transaction commits and refreshes each character only once.
+Changing a skill's ability affects every character, so it is left to the
+refresh_derived_stats command.
+"""
+import threading
+
+from django.db import transaction
+
+from base.models import AbilityScoreChoices, Character, CharacterDerivedStats
+from base.utils.character_sheet import CharacterSheet
+from base.utils.profiling import profiled
+
+REFRESH_CHUNK_SIZE = 500
+
+DERIVED_FIELDS = [
+    'armor_class',
+    'speed',
+    'total_strength',
+    'total_dexterity',
+    'total_constitution',
+    'total_intelligence',
+    'total_wisdom',
+    'total_charisma',
+    'proficiency_bonus',
+    'max_hit_points',
+    'skill_bonuses',
+    'max_cantrips_known',
+    'max_spells_known',
+    'spell_limit_type',
+    'updated_at',
+]
+
+_pending = threading.local()
+
+
+@profiled('derived_stats')
+def build_derived_stats(sheet):
+    """Builds an unsaved CharacterDerivedStats row from a CharacterSheet."""
+    character = sheet.character
+    max_spells, limit_type = character.max_spells_known
+    stats = CharacterDerivedStats(
+        character=character,
+        armor_class=sheet.armor_class,
+        speed=sheet.speed,
+        proficiency_bonus=character.proficiency_bonus,
+        max_hit_points=character.calculate_hit_points,
+        skill_bonuses={str(row['skill'].pk): row['bonus'] for row in sheet.skills},
+        max_cantrips_known=character.max_cantrips_known,
+        max_spells_known=max_spells,
+        spell_limit_type=limit_type,
+    )
+    for ability in AbilityScoreChoices.values:
+        setattr(stats, f'total_{ability}', sheet.ability_scores[ability])
+    return stats
+
+
+def refresh_derived_stats(character_ids=None):
+    """
+    Recomputes and upserts derived stats for the given characters
+    (all characters when `character_ids` is None). Returns the row count.
+    """
+    queryset = Character.objects.order_by('pk')
+    if character_ids is not None:
+        character_ids = set(character_ids)
+        if not character_ids:
+            return 0
+        queryset = queryset.filter(pk__in=character_ids)
+
+    rows = []
+    count = 0
+    for character in CharacterSheet.prefetch(queryset).iterator(chunk_size=REFRESH_CHUNK_SIZE):
+        rows.append(build_derived_stats(CharacterSheet(character)))
+        if len(rows) >= REFRESH_CHUNK_SIZE:
+            count += _upsert(rows)
+            rows = []
+    if rows:
+        count += _upsert(rows)
+    return count
+
+
+def _upsert(rows):
+    CharacterDerivedStats.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['character'],
+        update_fields=DERIVED_FIELDS,
+    )
+    return len(rows)
+
+
+def schedule_refresh(character_ids):
+    """
+    Queues characters for a refresh once the current transaction commits.
+    Outside a transaction the refresh runs immediately.
+    """
+    pending = getattr(_pending, 'ids', None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.update(character_ids)
+    # Every call registers a flush; the first one to run drains the whole set
+    transaction.on_commit(_flush_pending)
+
+
+def schedule_refresh_for(queryset):
+    """Queues every character matched by a Character queryset."""
+    schedule_refresh(queryset.values_list('pk', flat=True))
+
+
+def _flush_pending():
+    character_ids = getattr(_pending, 'ids', None)
+    _pending.ids = set()
+    if character_ids:
+        refresh_derived_stats(character_ids)
@@ -0,0 +1,101 @@
+"""
+Cache of rendered character sheet sections.
+
+Keys carry the character's version and the rules version, so any change to
+the character, its rows or the reference data (see base/signals.py) moves
+readers to new keys; stale entries simply expire. The view looks up every
+section at once and only prefetches the sheet when something is missing.
+
+A miss takes a short lock with cache.add before rendering, so concurrent
+requests for the same cold section wait for one render instead of all
+rendering it. Hits, misses and waits are counted per section in the shared
+'state' cache, which is never culled, so the counters add up across
+processes and survive the fragment cache filling up.
+"""
+import time
+
+from django.core.cache import cache, caches
+
+from base.utils.rules_catalog import STATE_CACHE, get_rules_version
+
+SHEET_SECTIONS = ('summary', 'inventory', 'background', 'skills', 'class_features', 'feats', 'spellbook')
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+STATS_KEY = 'sheet_fragment:stats:{section}:{event}'
+STAT_EVENTS = ('hit', 'miss', 'wait')
+
+
+def fragment_key(section, character, rules_version=None):
+    if rules_version is None:
+        rules_version = get_rules_version()
+    return f'sheet_fragment:{section}:{character.pk}:{character.version}:{rules_version}'
+
+
+def count(section, event):
+    key = STATS_KEY.format(section=section, event=event)
+    counters = caches[STATE_CACHE]
+    try:
+        counters.incr(key)
+    except ValueError:
+        if not counters.add(key, 1, timeout=None):
+            counters.incr(key)
+
+
+def get_sheet_fragments(character, sections=SHEET_SECTIONS):
+    """
+    Returns ({section: key}, {section: cached html}) for a character, using a
+    single get_many. Sections found are counted as hits.
+    """
+    rules_version = get_rules_version()
+    keys = {section: fragment_key(section, character, rules_version) for section in sections}
+    found = cache.get_many(keys.values())
+    fragments = {section: found[key] for section, key in keys.items() if key in found}
+    for section in fragments:
+        count(section, 'hit')
+    return keys, fragments
+
+
+def render_fragment(section, key, render):
+    """Renders a missing fragment once across concurrent requests and stores it."""
+    count(section, 'miss')
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            html = render()
+            cache.set(key, html, timeout=FRAGMENT_TIMEOUT)
+            return html
+        finally:
+            cache.delete(lock_key)
+
+    # Someone else is rendering it; wait briefly, then fall back to rendering
+    count(section, 'wait')
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        html = cache.get(key)
+        if html is not None:
+            return html
+    return render()
+
+
+def fragment_stats(sections=SHEET_SECTIONS):
+    """{section: {'hit': n, 'miss': n, 'wait': n}} from the counters in the 'state' cache."""
+    keys = {
+        (section, event): STATS_KEY.format(section=section, event=event)
+        for section in sections for event in STAT_EVENTS
+    }
+    values = caches[STATE_CACHE].get_many(keys.values())
+    return {
+        section: {event: values.get(keys[section, event], 0) for event in STAT_EVENTS}
+        for section in sections
+    }
+
+
+def reset_fragment_stats(sections=SHEET_SECTIONS):
+    caches[STATE_CACHE].delete_many([
+        STATS_KEY.format(section=section, event=event) for section in sections for event in STAT_EVENTS
+    ])
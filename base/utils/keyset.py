@@ -0,0 +1,107 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are fetched with a WHERE clause on the ordering columns of the last row
+seen instead of OFFSET, so every page costs the same single indexed query no
+matter how deep the user scrolls. The ordering must end with a unique column
+(normally 'pk') to make the cursor unambiguous.
+"""
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder drops microseconds, which would make cursors skip or repeat rows."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    payload = json.dumps(values, cls=CursorJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Returns the cursor values, or None for a missing/malformed cursor."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _ordering_field(queryset, name):
+    if name == 'pk':
+        return queryset.model._meta.pk
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    return queryset.model._meta.get_field(name)
+
+
+def clean_cursor(queryset, ordering, values):
+    """
+    Converts decoded cursor values to the ordering fields' Python types.
+    Returns None when any value is null or does not fit its field, so a
+    tampered or stale cursor falls back to the first page.
+    """
+    cleaned = []
+    for field_name, value in zip(ordering, values):
+        field = _ordering_field(queryset, field_name.lstrip('-'))
+        if value is None:
+            return None
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except (ValidationError, TypeError, ValueError):
+            return None
+        cleaned.append(value)
+    return cleaned
+
+
+def keyset_filter(ordering, values):
+    """
+    Q matching rows strictly after `values` in `ordering`, e.g. for
+    ('-ac', 'pk'): ac < v0 OR (ac = v0 AND pk > v1).
+    """
+    condition = Q()
+    equal_so_far = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal_so_far & Q(**{f'{name}__{lookup}': value})
+        equal_so_far &= Q(**{name: value})
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor, page_size):
+    """
+    Returns (rows, next_cursor) for the page after `cursor` (an encoded token
+    or None for the first page). next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor, len(ordering))
+    if values is not None:
+        values = clean_cursor(queryset, ordering, values)
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(ordering, values))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+    return rows, next_cursor
@@ -0,0 +1,379 @@
+"""
+Concurrent load test of the WSGI application.
+
+Each worker plays one player. It logs in through the login form and waits
+until every player has, then loops over a weighted mix of actions: the
+character list, sheets, the sheet API, edits and spell selection, with the
+odd logout and login. Only requests after the start are measured. Requests are
+WSGI environ dicts handed straight to
+DnD_character_sheet_creator.wsgi.application, with the session and CSRF
+cookies carried between them, so there is no network or server process but
+every request goes through the full middleware stack. Workers are threads
+(one database connection each, sharing the GIL) or forked processes.
+
+Write time is the time spent starting transactions (BEGIN, or BEGIN
+IMMEDIATE under the production profile), in write statements and in
+COMMIT, plus any statement that failed with "database is locked". SQLite's
+busy handler sleeps inside whichever of these needs the lock, so lock
+contention shows up as write time growing with the pool size; without
+contention it is just the cost of the writes.
+"""
+import io
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from itertools import repeat
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from base.models import Character
+from base.utils.benchmark import character_form_data
+from base.utils.profiling import percentile
+
+# COMMIT does not go through execute wrappers; see Player.timed_commit
+TIMED_STATEMENTS = ("BEGIN", "INSERT", "UPDATE", "DELETE", "REPLACE")
+# Requests that save a character
+WRITE_ACTIONS = ("edit", "spells")
+START_TIMEOUT = 300
+
+_local = threading.local()
+# Set in each pool worker; players start together once all have logged in
+_start_barrier = None
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and "locked" in str(exc)
+
+
+def _note_request_exception(sender, request=None, **kwargs):
+    # Unhandled errors become 500s; remember which of them were lock errors
+    player = getattr(_local, "player", None)
+    if player is not None and is_lock_error(sys.exc_info()[1]):
+        player.lock_error = True
+
+
+got_request_exception.connect(_note_request_exception, dispatch_uid="base.loadtest")
+
+
+@dataclass(frozen=True)
+class LoadConfig:
+    usernames: tuple
+    password: str
+    # Each player stops at whichever limit comes first
+    duration: float = 10.0
+    requests: int = None
+    seed: int = 0
+    # ((action, weight), ...); defaults to ACTIONS
+    mix: tuple = None
+
+
+class Player:
+    """One virtual player: a cookie jar, its account's characters and its request log."""
+
+    def __init__(self, application, username, password, rng):
+        self.application = application
+        self.username = username
+        self.password = password
+        self.rng = rng
+        self.cookies = {}
+        self.records = []
+        self.lock_error = False
+        self.write_time = 0.0
+        self.character_ids = list(
+            Character.objects.filter(user__username=username).values_list("pk", flat=True)
+        )
+        if not self.character_ids:
+            raise ValueError(f"{username} has no characters to load test")
+
+    def character_id(self):
+        return self.rng.choice(self.character_ids)
+
+    def statement_wrapper(self, execute, sql, params, many, context):
+        timed = sql.lstrip()[:7].upper().startswith(TIMED_STATEMENTS)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as exc:
+            if is_lock_error(exc):
+                timed = True
+            raise
+        finally:
+            if timed:
+                self.write_time += time.perf_counter() - started
+
+    def timed_commit(self, commit):
+        """Wraps a connection's commit(), which calls the driver directly."""
+        def wrapper():
+            started = time.perf_counter()
+            try:
+                return commit()
+            finally:
+                self.write_time += time.perf_counter() - started
+        return wrapper
+
+    def request(self, action, method, path, data=None):
+        """Sends one request through the WSGI app; returns (status, body)."""
+        body = b""
+        environ = {
+            "REQUEST_METHOD": method.upper(),
+            "PATH_INFO": path,
+            "HTTP_HOST": "testserver",
+            "SERVER_NAME": "testserver",
+        }
+        if method == "get":
+            environ["QUERY_STRING"] = urlencode(data or {}, doseq=True)
+        else:
+            data = dict(data or {}, csrfmiddlewaretoken=self.cookies.get("csrftoken", ""))
+            body = urlencode(data, doseq=True).encode()
+            environ["CONTENT_TYPE"] = "application/x-www-form-urlencoded"
+            environ["CONTENT_LENGTH"] = str(len(body))
+        if self.cookies:
+            environ["HTTP_COOKIE"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        environ["wsgi.input"] = io.BytesIO(body)
+        setup_testing_defaults(environ)
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = headers
+
+        _local.player = self
+        self.lock_error = False
+        started = time.perf_counter()
+        result = self.application(environ, start_response)
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        elapsed = time.perf_counter() - started
+
+        for name, value in response["headers"]:
+            if name.lower() == "set-cookie":
+                for morsel in SimpleCookie(value).values():
+                    if morsel["max-age"] == "0":
+                        self.cookies.pop(morsel.key, None)
+                    else:
+                        self.cookies[morsel.key] = morsel.value
+        self.records.append((action, elapsed * 1000, response["status"], self.lock_error))
+        return response["status"], content
+
+    def get(self, action, path, data=None):
+        return self.request(action, "get", path, data)
+
+    def post(self, action, path, data=None):
+        return self.request(action, "post", path, data)
+
+    def login(self):
+        url = reverse("login")
+        self.get("login_form", url)
+        status, _ = self.post("login", url, {"username": self.username, "password": self.password})
+        if status != 302:
+            raise ValueError(f"Could not log in as {self.username} (status {status})")
+
+
+def _list(player):
+    player.get("list", reverse("characters"))
+
+
+def _sheet(player):
+    player.get("sheet", reverse("character", args=[player.character_id()]))
+
+
+def _sheet_api(player):
+    player.get("sheet_api", reverse("character_sheet_api", args=[player.character_id()]))
+
+
+def _edit(player):
+    pk = player.character_id()
+    url = reverse("character-update", args=[pk])
+    player.get("edit_form", url)
+    character = Character.objects.prefetch_related(
+        "characterskillproficiency_set", "feats", "languages"
+    ).get(pk=pk)
+    player.post("edit", url, character_form_data(character))
+
+
+def _spells(player):
+    pk = player.character_id()
+    url = reverse("character_spells", args=[pk])
+    player.get("spells_form", url)
+    spell_ids = list(Character.objects.get(pk=pk).spells.values_list("pk", flat=True))
+    player.post("spells", url, {"spells": spell_ids})
+
+
+def _relogin(player):
+    player.post("logout", reverse("logout"))
+    player.login()
+
+
+# (action, weight): roughly a table of players mostly reading their sheets
+ACTIONS = (
+    (_list, 25),
+    (_sheet, 30),
+    (_sheet_api, 15),
+    (_edit, 12),
+    (_spells, 15),
+    (_relogin, 3),
+)
+WRITE_MIX = ((_edit, 1), (_spells, 1))
+
+
+def run_player(index, config):
+    """Plays one session in the current thread; returns its request log and write time."""
+    from DnD_character_sheet_creator.wsgi import application
+
+    rng = random.Random(config.seed * 1000 + index)
+    player = Player(
+        application, config.usernames[index % len(config.usernames)], config.password, rng,
+    )
+    actions, weights = zip(*(config.mix or ACTIONS))
+    try:
+        # The wrapper follows this thread's connection, which Django reopens per request
+        for conn in connections.all():
+            conn.execute_wrappers.append(player.statement_wrapper)
+            conn.commit = player.timed_commit(conn.commit)
+        player.login()
+        if _start_barrier is not None:
+            _start_barrier.wait(START_TIMEOUT)
+        player.records.clear()
+        player.write_time = 0.0
+
+        started = time.perf_counter()
+        deadline = started + config.duration
+        while time.perf_counter() < deadline:
+            if config.requests and len(player.records) >= config.requests:
+                break
+            rng.choices(actions, weights)[0](player)
+    except BaseException:
+        # Do not leave the other players waiting for this one
+        if _start_barrier is not None:
+            _start_barrier.abort()
+        raise
+    finally:
+        for conn in connections.all():
+            conn.execute_wrappers.remove(player.statement_wrapper)
+            del conn.commit
+        _local.player = None
+    return {
+        "records": player.records,
+        "write_time_ms": player.write_time * 1000,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _set_start_barrier(barrier):
+    global _start_barrier
+    _start_barrier = barrier
+
+
+def _pooled_player(index, config):
+    try:
+        return run_player(index, config)
+    finally:
+        connections.close_all()
+
+
+def _timings(records):
+    timings = sorted(ms for _, ms, _, _ in records)
+    return {
+        "requests": len(timings),
+        "errors": sum(1 for _, _, status, _ in records if status >= 400),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+    }
+
+
+def summarize_load(results, workers):
+    """Aggregates the players' results of one run into throughput, latency, lock and write time figures."""
+    records = [record for result in results for record in result["records"]]
+    seconds = max(result["seconds"] for result in results)
+    write_time_ms = sum(result["write_time_ms"] for result in results)
+    writes = sum(1 for record in records if record[0] in WRITE_ACTIONS)
+    by_action = {}
+    for record in records:
+        by_action.setdefault(record[0], []).append(record)
+    return {
+        "workers": workers,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(records) / seconds, 2) if seconds else 0.0,
+        **_timings(records),
+        "writes": writes,
+        "write_rps": round(writes / seconds, 2) if seconds else 0.0,
+        "lock_errors": sum(1 for record in records if record[3]),
+        "write_time_ms": round(write_time_ms, 3),
+        "write_time_per_request_ms": round(write_time_ms / len(records), 3) if records else 0.0,
+        "actions": {name: _timings(rows) for name, rows in sorted(by_action.items())},
+    }
+
+
+def run_load(workers, config, mode="thread"):
+    """Runs `workers` players at once in a thread or (forked) process pool."""
+    if mode == "process":
+        # Children must not share the parent's SQLite handles
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        executor = ProcessPoolExecutor(
+            workers, mp_context=context, initializer=_set_start_barrier, initargs=(context.Barrier(workers),),
+        )
+    else:
+        executor = ThreadPoolExecutor(
+            workers, initializer=_set_start_barrier, initargs=(threading.Barrier(workers),),
+        )
+    try:
+        with executor:
+            results = list(executor.map(_pooled_player, range(workers), repeat(config)))
+    finally:
+        _set_start_barrier(None)
+    return summarize_load(results, workers)
+
+
+@contextmanager
+def sqlite_profile(production, alias="default"):
+    """
+    Runs the block with the stock or the production SQLite profile (see
+    settings.SQLITE_PRODUCTION_*), whatever the settings chose. Connections
+    opened inside the block, in any thread, get the profile.
+    """
+    settings_dict = connections[alias].settings_dict
+    saved = {key: settings_dict[key] for key in settings.SQLITE_PRODUCTION_OPTIONS}
+    stock_options = {
+        name: value for name, value in saved["OPTIONS"].items()
+        if name not in settings.SQLITE_PRODUCTION_OPTIONS["OPTIONS"]
+    }
+    if production:
+        profile = dict(
+            settings.SQLITE_PRODUCTION_OPTIONS,
+            OPTIONS={**stock_options, **settings.SQLITE_PRODUCTION_OPTIONS["OPTIONS"]},
+        )
+        pragmas = settings.SQLITE_PRODUCTION_PRAGMAS
+    else:
+        profile = {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": stock_options}
+        pragmas = {}
+
+    connections.close_all()
+    settings_dict.update(profile)
+    try:
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            if not production:
+                # WAL is a property of the database file and outlives the connection
+                with connections[alias].cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode = DELETE")
+            yield
+    finally:
+        connections.close_all()
+        settings_dict.update(saved)
@@ -0,0 +1,186 @@
+"""
+Microbenchmarks of the Character rules code.
+
+Each case calls one rules function on fixtures built once in memory
+(unsaved characters with their race, inventory and proficiencies already
+attached), so no query runs inside the timed loop; a case that does query
+fails. Timing follows timeit: autorange picks a loop count, the best of
+many short repeats gives ns/op. Memory is the peak traced by tracemalloc above
+the starting point during one call, i.e. the bytes a call allocates at
+once, temporaries included.
+"""
+import gc
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+
+from django.db import connections
+
+from base.models import Character, CharacterClass, InventoryItem, Item, Race, Skill
+
+REPEAT = 20
+# autorange() finds a loop count worth ~0.2 s; each repeat runs 1/SPLIT of it
+SPLIT = 4
+# Below this a relative change is timer noise
+MIN_NS_DELTA = 50
+MIN_BYTES_DELTA = 64
+
+
+class QueryInBenchmark(AssertionError):
+    pass
+
+
+@dataclass(frozen=True)
+class MicroCase:
+    name: str
+    # fixtures -> zero-argument callable
+    build: object
+
+
+def _character(class_name, race, level, **scores):
+    character = Character(
+        character_name=f"Micro {class_name}",
+        character_class=CharacterClass.objects.get(name=class_name),
+        race=race,
+        level=level,
+        **scores,
+    )
+    character.apply_calculated_fields()
+    return character
+
+
+def build_fixtures():
+    """Characters and rows used by the cases; the only place that queries."""
+    items = {item.name: item for item in Item.objects.select_related("armor", "shield")}
+    trinkets = [
+        item for item in items.values()
+        if getattr(item, "armor", None) is None and getattr(item, "shield", None) is None
+    ][:20]
+    dwarf = Race.objects.get(name="Dwarf")
+
+    fighter = _character(
+        "Fighter", dwarf, 8, strength=12, dexterity=14, constitution=15, intelligence=10, wisdom=12, charisma=8,
+    )
+    inventory = [
+        InventoryItem(character=fighter, item=item)
+        for item in [items["Chain Mail"], items["Shield"], items["Leather Armor"], *trinkets]
+    ]
+    fighter.best_armor_class(inventory, *fighter.get_armor_class_rules())  # picks the armor for speed
+
+    wizard = _character(
+        "Wizard", Race.objects.get(name="Gnome"), 9,
+        strength=8, dexterity=14, constitution=13, intelligence=15, wisdom=10, charisma=10,
+    )
+    skills = list(Skill.objects.all())
+    return {
+        "fighter": fighter,
+        "inventory": inventory,
+        "wizard": wizard,
+        "skill": skills[0],
+        "proficient_ids": {skill.pk for skill in skills[::3]},
+    }
+
+
+CASES = (
+    MicroCase("armor_class", lambda f: lambda: f["fighter"].best_armor_class(
+        f["inventory"], *f["fighter"].get_armor_class_rules()
+    )),
+    MicroCase("speed", lambda f: lambda: f["fighter"].speed),
+    MicroCase("get_skill_bonus", lambda f: lambda: f["wizard"].get_skill_bonus(f["skill"], f["proficient_ids"])),
+    MicroCase("max_cantrips_known", lambda f: lambda: f["wizard"].max_cantrips_known),
+    MicroCase("max_spells_known", lambda f: lambda: f["wizard"].max_spells_known),
+    MicroCase("calculate_hit_points", lambda f: lambda: f["fighter"].calculate_hit_points),
+    MicroCase("validate_point_buy", lambda f: lambda: f["wizard"].validate_point_buy()),
+)
+
+
+def _forbid_queries(execute, sql, params, many, context):
+    raise QueryInBenchmark(f"Query inside a microbenchmark: {sql}")
+
+
+def measure(func, repeat=REPEAT):
+    """{'ns_per_op', 'loops', 'alloc_bytes_per_op'} for a zero-argument callable."""
+    with connections["default"].execute_wrapper(_forbid_queries):
+        func()  # warm caches, and fail early on queries
+        timer = timeit.Timer(func)
+        loops, _ = timer.autorange()
+        # Many short repeats: the best one is least likely to include a stall
+        loops = max(loops // SPLIT, 1)
+        ns_per_op = min(timer.repeat(repeat=repeat, number=loops)) / loops * 1e9
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "ns_per_op": round(ns_per_op, 1),
+        "loops": loops,
+        "alloc_bytes_per_op": max(peak - start, 0),
+    }
+
+
+def run_microbenchmarks(names=None, repeat=REPEAT, progress=None, fixtures=None):
+    """Runs the cases (all, or those in `names`); returns {case: measurement}."""
+    fixtures = fixtures or build_fixtures()
+    results = {}
+    for case in CASES:
+        if names and case.name not in names:
+            continue
+        results[case.name] = measure(case.build(fixtures), repeat)
+        if progress:
+            progress(case.name, results[case.name])
+    return results
+
+
+def find_regressions(results, baseline, threshold=0.5):
+    """
+    Cases whose ns/op or bytes/op grew by more than `threshold` (a fraction)
+    over the baseline, as {case: [messages]}. Tiny absolute changes are ignored.
+    """
+    regressions = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        messages = []
+        for key, min_delta, unit in (
+            ("ns_per_op", MIN_NS_DELTA, "ns/op"),
+            ("alloc_bytes_per_op", MIN_BYTES_DELTA, "B/op"),
+        ):
+            delta = current[key] - previous[key]
+            if delta > min_delta and delta > previous[key] * threshold:
+                messages.append(f"{unit} {previous[key]:g} -> {current[key]:g}")
+        if messages:
+            regressions[name] = messages
+    return regressions
+
+
+def keep_best(results, rerun):
+    """Merges a second run into `results`, keeping the lower time and allocation of each case."""
+    for name, result in rerun.items():
+        best = results.setdefault(name, result)
+        best["ns_per_op"] = min(best["ns_per_op"], result["ns_per_op"])
+        best["alloc_bytes_per_op"] = min(best["alloc_bytes_per_op"], result["alloc_bytes_per_op"])
+    return results
+
+
+def confirm_regressions(results, baseline, threshold=0.5, attempts=3, repeat=REPEAT, fixtures=None):
+    """
+    Re-measures regressed cases up to `attempts` more times, keeping each
+    case's best run, so a single stall on a busy machine does not count as a
+    regression. Returns the regressions that remain.
+    """
+    fixtures = fixtures or build_fixtures()
+    regressions = find_regressions(results, baseline, threshold)
+    for _ in range(attempts):
+        if not regressions:
+            break
+        keep_best(results, run_microbenchmarks(set(regressions), repeat, fixtures=fixtures))
+        regressions = find_regressions(results, baseline, threshold)
+    return regressions
@@ -0,0 +1,190 @@
+"""
+Exports characters to the bundled 5E_CharacterSheet_Fillable.pdf.
+
+The template is parsed once per process (see base/utils/pdf_fill.py). Field
+values are built here from a prefetched CharacterSheet and the character's
+derived stats; ZIP exports load characters in chunks and stream the archive
+out entry by entry.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.text import slugify
+
+from base.models import AbilityScoreChoices
+from base.utils.character_sheet import CharacterSheet
+from base.utils.derived_stats import build_derived_stats
+from base.utils.pdf_fill import (
+    FormTemplate,
+    ZipStreamWriter,
+    fill_entry,
+    fill_form,
+)
+
+TEMPLATE_PATH = settings.BASE_DIR / "5E_CharacterSheet_Fillable.pdf"
+
+EXPORT_CHUNK_SIZE = 100
+
+ABILITY_FIELDS = {
+    "strength": ("STR", "STRmod", "ST Strength"),
+    "dexterity": ("DEX", "DEXmod", "ST Dexterity"),
+    "constitution": ("CON", "CONmod", "ST Constitution"),
+    "intelligence": ("INT", "INTmod", "ST Intelligence"),
+    "wisdom": ("WIS", "WISmod", "ST Wisdom"),
+    "charisma": ("CHA", "CHamod", "ST Charisma"),
+}
+
+# Skill name -> text field, where the sheet abbreviates it
+SKILL_FIELDS = {
+    "Animal Handling": "Animal",
+    "Sleight of Hand": "SleightofHand",
+}
+
+DEATH_SAVE_SUCCESS_BOXES = ("Check Box 12", "Check Box 13", "Check Box 14")
+DEATH_SAVE_FAILURE_BOXES = ("Check Box 15", "Check Box 16", "Check Box 17")
+
+SPELLCASTING_ABILITY = {
+    "Bard": "charisma",
+    "Cleric": "wisdom",
+    "Druid": "wisdom",
+    "Paladin": "charisma",
+    "Ranger": "wisdom",
+    "Sorcerer": "charisma",
+    "Warlock": "charisma",
+    "Wizard": "intelligence",
+}
+
+
+@lru_cache(maxsize=1)
+def get_form_template():
+    return FormTemplate.parse(TEMPLATE_PATH.read_bytes())
+
+
+def _signed(value):
+    return f"{value:+d}"
+
+
+def sheet_form_values(sheet, template=None):
+    """Returns ({field: text}, [checked boxes]) for a CharacterSheet."""
+    template = template or get_form_template()
+    character = sheet.character
+    stats = getattr(character, "derived_stats", None) or build_derived_stats(sheet)
+    proficiency = stats.proficiency_bonus
+
+    class_level = character.character_class.name if character.character_class else ""
+    if character.subclass:
+        class_level += f" ({character.subclass.name})"
+
+    values = {
+        "CharacterName": character.character_name,
+        "CharacterName 2": character.character_name,
+        "PlayerName": character.user.username,
+        "ClassLevel": f"{class_level} {character.level}".strip(),
+        "Background": character.background.name if character.background else "",
+        "Race": character.race.name if character.race else "",
+        "Alignment": character.get_alignment_display(),
+        "XP": character.experience_points,
+        "Inspiration": "X" if character.inspiration else "",
+        "ProfBonus": _signed(proficiency),
+        "AC": stats.armor_class,
+        "Initiative": _signed(character.initiative),
+        "Speed": stats.speed,
+        "HPMax": stats.max_hit_points,
+        "HPCurrent": character.hit_points,
+        "HPTemp": character.temporary_hit_points,
+        "HDTotal": character.level,
+        "HD": f"{character.level}d{character.hit_dice}",
+        "Backstory": character.backstory,
+    }
+    checked = list(DEATH_SAVE_SUCCESS_BOXES[:character.death_saves_success or 0])
+    checked += DEATH_SAVE_FAILURE_BOXES[:character.death_saves_failure or 0]
+
+    modifiers = {}
+    for ability in AbilityScoreChoices.values:
+        score_field, mod_field, save_field = ABILITY_FIELDS[ability]
+        total = getattr(stats, f"total_{ability}")
+        modifiers[ability] = (total - 10) // 2
+        values[score_field] = total
+        values[mod_field] = _signed(modifiers[ability])
+        values[save_field] = _signed(modifiers[ability])
+
+    perception = 0
+    for row in sheet.skills:
+        skill = row["skill"]
+        field = SKILL_FIELDS.get(skill.name, skill.name)
+        bonus = stats.skill_bonuses.get(str(skill.pk), row["bonus"])
+        values[field] = _signed(bonus)
+        if row["is_proficient"] and field in template.proficiency_boxes:
+            checked.append(template.proficiency_boxes[field])
+        if skill.name == "Perception":
+            perception = bonus
+    values["Passive"] = 10 + perception
+
+    proficiencies = []
+    languages = [language.name for language in character.languages.all()]
+    if languages:
+        proficiencies.append("Languages: " + ", ".join(languages))
+    if character.background:
+        tools = [row.tool.name for row in character.background.backgroundtoolproficiency_set.all()]
+        if tools:
+            proficiencies.append("Tools: " + ", ".join(tools))
+    values["ProficienciesLang"] = "\n".join(proficiencies)
+
+    values["Equipment"] = "\n".join(
+        f"{inv.item.name} x{inv.quantity}" if inv.quantity > 1 else inv.item.name
+        for inv in sheet.inventory
+    )
+    values["Features and Traits"] = "\n".join(
+        f"{feature.name} (lvl {feature.unlock_level})" for feature in sheet.class_features
+    )
+    values["Feat+Traits"] = "\n".join(feat.name for feat in character.feats.all())
+
+    if sheet.spells and character.character_class:
+        ability = SPELLCASTING_ABILITY.get(character.character_class.name)
+        values["Spellcasting Class 2"] = character.character_class.name
+        if ability:
+            values["SpellcastingAbility 2"] = ability[:3].upper()
+            values["SpellSaveDC  2"] = 8 + proficiency + modifiers[ability]
+            values["SpellAtkBonus 2"] = _signed(proficiency + modifiers[ability])
+
+        by_level = {}
+        for spell in sorted(sheet.spells, key=lambda s: (s.level, s.name)):
+            by_level.setdefault(spell.level, []).append(spell.name)
+        for level, names in by_level.items():
+            # Spells that do not fit on the sheet are left off
+            for field, name in zip(template.spell_lines.get(level, ()), names):
+                values[field] = name
+
+    return values, checked
+
+
+def export_queryset(queryset):
+    return CharacterSheet.prefetch(queryset).select_related("derived_stats").order_by("pk")
+
+
+def character_pdf_filename(character):
+    return f"{slugify(character.character_name) or 'character'}-{character.pk}.pdf"
+
+
+def render_character_pdf(character):
+    """Filled PDF bytes for a character loaded through export_queryset()."""
+    values, checked = sheet_form_values(CharacterSheet(character))
+    return fill_form(get_form_template(), values, checked)
+
+
+def _export_jobs(queryset, template):
+    for character in export_queryset(queryset).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        values, checked = sheet_form_values(CharacterSheet(character), template)
+        yield character_pdf_filename(character), values, checked
+
+
+def iter_characters_zip(queryset):
+    """
+    Yields a ZIP archive of filled sheets for every character in `queryset`,
+    one entry at a time, so the archive is never held in memory.
+    """
+    template = get_form_template()
+    writer = ZipStreamWriter()
+    for name, values, checked in _export_jobs(queryset, template):
+        yield writer.add(fill_entry(template, name, values, checked))
+    yield writer.finish()
@@ -0,0 +1,377 @@
+"""
+Django-free AcroForm filling and ZIP streaming for the PDF sheet export.
+
+`FormTemplate.parse` reads the fillable PDF once with pypdf and keeps the raw
+template bytes plus every field dictionary pre-serialized without its value.
+Filling a sheet then only appends an incremental update (the changed field
+objects and a cross-reference stream) to the template bytes, which takes
+well under a millisecond instead of re-parsing and re-writing the document.
+For ZIP exports the template is also deflated once, so each entry only
+compresses its own update.
+
+Nothing here imports Django, so reading can run in worker processes.
+"""
+import io
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+
+from pypdf import PdfReader
+from pypdf.generic import NameObject
+
+# A proficiency checkbox sits just left of its skill / saving throw field
+CHECKBOX_MAX_GAP = 20
+CHECKBOX_MAX_DY = 3
+PUSHBUTTON_FLAG = 1 << 16
+RADIO_FLAG = 1 << 15
+ZIP_COMPRESS_LEVEL = 6
+# Values from these on are stored in ZIP64 fields
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_COUNT_LIMIT = 0xFFFF
+SPELL_COLUMN_WIDTH = 150
+SPELL_LINE_PREFIX = "Spells "
+SLOTS_TOTAL_PREFIX = "SlotsTotal "
+
+
+@dataclass(frozen=True)
+class FieldRef:
+    number: int
+    generation: int
+    on_state: str | None  # None for text fields
+    body: bytes  # serialized dictionary without /V, /AS and the closing ">>"
+
+    @property
+    def is_checkbox(self):
+        return self.on_state is not None
+
+
+@dataclass(frozen=True)
+class FormTemplate:
+    prefix: bytes           # template PDF bytes every filled sheet starts with
+    deflated_prefix: bytes  # `prefix` as raw deflate blocks, ending on a full flush
+    prefix_crc: int
+    fields: dict            # stripped field name -> FieldRef
+    proficiency_boxes: dict  # stripped text field name -> checkbox field name
+    spell_lines: dict       # spell level -> stripped names of its spell lines, top to bottom
+    acroform: bytes         # AcroForm object rewritten with /NeedAppearances true
+    trailer: bytes          # /Root, /Info and /ID entries of the original trailer
+    size: int
+    startxref: int
+
+    @classmethod
+    def parse(cls, pdf_bytes):
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        root = reader.trailer["/Root"]
+        acroform_ref = root.raw_get("/AcroForm")
+
+        fields, widgets = {}, []
+        for page_number, page in enumerate(reader.pages):
+            for annot_ref in page.get("/Annots") or []:
+                widget = annot_ref.get_object()
+                field_ref = annot_ref
+                if "/T" not in widget and "/Parent" in widget:
+                    field_ref = widget.raw_get("/Parent")
+                field = field_ref.get_object()
+                if "/T" not in field:
+                    continue
+                name = str(field["/T"]).strip()
+                on_state = _checkbox_on_state(field, widget)
+                is_checkbox = on_state is not None
+                if name not in fields:
+                    fields[name] = FieldRef(
+                        number=field_ref.idnum,
+                        generation=field_ref.generation,
+                        on_state=on_state,
+                        body=_serialize(field, exclude=_value_keys(is_checkbox))[:-2],
+                    )
+                rect = [float(v) for v in widget["/Rect"]]
+                widgets.append((page_number, name, field.get("/FT"), is_checkbox, rect))
+
+        acroform_body = _serialize(acroform_ref.get_object(), exclude=("/NeedAppearances",))[:-2]
+        trailer = b"".join(
+            _serialize_value(key, reader.trailer.raw_get(key))
+            for key in ("/Root", "/Info", "/ID") if key in reader.trailer
+        )
+        prefix = pdf_bytes if pdf_bytes.endswith(b"\n") else pdf_bytes + b"\n"
+        compressor = zlib.compressobj(ZIP_COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        return cls(
+            prefix=prefix,
+            deflated_prefix=compressor.compress(prefix) + compressor.flush(zlib.Z_FULL_FLUSH),
+            prefix_crc=zlib.crc32(prefix),
+            fields=fields,
+            proficiency_boxes=_proficiency_boxes(widgets),
+            spell_lines=_spell_lines(widgets),
+            acroform=(
+                f"{acroform_ref.idnum} {acroform_ref.generation} obj\n".encode()
+                + acroform_body + b"/NeedAppearances true>>\nendobj\n"
+            ),
+            trailer=trailer,
+            size=int(reader.trailer["/Size"]),
+            startxref=_last_startxref(pdf_bytes),
+        )
+
+
+def _serialize(obj, exclude=()):
+    # Values are copied raw, so indirect references are written back as "n g R"
+    copy = obj.__class__({key: obj.raw_get(key) for key in obj if key not in exclude})
+    stream = io.BytesIO()
+    copy.write_to_stream(stream)
+    return stream.getvalue()
+
+
+def _serialize_value(key, value):
+    stream = io.BytesIO()
+    NameObject(key).write_to_stream(stream)
+    stream.write(b" ")
+    value.write_to_stream(stream)
+    return stream.getvalue()
+
+
+def _value_keys(is_checkbox):
+    # Text fields also lose their stale appearance so viewers regenerate it
+    return ("/V", "/AS") if is_checkbox else ("/V", "/AS", "/AP")
+
+
+def _checkbox_on_state(field, widget):
+    """The "on" appearance state of a checkbox field, or None for any other field."""
+    flags = int(field.get("/Ff", 0))
+    if field.get("/FT") != "/Btn" or flags & (PUSHBUTTON_FLAG | RADIO_FLAG):
+        return None
+    states = widget.get("/AP", {}).get("/N", {})
+    return next((str(state) for state in states if state != "/Off"), "/Yes")
+
+
+def _last_startxref(pdf_bytes):
+    position = pdf_bytes.rindex(b"startxref")
+    return int(pdf_bytes[position + len(b"startxref"):].split()[0])
+
+
+def _proficiency_boxes(widgets):
+    boxes = [(page, name, rect) for page, name, _, is_checkbox, rect in widgets if is_checkbox]
+    result = {}
+    for page, name, field_type, _, rect in widgets:
+        if field_type != "/Tx":
+            continue
+        center = (rect[1] + rect[3]) / 2
+        candidates = [
+            (abs((box[1] + box[3]) / 2 - center), box_name)
+            for box_page, box_name, box in boxes
+            if box_page == page and 0 <= rect[0] - box[2] < CHECKBOX_MAX_GAP
+        ]
+        if candidates:
+            dy, box_name = min(candidates)
+            if dy < CHECKBOX_MAX_DY:
+                result[name] = box_name
+    return result
+
+
+def _spell_lines(widgets):
+    """
+    Walks the spell page column by column, top to bottom. Lines before the
+    first "SlotsTotal" header are cantrips; each header starts the next level.
+    """
+    lines = [
+        (page, rect, name) for page, name, _, _, rect in widgets
+        if name.startswith(SPELL_LINE_PREFIX) or name.startswith(SLOTS_TOTAL_PREFIX)
+    ]
+    lines.sort(key=lambda line: (line[0], line[1][0] // SPELL_COLUMN_WIDTH, -line[1][3]))
+
+    result, level = {}, 0
+    for _, _, name in lines:
+        if name.startswith(SLOTS_TOTAL_PREFIX):
+            level += 1
+        else:
+            result.setdefault(level, []).append(name)
+    return result
+
+
+def _pdf_string(value):
+    return b"<FEFF" + str(value).encode("utf-16-be").hex().upper().encode() + b">"
+
+
+def form_update(template, values, checked=()):
+    """
+    Incremental update that sets text `values` ({field name: text}) and the
+    `checked` checkboxes; append it to `template.prefix` to get the sheet.
+    """
+    out = io.BytesIO()
+    base = len(template.prefix)
+
+    offsets = {}
+    for name, value in values.items():
+        field = template.fields.get(name)
+        if field is None or field.is_checkbox or value in (None, ""):
+            continue
+        offsets[field.number] = (base + out.tell(), field.generation)
+        out.write(b"%d %d obj\n" % (field.number, field.generation))
+        out.write(field.body + b"/V " + _pdf_string(value) + b">>\nendobj\n")
+    for name in checked:
+        field = template.fields.get(name)
+        if field is None or not field.is_checkbox:
+            continue
+        offsets[field.number] = (base + out.tell(), field.generation)
+        out.write(b"%d %d obj\n" % (field.number, field.generation))
+        state = field.on_state.encode()
+        out.write(field.body + b"/V " + state + b"/AS " + state + b">>\nendobj\n")
+
+    acroform_number = int(template.acroform.split(b" ", 1)[0])
+    offsets[acroform_number] = (base + out.tell(), 0)
+    out.write(template.acroform)
+
+    # Cross-reference stream for the update, pointing back at the original one
+    xref_number = template.size
+    offsets[xref_number] = (base + out.tell(), 0)
+    numbers = sorted(offsets)
+    data = b"".join(struct.pack(">BIH", 1, *offsets[n]) for n in numbers)
+    index = b" ".join(b"%d 1" % n for n in numbers)
+    out.write(
+        b"%d 0 obj\n<</Type /XRef/Size %d/W [1 4 2]/Index [%s]/Prev %d%s/Length %d>>\nstream\n"
+        % (xref_number, xref_number + 1, index, template.startxref, template.trailer, len(data))
+    )
+    out.write(data + b"\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n" % offsets[xref_number][0])
+    return out.getvalue()
+
+
+def fill_form(template, values, checked=()):
+    """Returns the complete filled PDF."""
+    return template.prefix + form_update(template, values, checked)
+
+
+@dataclass(frozen=True)
+class ZipEntry:
+    name: str
+    crc: int
+    size: int
+    data: bytes  # raw deflate stream
+
+
+def fill_entry(template, name, values, checked=()):
+    """
+    Fills a sheet straight into a ZIP entry. Only the update is compressed;
+    it is appended to the pre-compressed template, which the full flush
+    left byte-aligned and independent of what follows.
+    """
+    update = form_update(template, values, checked)
+    compressor = zlib.compressobj(ZIP_COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    return ZipEntry(
+        name=name,
+        crc=zlib.crc32(update, template.prefix_crc),
+        size=len(template.prefix) + len(update),
+        data=template.deflated_prefix + compressor.compress(update) + compressor.flush(),
+    )
+
+
+class ZipStreamWriter:
+    """
+    Minimal ZIP writer for ready-made ZipEntry objects (see fill_entry): it
+    only frames their deflate data with local headers and a central
+    directory, without compressing anything itself. `add` and `finish`
+    return the bytes to send next, so the archive is never held in memory.
+    Offsets, sizes and entry counts past the classic limits get ZIP64 extra
+    fields and end records, so exports of any size stay readable.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.central_directory = []
+        self.dos_time, self.dos_date = _dos_timestamp(time.localtime())
+
+    def add(self, entry):
+        name = entry.name.encode("utf-8")
+        # ZIP64 extra field values, in the order the format requires
+        sizes = [entry.size, len(entry.data)]
+        local_zip64 = any(size >= ZIP32_LIMIT for size in sizes)
+        central_zip64 = sizes if local_zip64 else []
+        if self.offset >= ZIP32_LIMIT:
+            central_zip64 = central_zip64 + [self.offset]
+
+        version = 45 if central_zip64 else 20
+        fields = (
+            0x0800, zlib.DEFLATED, self.dos_time, self.dos_date, entry.crc,
+            ZIP32_LIMIT if local_zip64 else len(entry.data),
+            ZIP32_LIMIT if local_zip64 else entry.size,
+            len(name),
+        )
+        local_extra = _zip64_extra(sizes) if local_zip64 else b""
+        central_extra = _zip64_extra(central_zip64) if central_zip64 else b""
+        local = struct.pack("<IHHHHHIIIHH", 0x04034B50, version, *fields, len(local_extra)) + name + local_extra
+        self.central_directory.append(
+            struct.pack("<IHH", 0x02014B50, version, version)
+            + struct.pack("<HHHHIIIHH", *fields, len(central_extra))
+            + struct.pack("<HHHII", 0, 0, 0, 0, min(self.offset, ZIP32_LIMIT))
+            + name + central_extra
+        )
+        self.offset += len(local) + len(entry.data)
+        return local + entry.data
+
+    def finish(self):
+        directory = b"".join(self.central_directory)
+        count = len(self.central_directory)
+        end = b""
+        if count >= ZIP32_COUNT_LIMIT or len(directory) >= ZIP32_LIMIT or self.offset >= ZIP32_LIMIT:
+            end_offset = self.offset + len(directory)
+            end = struct.pack(
+                "<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, len(directory), self.offset,
+            ) + struct.pack("<IIQI", 0x07064B50, 0, end_offset, 1)
+        end += struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0, min(count, ZIP32_COUNT_LIMIT), min(count, ZIP32_COUNT_LIMIT),
+            min(len(directory), ZIP32_LIMIT), min(self.offset, ZIP32_LIMIT), 0,
+        )
+        return directory + end
+
+
+def _zip64_extra(values):
+    return struct.pack(f"<HH{len(values)}Q", 0x0001, 8 * len(values), *values)
+
+
+def _dos_timestamp(t):
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday,
+    )
+
+
+def read_form_values(pdf_bytes):
+    """
+    Reads the filled-in values of a form: {stripped field name: text} for
+    text fields and {name: bool} for checkboxes.
+    """
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    acroform = reader.trailer["/Root"].get("/AcroForm")
+    if acroform is None:
+        raise ValueError("PDF has no form fields")
+
+    values = {}
+    fields = list(acroform.get("/Fields", []))
+    while fields:
+        field = fields.pop().get_object()
+        kids = field.get("/Kids", [])
+        if kids and "/T" in kids[0].get_object():
+            # Child fields; kids without a name are just this field's widgets
+            fields.extend(kids)
+            continue
+        if "/T" not in field:
+            continue
+        value = field.get("/V")
+        name = str(field["/T"]).strip()
+        if field.get("/FT") == "/Btn":
+            values[name] = value is not None and value != "/Off"
+        else:
+            values[name] = "" if value is None else str(value)
+    return values
+
+
+def read_form_source(source):
+    """
+    (name, path or bytes) -> (name, values, error). Errors are returned as
+    text so one broken file never stops a batch; safe to run in a worker.
+    """
+    name, data = source
+    try:
+        if not isinstance(data, bytes):
+            with open(data, "rb") as f:
+                data = f.read()
+        return name, read_form_values(data), None
+    except Exception as exc:  # pypdf raises many unrelated exception types
+        return name, None, f"{type(exc).__name__}: {exc}"
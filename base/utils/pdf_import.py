@@ -0,0 +1,235 @@
+"""
+Imports characters from filled copies of 5E_CharacterSheet_Fillable.pdf.
+
+Files are read in a process pool (PDF parsing dominates the cost), their
+fields are mapped to rules rows through an in-memory name index, and the
+characters are written with bulk_create_characters in batched transactions.
+A file that cannot be read or mapped is reported and skipped.
+"""
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.exceptions import ValidationError
+
+from base.models import Alignment, Character
+from base.utils.character_bulk import (
+    BULK_BATCH_SIZE,
+    RESOLVED_FIELDS,
+    CharacterRecord,
+    ImportReport,
+    NameIndex,
+    validation_message,
+    write_records,
+)
+from base.utils.pdf_export import (
+    ABILITY_FIELDS,
+    DEATH_SAVE_FAILURE_BOXES,
+    DEATH_SAVE_SUCCESS_BOXES,
+    SKILL_FIELDS,
+    get_form_template,
+)
+from base.utils.pdf_fill import read_form_source
+from base.utils.rules_catalog import get_rules_catalog
+
+MAX_WORKERS = 8
+# Parsing a sheet takes ~70 ms, while starting a spawn pool with one worker
+# and handing it one file takes ~0.26 s (module imports and Django setup).
+# Each worker has to save a few times that before a pool pays off, so web
+# uploads of a few sheets are read in-process.
+MIN_POOL_FILES = 32
+FILES_PER_WORKER = 16
+
+CLASS_LEVEL_RE = re.compile(r"^(?P<name>.+?)\s*(?:\((?P<subclass>[^)]*)\))?\s*(?P<level>\d+)$")
+QUANTITY_RE = re.compile(r"^(?P<name>.+?)\s+x(?P<quantity>\d+)$")
+
+
+class SheetImportError(ValueError):
+    pass
+
+
+def _int(values, name, default=None):
+    text = str(values.get(name) or "").strip().lstrip("+")
+    if not text:
+        return default
+    try:
+        return int(text)
+    except ValueError:
+        raise SheetImportError(f"{name} is not a number: {text!r}")
+
+
+def _lines(values, name):
+    return [line.strip() for line in str(values.get(name) or "").splitlines() if line.strip()]
+
+
+def _lookup_names(names, index, warnings, kind):
+    found = []
+    for name in names:
+        obj = index.get(name.lower())
+        if obj is None:
+            warnings.append(f"Unknown {kind}: {name}")
+        else:
+            found.append(obj.pk)
+    return found
+
+
+def sheet_to_record(values, user, index, template=None):
+    """Maps read form values to a CharacterRecord. Returns (record, warnings)."""
+    template = template or get_form_template()
+    catalog = get_rules_catalog()
+    warnings = []
+
+    name = str(values.get("CharacterName") or "").strip()
+    if not name:
+        raise SheetImportError("CharacterName is empty")
+
+    match = CLASS_LEVEL_RE.match(str(values.get("ClassLevel") or "").strip())
+    if not match:
+        raise SheetImportError(f"ClassLevel must look like 'Wizard 3': {values.get('ClassLevel')!r}")
+    character_class = index.classes.get(match["name"].lower())
+    if character_class is None:
+        raise SheetImportError(f"Unknown class: {match['name']}")
+    level = int(match["level"])
+    if not 1 <= level <= 20:
+        raise SheetImportError(f"Level must be between 1 and 20, got {level}")
+
+    subclass = None
+    if match["subclass"]:
+        subclass = index.subclasses.get((character_class.pk, match["subclass"].strip().lower()))
+        if subclass is None:
+            warnings.append(f"Unknown subclass: {match['subclass']}")
+
+    race = index.races.get(str(values.get("Race") or "").strip().lower())
+    if values.get("Race") and race is None:
+        warnings.append(f"Unknown race: {values['Race']}")
+    background = index.backgrounds.get(str(values.get("Background") or "").strip().lower())
+    if values.get("Background") and background is None:
+        warnings.append(f"Unknown background: {values['Background']}")
+
+    alignment_text = str(values.get("Alignment") or "").strip().lower()
+    alignment = next(
+        (value for value, label in Alignment.choices if alignment_text in (value.lower(), label.lower())),
+        Alignment.TRUE_NEUTRAL,
+    )
+
+    character = Character(
+        user=user,
+        character_name=name,
+        character_class=character_class,
+        subclass=subclass,
+        race=race,
+        background=background,
+        level=level,
+        alignment=alignment,
+        experience_points=_int(values, "XP"),
+        hit_points=_int(values, "HPCurrent", 0),
+        temporary_hit_points=_int(values, "HPTemp", 0),
+        death_saves_success=sum(bool(values.get(box)) for box in DEATH_SAVE_SUCCESS_BOXES),
+        death_saves_failure=sum(bool(values.get(box)) for box in DEATH_SAVE_FAILURE_BOXES),
+        inspiration=bool(str(values.get("Inspiration") or "").strip()),
+        backstory=str(values.get("Backstory") or "").strip() or None,
+    )
+
+    # The sheet shows totals; store the base score without the racial bonus
+    racial = catalog.race_modifiers.get(race.pk, {}) if race else {}
+    for ability, (score_field, _, _) in ABILITY_FIELDS.items():
+        total = _int(values, score_field)
+        if total is None:
+            raise SheetImportError(f"{score_field} is empty")
+        base = total - racial.get(ability, 0)
+        if not 1 <= base <= 30:
+            raise SheetImportError(f"{score_field} is out of range: {total}")
+        setattr(character, ability, base)
+
+    # Catches what the CHECK constraints would reject, e.g. negative XP or hit points
+    character.apply_calculated_fields()
+    try:
+        character.clean_fields(exclude=RESOLVED_FIELDS)
+    except ValidationError as exc:
+        raise SheetImportError(validation_message(exc))
+
+    record = CharacterRecord(character=character)
+    # Background skills are checked on the sheet too but are not stored per character
+    granted = index.background_skills.get(background.pk, set()) if background else set()
+    for skill in catalog.skills:
+        box = template.proficiency_boxes.get(SKILL_FIELDS.get(skill.name, skill.name))
+        if box and values.get(box) and skill.pk not in granted:
+            record.skill_ids.append(skill.pk)
+
+    for line in _lines(values, "Equipment"):
+        quantity_match = QUANTITY_RE.match(line)
+        item_name, quantity = (quantity_match["name"], int(quantity_match["quantity"])) if quantity_match else (line, 1)
+        if quantity < 1:
+            raise SheetImportError(f"Equipment quantity must be at least 1: {line!r}")
+        item = index.items.get(item_name.lower())
+        if item is None:
+            warnings.append(f"Unknown item: {item_name}")
+        else:
+            record.inventory.append((item.pk, quantity))
+
+    for line in _lines(values, "ProficienciesLang"):
+        if line.lower().startswith("languages:"):
+            names = [n.strip() for n in line.split(":", 1)[1].split(",") if n.strip()]
+            record.language_ids = _lookup_names(names, index.languages, warnings, "language")
+
+    record.feat_ids = _lookup_names(_lines(values, "Feat+Traits"), index.feats, warnings, "feat")
+    spell_names = [
+        str(values[line]).strip()
+        for lines in template.spell_lines.values() for line in lines
+        if str(values.get(line) or "").strip()
+    ]
+    record.spell_ids = _lookup_names(spell_names, index.spells, warnings, "spell")
+    return record, warnings
+
+
+def _read_all(sources, workers):
+    if workers is None:
+        workers = min(os.cpu_count() or 1, MAX_WORKERS, len(sources) // FILES_PER_WORKER)
+        # A single worker only adds its start-up cost
+        if len(sources) < MIN_POOL_FILES or workers < 2:
+            workers = 0
+    if workers == 0:
+        yield from map(read_form_source, sources)
+        return
+    # spawn: forking a (possibly multi-threaded) server process is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        yield from executor.map(read_form_source, sources, chunksize=4)
+
+
+def import_sheets(sources, user, workers=None, batch_size=BULK_BATCH_SIZE):
+    """
+    Imports (file name, path or bytes) `sources` as characters of `user`.
+    `workers=0` reads every file in this process.
+    """
+    started = time.perf_counter()
+    report = ImportReport()
+    index = NameIndex.load()
+    template = get_form_template()
+
+    batch = []
+
+    def flush():
+        write_records(batch, report)
+        batch.clear()
+
+    for file_name, values, error in _read_all(list(sources), workers):
+        if error:
+            report.errors[file_name] = error
+            continue
+        try:
+            record, warnings = sheet_to_record(values, user, index, template)
+        except SheetImportError as exc:
+            report.errors[file_name] = str(exc)
+            continue
+        if warnings:
+            report.warnings[file_name] = warnings
+        batch.append((file_name, record))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    report.elapsed = time.perf_counter() - started
+    return report
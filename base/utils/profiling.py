@@ -0,0 +1,203 @@
+"""
+Per-request performance profile, collected by base.middleware.ProfilerMiddleware.
+
+While a request is profiled, the middleware wraps database execution to count
+queries and their time, template rendering is timed (outermost render only,
+so includes and cached sections are not counted twice), and functions marked
+with @profiled record their calls and time under a name. Nested calls of the
+same name only count once. Outside a profiled request @profiled costs one
+context variable lookup.
+"""
+import json
+import math
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+
+_current = ContextVar('request_profile', default=None)
+_template_patched = False
+
+
+@dataclass
+class Timing:
+    calls: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class RequestProfile:
+    queries: int = 0
+    query_seconds: float = 0.0
+    template_seconds: float = 0.0
+    sections: dict = field(default_factory=dict)
+    _active: set = field(default_factory=set)
+    _render_depth: int = 0
+
+    def add(self, name, seconds):
+        timing = self.sections.setdefault(name, Timing())
+        timing.calls += 1
+        timing.seconds += seconds
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+def current_profile():
+    return _current.get()
+
+
+def start_profile():
+    """Starts profiling the current request; returns (profile, token for stop_profile())."""
+    profile = RequestProfile()
+    return profile, _current.set(profile)
+
+
+def stop_profile(token):
+    _current.reset(token)
+
+
+def profiled(name):
+    """Records calls and time of the decorated function under `name` in profiled requests."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None or name in profile._active:
+                return func(*args, **kwargs)
+            profile._active.add(name)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.add(name, time.perf_counter() - started)
+                profile._active.discard(name)
+        return wrapper
+    return decorator
+
+
+def instrument_templates():
+    """Wraps django.template.base.Template.render to time rendering in profiled requests."""
+    global _template_patched
+    if _template_patched:
+        return
+    from django.template.base import Template
+
+    original_render = Template.render
+
+    @wraps(original_render)
+    def render(self, context):
+        profile = _current.get()
+        if profile is None:
+            return original_render(self, context)
+        profile._render_depth += 1
+        started = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            profile._render_depth -= 1
+            if not profile._render_depth:
+                profile.template_seconds += time.perf_counter() - started
+
+    Template.render = render
+    _template_patched = True
+
+
+def _metric(name, seconds, description=None):
+    value = f'{name};dur={seconds * 1000:.1f}'
+    if description:
+        value += f';desc="{description}"'
+    return value
+
+
+def server_timing(profile, total_seconds):
+    """Server-Timing header value: db, tpl, one metric per profiled section and total."""
+    metrics = [
+        _metric('db', profile.query_seconds, f'{profile.queries} queries'),
+        _metric('tpl', profile.template_seconds),
+    ]
+    for name, timing in sorted(profile.sections.items()):
+        metrics.append(_metric(name, timing.seconds, f'{timing.calls} calls'))
+    metrics.append(_metric('total', total_seconds))
+    return ', '.join(metrics)
+
+
+def profile_record(request, response, profile, total_seconds):
+    """One line of the profile log."""
+    match = request.resolver_match
+    return {
+        'time': time.time(),
+        'method': request.method,
+        'path': request.path,
+        'endpoint': f'/{match.route}' if match else request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'total_ms': round(total_seconds * 1000, 3),
+        'db_ms': round(profile.query_seconds * 1000, 3),
+        'queries': profile.queries,
+        'template_ms': round(profile.template_seconds * 1000, 3),
+        'sections': {
+            name: {'calls': timing.calls, 'ms': round(timing.seconds * 1000, 3)}
+            for name, timing in profile.sections.items()
+        },
+    }
+
+
+def read_profile_log(path):
+    """Records of the profile log at `path` and its rotated backups (path.1, path.2, ...), oldest first."""
+    backups = [p for p in path.parent.glob(f'{path.name}.*') if p.suffix[1:].isdigit()]
+    backups.sort(key=lambda p: int(p.suffix[1:]), reverse=True)
+    for log_file in [*backups, path]:
+        if not log_file.exists():
+            continue
+        with open(log_file, encoding='utf-8') as lines:
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize_profile(records):
+    """
+    Per-endpoint summary of profile records: request count, mean/p95/max
+    total time, mean queries, mean db and template time and the mean time
+    of each profiled section. Sorted by p95, slowest first.
+    """
+    grouped = {}
+    for record in records:
+        grouped.setdefault((record['method'], record['endpoint']), []).append(record)
+
+    summary = []
+    for (method, endpoint), rows in grouped.items():
+        n = len(rows)
+        totals = sorted(row['total_ms'] for row in rows)
+        sections = {}
+        for row in rows:
+            for name, timing in row['sections'].items():
+                sections[name] = sections.get(name, 0.0) + timing['ms']
+        summary.append({
+            'method': method,
+            'endpoint': endpoint,
+            'requests': n,
+            'mean_ms': sum(totals) / n,
+            'p95_ms': percentile(totals, 0.95),
+            'max_ms': totals[-1],
+            'queries': sum(row['queries'] for row in rows) / n,
+            'db_ms': sum(row['db_ms'] for row in rows) / n,
+            'template_ms': sum(row['template_ms'] for row in rows) / n,
+            'sections': {name: ms / n for name, ms in sorted(sections.items(), key=lambda kv: -kv[1])},
+        })
+    summary.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return summary
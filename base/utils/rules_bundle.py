@@ -0,0 +1,100 @@
+"""
+Client-side rules bundle for the character form.
+
+Everything the form needs to populate and check itself (classes with their
+subclasses and skill choices, point-buy costs, cantrip/spell tables, the
+feat interval) is serialized into one JS file whose name carries a hash of
+its content. `python manage.py build_rules_bundle` writes it, plus a
+manifest, into the static files; the {% rules_bundle_script %} tag links
+the built file, or inlines the bundle when the rules have changed since the
+last build, so the form never makes a request for rules data.
+"""
+import hashlib
+import json
+from functools import lru_cache
+
+from django.conf import settings
+
+from base.models import (
+    CANTRIPS_KNOWN_TABLE,
+    DEFAULT_HIT_DIE,
+    HIT_DICE_TABLE,
+    LEVELS_PER_FEAT,
+    POINT_BUY_BUDGET,
+    POINT_BUY_COSTS,
+    POINT_BUY_MAX,
+    POINT_BUY_MIN,
+    SPELLS_KNOWN_TABLE,
+)
+from base.utils.rules_catalog import get_rules_catalog, get_rules_version
+
+BUNDLE_STATIC_DIR = "bundles"
+BUNDLE_DIR = settings.STATICFILES_DIRS[0] / BUNDLE_STATIC_DIR
+MANIFEST_NAME = "manifest.json"
+BUNDLE_GLOBAL = "RULES_BUNDLE"
+
+
+def bundle_data(catalog=None):
+    catalog = catalog or get_rules_catalog()
+    classes = []
+    for class_id, character_class in sorted(catalog.classes.items()):
+        classes.append({
+            "id": class_id,
+            "name": character_class.name,
+            "hit_die": HIT_DICE_TABLE.get(character_class.name, DEFAULT_HIT_DIE),
+            "skill_choices": character_class.skill_choices_count,
+            "skills": sorted(catalog.class_skill_ids.get(class_id, ())),
+            "subclasses": [
+                {"id": s.pk, "name": s.name}
+                for s in sorted(catalog.subclasses_by_class.get(class_id, ()), key=lambda s: s.pk)
+            ],
+        })
+    return {
+        "classes": classes,
+        "skills": [{"id": skill.pk, "name": skill.name} for skill in catalog.skills],
+        "point_buy": {
+            "costs": POINT_BUY_COSTS,
+            "budget": POINT_BUY_BUDGET,
+            "min": POINT_BUY_MIN,
+            "max": POINT_BUY_MAX,
+        },
+        "cantrips_known": CANTRIPS_KNOWN_TABLE,
+        "spells_known": SPELLS_KNOWN_TABLE,
+        "levels_per_feat": LEVELS_PER_FEAT,
+    }
+
+
+def render_bundle(data):
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    # Safe to inline in a <script> element too
+    payload = payload.replace("<", "\\u003c")
+    return f"window.{BUNDLE_GLOBAL}={payload};\n"
+
+
+def bundle_filename(text):
+    return f"rules.{hashlib.sha256(text.encode()).hexdigest()[:12]}.js"
+
+
+@lru_cache(maxsize=1)
+def _bundle_for_version(version):
+    text = render_bundle(bundle_data())
+    return text, bundle_filename(text)
+
+
+def current_bundle():
+    """(bundle text, hashed file name) for the current rules, built once per rules version."""
+    return _bundle_for_version(get_rules_version())
+
+
+def write_bundle(directory=BUNDLE_DIR):
+    """Writes the current bundle and its manifest, removing older bundles. Returns the file path."""
+    text, name = current_bundle()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_text(text, encoding="utf-8")
+    for stale in directory.glob("rules.*.js"):
+        if stale != path:
+            stale.unlink()
+    manifest = {"rules.js": f"{BUNDLE_STATIC_DIR}/{name}"}
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return path
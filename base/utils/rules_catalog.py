@@ -0,0 +1,235 @@
+"""
+Process-wide, read-only snapshot of the static rules data.
+
+Classes, subclasses, races, skills, AC rules, class features, class spells
+and feats are loaded once per process and indexed for direct lookups. The
+snapshot carries a version stamp kept in the 'state' cache, which every
+server process shares; editing any rules row bumps the stamp (see
+base/signals.py) and the next lookup reloads it. The sheet API ETags, sheet
+fragment keys and the rules bundle URL include the stamp too.
+
+Each process rereads the shared stamp at most every RULES_VERSION_TTL
+seconds, so rules lookups stay in memory; the process that bumps the stamp
+sees the change at once, the others within the TTL.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from django.core.cache import caches
+
+STATE_CACHE = 'state'
+RULES_VERSION_CACHE_KEY = 'rules_catalog:version'
+RULES_VERSION_TTL = 1.0
+MAX_LEVEL = 20
+
+_catalog = None
+_catalog_lock = threading.Lock()
+# (version, time.monotonic() deadline) of the last read of the shared stamp
+_checked_version = None
+
+
+def _remember(version):
+    global _checked_version
+    _checked_version = (version, time.monotonic() + RULES_VERSION_TTL)
+    return version
+
+
+def _recent_version():
+    checked = _checked_version
+    if checked is not None and time.monotonic() < checked[1]:
+        return checked[0]
+    return None
+
+
+def get_rules_version() -> int:
+    """Returns the current rules version stamp, creating one if missing."""
+    version = _recent_version()
+    if version is not None:
+        return version
+    cache = caches[STATE_CACHE]
+    version = cache.get(RULES_VERSION_CACHE_KEY)
+    if version is None:
+        # A timestamp instead of 1 so a lost key never matches an old stamp
+        cache.add(RULES_VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+        version = cache.get(RULES_VERSION_CACHE_KEY)
+    return _remember(version)
+
+
+async def aget_rules_version() -> int:
+    """Async variant of get_rules_version() for async views."""
+    version = _recent_version()
+    if version is not None:
+        return version
+    cache = caches[STATE_CACHE]
+    version = await cache.aget(RULES_VERSION_CACHE_KEY)
+    if version is None:
+        await cache.aadd(RULES_VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(RULES_VERSION_CACHE_KEY)
+    return _remember(version)
+
+
+def bump_rules_version() -> None:
+    """Moves the stamp on, so every process reloads its RulesCatalog within RULES_VERSION_TTL."""
+    global _checked_version
+    cache = caches[STATE_CACHE]
+    try:
+        cache.incr(RULES_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(RULES_VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+    _checked_version = None
+
+
+def get_rules_catalog() -> "RulesCatalog":
+    """Returns the catalog for the current rules version, loading it if stale."""
+    global _catalog
+    version = get_rules_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = RulesCatalog.load(version)
+        return _catalog
+
+
+def _freeze(mapping):
+    return MappingProxyType({key: tuple(value) for key, value in mapping.items()})
+
+
+@dataclass(frozen=True)
+class RulesCatalog:
+    version: int
+    classes: MappingProxyType
+    subclasses: MappingProxyType
+    subclasses_by_class: MappingProxyType
+    races: MappingProxyType
+    race_modifiers: MappingProxyType
+    skills: tuple
+    class_skill_ids: MappingProxyType
+    ac_formulas: MappingProxyType
+    ac_bonuses: MappingProxyType
+    class_features: MappingProxyType
+    class_spells: MappingProxyType
+    spell_eligibility: MappingProxyType
+    feats: MappingProxyType
+
+    @classmethod
+    def load(cls, version):
+        from base.models import (
+            ArmorClassBonus,
+            ArmorClassFormula,
+            CharacterClass,
+            ClassFeature,
+            ClassSkillChoice,
+            ClassSpell,
+            Feat,
+            Race,
+            RaceModifier,
+            Skill,
+            Subclass,
+        )
+
+        classes = {c.pk: c for c in CharacterClass.objects.all()}
+        subclasses = {s.pk: s for s in Subclass.objects.all()}
+
+        subclasses_by_class = {class_id: [] for class_id in classes}
+        for subclass in subclasses.values():
+            subclasses_by_class.setdefault(subclass.character_class_id, []).append(subclass)
+
+        race_modifiers = {}
+        for modifier in RaceModifier.objects.all():
+            race_modifiers.setdefault(modifier.race_id, {})[modifier.ability] = modifier.modifier
+
+        class_skill_ids = {}
+        for choice in ClassSkillChoice.objects.all():
+            class_skill_ids.setdefault(choice.character_class_id, []).append(choice.skill_id)
+
+        class_spells = {}
+        for class_spell in ClassSpell.objects.all():
+            class_spells.setdefault(class_spell.character_class_id, []).append(class_spell)
+
+        def index_by_level(rows, level_attr):
+            """(class_id, subclass_id, level) -> rows unlocked at that level."""
+            by_class = {}
+            for row in rows:
+                by_class.setdefault(row.character_class_id, []).append(row)
+
+            index = {}
+            for class_id, class_rows in by_class.items():
+                subclass_ids = [None] + [s.pk for s in subclasses_by_class.get(class_id, [])]
+                for subclass_id in subclass_ids:
+                    for level in range(1, MAX_LEVEL + 1):
+                        index[(class_id, subclass_id, level)] = tuple(
+                            row for row in class_rows
+                            if getattr(row, level_attr) <= level
+                            and row.subclass_id in (None, subclass_id)
+                        )
+            return MappingProxyType(index)
+
+        # (class_id, subclass_id, level) -> ids of every spell unlocked by then
+        spell_eligibility = {}
+        for class_id, rows in class_spells.items():
+            subclass_ids = [None] + [s.pk for s in subclasses_by_class.get(class_id, [])]
+            for subclass_id in subclass_ids:
+                matching = [row for row in rows if row.subclass_id in (None, subclass_id)]
+                for level in range(1, MAX_LEVEL + 1):
+                    spell_eligibility[(class_id, subclass_id, level)] = frozenset(
+                        row.spell_id for row in matching if row.unlock_level <= level
+                    )
+
+        features = sorted(
+            ClassFeature.objects.select_related('subclass'),
+            key=lambda f: f.unlock_level,
+        )
+
+        return cls(
+            version=version,
+            classes=MappingProxyType(classes),
+            subclasses=MappingProxyType(subclasses),
+            subclasses_by_class=_freeze(subclasses_by_class),
+            races=MappingProxyType({r.pk: r for r in Race.objects.all()}),
+            race_modifiers=MappingProxyType({
+                race_id: MappingProxyType(mods) for race_id, mods in race_modifiers.items()
+            }),
+            skills=tuple(Skill.objects.all()),
+            class_skill_ids=_freeze(class_skill_ids),
+            ac_formulas=index_by_level(ArmorClassFormula.objects.all(), 'min_level'),
+            ac_bonuses=index_by_level(ArmorClassBonus.objects.all(), 'min_level'),
+            class_features=index_by_level(features, 'unlock_level'),
+            class_spells=_freeze(class_spells),
+            spell_eligibility=MappingProxyType(spell_eligibility),
+            feats=MappingProxyType({f.pk: f for f in Feat.objects.all()}),
+        )
+
+    @staticmethod
+    def _lookup(index, class_id, subclass_id, level):
+        if not class_id:
+            return ()
+        level = max(1, min(level, MAX_LEVEL))
+        rows = index.get((class_id, subclass_id, level))
+        if rows is None:
+            # Subclass from another class (or a new one): fall back to base rows
+            rows = index.get((class_id, None, level), ())
+        return rows
+
+    def ac_rules(self, class_id, subclass_id, level):
+        """Returns the (formulas, bonuses) AC rows unlocked for a class/subclass at a level."""
+        return (
+            self._lookup(self.ac_formulas, class_id, subclass_id, level),
+            self._lookup(self.ac_bonuses, class_id, subclass_id, level),
+        )
+
+    def features_for(self, class_id, subclass_id, level):
+        """Base class + subclass features unlocked at a level, ordered by unlock level."""
+        return self._lookup(self.class_features, class_id, subclass_id, level)
+
+    def eligible_spell_ids(self, class_id, subclass_id, level):
+        """Ids of spells a class (and its subclass) can learn at a level."""
+        return self._lookup(self.spell_eligibility, class_id, subclass_id, level) or frozenset()
+
+    def class_name(self, class_id):
+        character_class = self.classes.get(class_id)
+        return character_class.name if character_class else None
@@ -0,0 +1,206 @@
+"""
+Bulk loader for the JSON rules data in base/data.
+
+Each file is parsed once, foreign keys are resolved from maps built with a
+single query per model, and rows are written with bulk upserts inside one
+transaction. The sha256 of every loaded file is stored in RulesDataFile, so
+re-running the loader on unchanged data only hashes the files.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+from django.apps import apps as global_apps
+from django.db import transaction
+
+from base.utils.rules_catalog import bump_rules_version
+
+SPELL_FIELDS = [
+    "level",
+    "school",
+    "casting_time",
+    "components",
+    "duration",
+    "range",
+    "desc",
+    "material",
+    "ritual",
+    "concentration",
+]
+
+
+def get_data_dir():
+    return Path(global_apps.get_app_config("base").path) / "data"
+
+
+def file_digest(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _models(apps, *names):
+    if apps:
+        return [apps.get_model("base", name) for name in names]
+    return [global_apps.get_model("base", name) for name in names]
+
+
+def _upsert_nullable(model, rows, key_fields, update_fields):
+    """
+    Creates or updates `rows` matched on `key_fields`. Used instead of
+    bulk_create(update_conflicts=True) where the unique key contains a
+    nullable column, since NULLs never conflict in a unique index.
+    """
+    existing = {
+        tuple(getattr(obj, field) for field in key_fields): obj
+        for obj in model.objects.all()
+    }
+    to_create, to_update = [], []
+    for row in rows:
+        current = existing.get(tuple(getattr(row, field) for field in key_fields))
+        if current is None:
+            to_create.append(row)
+        elif any(getattr(current, f) != getattr(row, f) for f in update_fields):
+            for field in update_fields:
+                setattr(current, field, getattr(row, field))
+            to_update.append(current)
+    model.objects.bulk_create(to_create)
+    model.objects.bulk_update(to_update, update_fields)
+    return len(to_create), len(to_update)
+
+
+def load_spells(data, apps=None):
+    """Upserts spells and their ClassSpell rows from the spells.json structure."""
+    CharacterClass, Spell, ClassSpell = _models(apps, "CharacterClass", "Spell", "ClassSpell")
+    classes = {c.name: c.pk for c in CharacterClass.objects.all()}
+
+    spells, class_levels = [], {}
+    for level_str, spells_in_level in data.get("spellbook", {}).items():
+        try:
+            level = int(level_str.split("_")[-1])
+        except (ValueError, IndexError):
+            continue
+
+        # Positional schema, see the "_schema" key of spells.json
+        for row in spells_in_level:
+            spells.append(Spell(
+                name=row[0],
+                level=level,
+                school=row[1],
+                casting_time=row[2],
+                components=row[3],
+                duration=row[4],
+                range=row[5],
+                material=row[7],
+                ritual=row[8],
+                concentration=row[9],
+                desc=row[10],
+            ))
+            class_levels[row[0]] = row[6]
+
+    Spell.objects.bulk_create(
+        spells, update_conflicts=True, unique_fields=["name"], update_fields=SPELL_FIELDS,
+    )
+    spell_ids = dict(Spell.objects.filter(name__in=class_levels).values_list("name", "pk"))
+
+    class_spells = [
+        ClassSpell(
+            spell_id=spell_ids[spell_name],
+            character_class_id=classes[class_name],
+            subclass_id=None,
+            unlock_level=unlock_level,
+        )
+        for spell_name, levels in class_levels.items()
+        for class_name, unlock_level in levels.items()
+        if class_name in classes
+    ]
+    _upsert_nullable(
+        ClassSpell, class_spells, ("spell_id", "character_class_id", "subclass_id"), ["unlock_level"],
+    )
+    return len(spells)
+
+
+def load_class_features(data, apps=None):
+    """Upserts ClassFeature rows from the class_features.json structure."""
+    CharacterClass, Subclass, ClassFeature = _models(apps, "CharacterClass", "Subclass", "ClassFeature")
+    classes = {c.name: c.pk for c in CharacterClass.objects.all()}
+    subclasses = {
+        (s.character_class_id, s.name): s.pk for s in Subclass.objects.all()
+    }
+
+    features = []
+    for class_name, class_features in data.items():
+        class_id = classes.get(class_name)
+        if class_id is None:
+            continue
+        for feature in class_features:
+            subclass_id = None
+            if "subclass" in feature:
+                subclass_id = subclasses.get((class_id, feature["subclass"]))
+            features.append(ClassFeature(
+                character_class_id=class_id,
+                subclass_id=subclass_id,
+                name=feature["name"],
+                description=feature["description"],
+                unlock_level=feature["unlock_level"],
+            ))
+
+    _upsert_nullable(
+        ClassFeature, features, ("character_class_id", "subclass_id", "name"),
+        ["description", "unlock_level"],
+    )
+    return len(features)
+
+
+def load_feats(data, apps=None):
+    """Upserts feats from the feats.json list."""
+    (Feat,) = _models(apps, "Feat")
+    feats = [
+        Feat(name=feat["name"], description=feat.get("description", ""))
+        for feat in data
+    ]
+    Feat.objects.bulk_create(
+        feats, update_conflicts=True, unique_fields=["name"], update_fields=["description"],
+    )
+    return len(feats)
+
+
+RULES_DATA_LOADERS = {
+    "spells.json": load_spells,
+    "class_features.json": load_class_features,
+    "feats.json": load_feats,
+}
+
+
+def load_rules_data(data_dir=None, force=False):
+    """
+    Loads every rules data file whose content changed since the last run
+    (or all of them with `force`). Returns {file name: rows loaded, or None
+    when the file was unchanged and skipped}.
+    """
+    from base.models import RulesDataFile
+
+    data_dir = Path(data_dir) if data_dir else get_data_dir()
+    digests = {name: file_digest(data_dir / name) for name in RULES_DATA_LOADERS}
+    stored = dict(RulesDataFile.objects.values_list("name", "sha256"))
+
+    results = {
+        name: None for name, digest in digests.items()
+        if not force and stored.get(name) == digest
+    }
+    changed = [name for name in RULES_DATA_LOADERS if name not in results]
+    if not changed:
+        return results
+
+    with transaction.atomic():
+        for name in changed:
+            with (data_dir / name).open(encoding="utf-8") as f:
+                results[name] = RULES_DATA_LOADERS[name](json.load(f))
+
+        RulesDataFile.objects.bulk_create(
+            [RulesDataFile(name=name, sha256=digests[name]) for name in changed],
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=["sha256", "loaded_at"],
+        )
+        # bulk writes skip the post_save handlers that normally do this
+        transaction.on_commit(bump_rules_version)
+    return results
@@ -0,0 +1,99 @@
+"""
+JSON form of the computed character sheet, served by the read-only sheet API.
+
+Responses carry an ETag built from the character's version and the rules
+version, so pollers can revalidate with If-None-Match and get a 304 after a
+single lookup of the version column.
+"""
+from base.models import AbilityScoreChoices
+from base.utils.derived_stats import build_derived_stats
+
+
+def sheet_etag(character_id, version, rules_version):
+    return f'"{character_id}-{version}-{rules_version}"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value matches `etag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def _named(obj):
+    return {"id": obj.pk, "name": obj.name} if obj is not None else None
+
+
+def sheet_payload(sheet):
+    """Computed sheet of a character loaded through CharacterSheet.prefetch()."""
+    character = sheet.character
+    stats = getattr(character, "derived_stats", None) or build_derived_stats(sheet)
+
+    abilities = {}
+    for ability in AbilityScoreChoices.values:
+        total = getattr(stats, f"total_{ability}")
+        abilities[ability] = {
+            "base": getattr(character, ability),
+            "total": total,
+            "modifier": (total - 10) // 2,
+        }
+
+    return {
+        "id": character.pk,
+        "version": character.version,
+        "character_name": character.character_name,
+        "character_class": _named(character.character_class),
+        "subclass": _named(character.subclass),
+        "race": _named(character.race),
+        "background": _named(character.background),
+        "level": character.level,
+        "alignment": character.alignment,
+        "experience_points": character.experience_points,
+        "abilities": abilities,
+        "armor_class": stats.armor_class,
+        "speed": stats.speed,
+        "initiative": character.initiative,
+        "proficiency_bonus": stats.proficiency_bonus,
+        "hit_points": {
+            "current": character.hit_points,
+            "max": stats.max_hit_points,
+            "temporary": character.temporary_hit_points,
+        },
+        "hit_dice": f"{character.level}d{character.hit_dice}",
+        "death_saves": {
+            "success": character.death_saves_success,
+            "failure": character.death_saves_failure,
+        },
+        "inspiration": character.inspiration,
+        "backstory": character.backstory,
+        "skills": [
+            {
+                "id": row["skill"].pk,
+                "name": row["skill"].name,
+                "ability": row["ability"],
+                "proficient": row["is_proficient"],
+                "bonus": stats.skill_bonuses.get(str(row["skill"].pk), row["bonus"]),
+            }
+            for row in sheet.skills
+        ],
+        "inventory": [
+            {"item": _named(inv.item), "quantity": inv.quantity, "weight": float(inv.item.weight)}
+            for inv in sheet.inventory
+        ],
+        "total_weight": float(sheet.total_weight),
+        "languages": [_named(language) for language in character.languages.all()],
+        "feats": [_named(feat) for feat in character.feats.all()],
+        "class_features": [
+            {"name": feature.name, "level": feature.unlock_level} for feature in sheet.class_features
+        ],
+        "spells": [
+            {"id": spell.pk, "name": spell.name, "level": spell.level}
+            for spell in sorted(sheet.spells, key=lambda s: (s.level, s.name))
+        ],
+        "spell_limits": {
+            "cantrips": stats.max_cantrips_known,
+            "spells": stats.max_spells_known,
+            "type": stats.spell_limit_type,
+        },
+    }
@@ -0,0 +1,88 @@
+"""
+Ranked full-text spell search.
+
+On SQLite the search runs against the base_spell_fts FTS5 table (see
+migration 0023) ranked with bm25, name matches weighing the most. Other
+database backends fall back to a case-insensitive LIKE on name/description.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from base.models import ClassSpell, Spell
+
+# bm25 column weights: name, desc, higher_level, school, components
+BM25_WEIGHTS = (10.0, 1.0, 0.5, 2.0, 0.5)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# Far past the last page of every spell; keeps OFFSET within SQLite's integers
+MAX_PAGE = 1000
+
+
+def build_match_query(text):
+    """
+    Turns free user input into a safe FTS5 query: every word becomes a
+    quoted prefix term and all terms must match.
+    """
+    return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(text))
+
+
+def search_spells(text, class_id=None, subclass_id=None, level=20, page=1, page_size=20):
+    """
+    Returns (spells, has_next) for one page of results. With `class_id`
+    only spells the class (or its `subclass_id`) unlocks by `level` are
+    returned. On SQLite each Spell carries a bm25 `rank` (lower is better).
+    """
+    match = build_match_query(text)
+    if not match:
+        return [], False
+
+    page = max(1, page)
+    offset = (page - 1) * page_size
+
+    if connection.vendor != 'sqlite':
+        spells = _fallback_search(text, class_id, subclass_id, level)
+        spells = list(spells[offset:offset + page_size + 1])
+        return spells[:page_size], len(spells) > page_size
+
+    params = [match]
+    eligibility = ''
+    if class_id:
+        eligibility = f'''
+            AND EXISTS (
+                SELECT 1 FROM {ClassSpell._meta.db_table} cs
+                WHERE cs.spell_id = s.id
+                  AND cs.character_class_id = %s
+                  AND cs.unlock_level <= %s
+                  AND (cs.subclass_id IS NULL OR cs.subclass_id = %s)
+            )'''
+        params += [class_id, level, subclass_id]
+
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    sql = f'''
+        SELECT s.*, bm25(base_spell_fts, {weights}) AS rank
+        FROM base_spell_fts
+        JOIN {Spell._meta.db_table} s ON s.id = base_spell_fts.rowid
+        WHERE base_spell_fts MATCH %s {eligibility}
+        ORDER BY rank, s.name
+        LIMIT %s OFFSET %s
+    '''
+    params += [page_size + 1, offset]
+
+    spells = list(Spell.objects.raw(sql, params))
+    return spells[:page_size], len(spells) > page_size
+
+
+def _fallback_search(text, class_id, subclass_id, level):
+    spells = Spell.objects.all()
+    for token in TOKEN_RE.findall(text):
+        spells = spells.filter(Q(name__icontains=token) | Q(desc__icontains=token))
+    if class_id:
+        spells = spells.filter(
+            classspell__character_class_id=class_id,
+            classspell__unlock_level__lte=level,
+        ).filter(
+            Q(classspell__subclass__isnull=True) | Q(classspell__subclass_id=subclass_id)
+        ).distinct()
+    return spells.order_by('name')
@@ -0,0 +1,152 @@
+"""
+Synthetic characters for benchmarks.
+
+Characters get a random class, subclass, race, background and level, a
+valid point-buy spread, their class's number of skill choices, an
+inventory, languages, feats up to the level limit and spells the class can
+learn within its cantrip/spell limits. Everything is written with
+bulk_create_characters, so generating stays proportional to the row count.
+"""
+import random
+import time
+
+from django.contrib.auth.models import User
+
+from base.models import (
+    POINT_BUY_BUDGET,
+    POINT_BUY_COSTS,
+    POINT_BUY_MAX,
+    Background,
+    Character,
+    Feat,
+    Item,
+    Language,
+    Race,
+    Spell,
+)
+from base.utils.character_bulk import BULK_BATCH_SIZE, CharacterRecord, bulk_create_characters
+from base.utils.rules_catalog import MAX_LEVEL, get_rules_catalog
+
+ABILITIES = ("strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma")
+INVENTORY_SIZE = (3, 30)
+LANGUAGES = (1, 3)
+
+
+def point_buy_scores(rng):
+    """A random spread that spends at most the point-buy budget."""
+    scores = dict.fromkeys(ABILITIES, min(POINT_BUY_COSTS))
+    spent = 0
+    while True:
+        options = [
+            ability for ability, score in scores.items()
+            if score < POINT_BUY_MAX
+            and spent + POINT_BUY_COSTS[score + 1] - POINT_BUY_COSTS[score] <= POINT_BUY_BUDGET
+        ]
+        if not options:
+            return scores
+        ability = rng.choice(options)
+        spent += POINT_BUY_COSTS[scores[ability] + 1] - POINT_BUY_COSTS[scores[ability]]
+        scores[ability] += 1
+
+
+class SyntheticCharacters:
+    """Builds CharacterRecords from the reference rows of the current database."""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.catalog = get_rules_catalog()
+        self.class_ids = sorted(self.catalog.classes)
+        self.race_ids = list(Race.objects.values_list("pk", flat=True))
+        self.background_ids = list(Background.objects.values_list("pk", flat=True))
+        self.item_ids = list(Item.objects.values_list("pk", flat=True))
+        self.language_ids = list(Language.objects.values_list("pk", flat=True))
+        self.feat_ids = list(Feat.objects.values_list("pk", flat=True))
+        self.spell_levels = dict(Spell.objects.values_list("pk", "level"))
+
+    def _sample(self, population, k):
+        return self.rng.sample(population, min(k, len(population)))
+
+    def record(self, user_id, name):
+        rng = self.rng
+        class_id = rng.choice(self.class_ids)
+        subclasses = self.catalog.subclasses_by_class.get(class_id, ())
+        level = rng.randint(1, MAX_LEVEL)
+        character = Character(
+            user_id=user_id,
+            character_name=name,
+            character_class_id=class_id,
+            subclass_id=rng.choice(subclasses).pk if subclasses and level >= 3 else None,
+            race_id=rng.choice(self.race_ids) if self.race_ids else None,
+            background_id=rng.choice(self.background_ids) if self.background_ids else None,
+            level=level,
+            hit_points=0,
+            temporary_hit_points=0,
+            **point_buy_scores(rng),
+        )
+
+        eligible = self.catalog.eligible_spell_ids(class_id, character.subclass_id, level)
+        cantrips = [pk for pk in eligible if self.spell_levels.get(pk) == 0]
+        leveled = [pk for pk in eligible if self.spell_levels.get(pk, 0) > 0]
+        max_spells, _ = character.max_spells_known
+        class_skills = list(self.catalog.class_skill_ids.get(class_id, ()))
+
+        return CharacterRecord(
+            character=character,
+            skill_ids=self._sample(class_skills, self.catalog.classes[class_id].skill_choices_count),
+            inventory=[
+                (item_id, rng.randint(1, 3))
+                for item_id in self._sample(self.item_ids, rng.randint(*INVENTORY_SIZE))
+            ],
+            language_ids=self._sample(self.language_ids, rng.randint(*LANGUAGES)),
+            spell_ids=(
+                self._sample(sorted(cantrips), character.max_cantrips_known)
+                + self._sample(sorted(leveled), max_spells)
+            ),
+            feat_ids=self._sample(self.feat_ids, character.max_feats_known),
+        )
+
+
+def generate_characters(count, users=1, seed=0, batch_size=BULK_BATCH_SIZE, prefix="bench", progress=None):
+    """
+    Creates `count` synthetic characters spread over `users` accounts named
+    `<prefix>-<n>` (created if missing). `progress(done)` is called per batch.
+    Returns the accounts.
+    """
+    accounts = []
+    for n in range(users):
+        user, created = User.objects.get_or_create(username=f"{prefix}-{n}")
+        if created:
+            user.set_password(prefix)
+            user.save(update_fields=["password"])
+        accounts.append(user)
+
+    factory = SyntheticCharacters(seed)
+    done = 0
+    while done < count:
+        size = min(batch_size, count - done)
+        bulk_create_characters([
+            factory.record(accounts[(done + i) % users].pk, f"Synthetic {done + i}")
+            for i in range(size)
+        ])
+        done += size
+        if progress:
+            progress(done)
+    return accounts
+
+
+def ensure_characters(count, users=1, seed=0, prefix="bench", stream=None):
+    """
+    Tops the `<prefix>-<n>` accounts up to `count` characters in total, so a
+    kept benchmark database is reused as is. Progress goes to `stream`.
+    """
+    existing = Character.objects.filter(user__username__startswith=f"{prefix}-").count()
+    missing = count - existing
+    if missing <= 0:
+        return
+    progress = None
+    if stream:
+        progress = lambda done: stream.write(f"\rGenerated {done}/{missing} characters", ending="")
+    started = time.perf_counter()
+    generate_characters(missing, users=users, seed=seed + existing, prefix=prefix, progress=progress)
+    if stream:
+        stream.write(f"\nGenerated {missing} characters in {time.perf_counter() - started:.1f}s.")
@@ -1,16 +1,33 @@
+import json
+import sys
+
 from django.views.generic.list import ListView # type: ignore
 from django.views.generic.detail import DetailView # type: ignore
 from django.views.generic.edit import CreateView, UpdateView, DeleteView, FormView # type: ignore
+from django.views.decorators.http import require_GET, require_http_methods # type: ignore
 from django.urls import reverse_lazy # type: ignore
 from django.shortcuts import render, redirect, get_object_or_404 # type: ignore
 from django.contrib.auth.views import LoginView 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
-from .forms import CharacterForm, SpellSelectionForm
+from .forms import CharacterForm, SpellSelectionForm, spell_limit_errors
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-
-from .models import Character, Background, CharacterClass, Skill
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Coalesce, Lower
+
+from .models import POINT_BUY_BUDGET, Character, CharacterClass, Skill, Spell
+from .utils.character_bulk import set_skill_proficiencies
+from .utils.character_export import EXPORT_FORMATS, EXPORT_WRITERS
+from .utils.character_sheet import CharacterSheet
+from .utils.fragment_cache import fragment_stats, get_sheet_fragments
+from .utils.keyset import keyset_page
+from .utils.pdf_export import character_pdf_filename, export_queryset, iter_characters_zip, render_character_pdf
+from .utils.pdf_import import import_sheets
+from .utils.rules_catalog import aget_rules_version, get_rules_catalog, get_rules_version
+from .utils.sheet_api import etag_matches, sheet_etag, sheet_payload
+from .utils.spell_search import MAX_PAGE, search_spells
 
 CHARACTER_FORM_FIELDS = ['character_name', 'character_class', 'subclass', 'race', 'level', 'background', 'alignment', 'experience_points', 'strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma', 'initiative', 'speed', 'hit_points', 'temporary_hit_points', 'hit_dice', 'death_saves_success', 'death_saves_failure', 'backstory', 'inspiration', 'languages']
 
@@ -42,62 +59,154 @@ class RegisterPage(FormView):
 class CharacterList(LoginRequiredMixin, ListView):
     model = Character
     context_object_name = 'characters'
+    template_name = 'base/character_list.html'
+    page_size = 25
+
+    # ?sort= value -> keyset ordering; every ordering ends with the unique pk.
+    # AC comes from the materialized derived stats (missing rows sort last).
+    SORT_ORDERINGS = {
+        'created': ('created_at', 'pk'),
+        'ac': ('-sort_ac', 'created_at', 'pk'),
+        'hp': ('-hit_points', 'created_at', 'pk'),
+    }
+    LIST_FIELDS = (
+        'character_name', 'level', 'hit_points', 'created_at',
+        'race__name', 'character_class__name', 'derived_stats__armor_class',
+    )
+
+    def get_queryset(self):
+        characters = Character.objects.filter(
+            user=self.request.user
+        ).select_related(
+            'race', 'character_class', 'derived_stats'
+        ).only(*self.LIST_FIELDS)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['characters'] = context['characters'].filter(user=self.request.user)
         search_input = self.request.GET.get('search') or ''
         if search_input:
-            context['characters'] = context['characters'].filter(character_name__istartswith=search_input)
-        context['search_input'] = search_input
+            # Range on lower(character_name) so the functional index is used
+            low, high = prefix_range(search_input)
+            characters = characters.alias(
+                name_lower=Lower('character_name')
+            ).filter(name_lower__gte=low)
+            if high is not None:
+                characters = characters.filter(name_lower__lt=high)
+
+        min_ac = self._int_param('min_ac')
+        if min_ac is not None:
+            characters = characters.filter(derived_stats__armor_class__gte=min_ac)
+        min_hp = self._int_param('min_hp')
+        if min_hp is not None:
+            characters = characters.filter(hit_points__gte=min_hp)
+
+        if self._sort() == 'ac':
+            characters = characters.annotate(
+                sort_ac=Coalesce('derived_stats__armor_class', Value(-1))
+            )
+        return characters
+
+    def get(self, request, *args, **kwargs):
+        self.object_list, self.next_cursor = keyset_page(
+            self.get_queryset(),
+            self.SORT_ORDERINGS[self._sort()],
+            request.GET.get('cursor'),
+            self.page_size,
+        )
+        context = self.get_context_data()
+        return self.render_to_response(context)
+
+    def _sort(self):
+        sort = self.request.GET.get('sort')
+        return sort if sort in self.SORT_ORDERINGS else 'created'
+
+    def _int_param(self, name):
+        try:
+            return int(self.request.GET[name])
+        except (KeyError, ValueError):
+            return None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_input'] = self.request.GET.get('search') or ''
+        context['sort'] = self._sort()
+        context['min_ac'] = self.request.GET.get('min_ac') or ''
+        context['min_hp'] = self.request.GET.get('min_hp') or ''
+
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        context['first_page_query'] = params.urlencode()
+        context['is_first_page'] = 'cursor' not in self.request.GET
+        if self.next_cursor:
+            params['cursor'] = self.next_cursor
+            context['next_page_query'] = params.urlencode()
         return context
 
+
+def prefix_range(prefix):
+    """
+    Returns (low, high) so that low <= lower(name) < high matches names
+    starting with `prefix`. Only ASCII letters are lowered, like SQLite lower().
+    high is None when no upper bound is needed.
+    """
+    low = ''.join(c.lower() if c.isascii() else c for c in prefix)
+    # U+10FFFF has no successor; names with that stem all sort above the stem
+    stem = low.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return low, None
+    high = stem[:-1] + chr(ord(stem[-1]) + 1)
+    return low, high
+
 class CharacterDetail(LoginRequiredMixin, DetailView):
     model = Character
     context_object_name = 'character'
     template_name = 'base/character.html'
 
+    def get_queryset(self):
+        # Related rows are prefetched in get_context_data, only if a section is not cached
+        return super().get_queryset().select_related(*CharacterSheet.SELECT_RELATED)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         character = self.object
+        sheet = CharacterSheet(character)
+        context['sheet'] = sheet
 
-        # Inventory
-        inventory = character.inventory.all()
-        context['inventory'] = inventory
-        context['current_ac'] = character.armor_class
-        context['total_weight'] = sum(
-            item.item.weight * item.quantity for item in inventory
-        )
+        context['fragment_keys'], context['fragments'] = get_sheet_fragments(character)
+        if len(context['fragments']) == len(context['fragment_keys']):
+            return context
 
-        # 👇 BACKGROUND OBJECT (NOWE)
-        background_obj = Background.objects.filter(
-            name=character.background
-        ).first()
-        context['background_obj'] = background_obj
+        CharacterSheet.prefetch_into([character])
 
-        context['skill_proficiencies'] = character.get_skill_proficiencies()
+        # Inventory
+        context['inventory'] = sheet.inventory
+        context['current_ac'] = sheet.armor_class
+        context['total_weight'] = sheet.total_weight
 
-        skills_data = []
-        for skill in Skill.objects.all():
-            skills_data.append({
-                "skill": skill,
-                "ability": skill.get_ability_display(),
-                "is_proficient": skill in character.get_skill_proficiencies(),
-                "bonus": character.get_skill_bonus(skill),
-            })
+        context['background_obj'] = character.background
 
-        context["skills_data"] = skills_data
-        context["class_features"] = character.get_class_features()
+        context["skills_data"] = sheet.skills
+        context["class_features"] = sheet.class_features
 
         return context
 
-class CharacterCreate(LoginRequiredMixin, CreateView):
+class CharacterFormMixin:
     model = Character
     form_class = CharacterForm
     template_name = 'base/character_form.html'
     success_url = reverse_lazy('characters')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['point_buy_budget'] = POINT_BUY_BUDGET
+        return context
+
+    def _save_m2m(self, form):
+        # Skills and feats are not model form fields; languages are saved by the form
+        set_skill_proficiencies(self.object, (skill.pk for skill in form.cleaned_data.get("skills", [])))
+        self.object.feats.set(form.cleaned_data.get("feats", []))
+
+
+class CharacterCreate(LoginRequiredMixin, CharacterFormMixin, CreateView):
     def form_valid(self, form):
         form.instance.user = self.request.user
         response = super().form_valid(form)
@@ -105,69 +214,70 @@ class CharacterCreate(LoginRequiredMixin, CreateView):
         self._save_m2m(form)
         return response
 
-    def _save_m2m(self, form):
-        from .models import CharacterSkillProficiency
-        CharacterSkillProficiency.objects.filter(character=self.object).delete()
-        
-        for skill in form.cleaned_data.get("skills", []):
-            CharacterSkillProficiency.objects.create(
-                character=self.object,
-                skill=skill
-            )
-
-        self.object.feats.set(form.cleaned_data.get("feats", []))
-
-
-class CharacterUpdate(LoginRequiredMixin, UpdateView):
-    model = Character
-    form_class = CharacterForm
-    template_name = 'base/character_form.html'
-    success_url = reverse_lazy('characters')
 
+class CharacterUpdate(LoginRequiredMixin, CharacterFormMixin, UpdateView):
     def form_valid(self, form):
         response = super().form_valid(form)
         self._save_m2m(form)
         return response
 
-    def _save_m2m(self, form):
-        from .models import CharacterSkillProficiency
-        
-        # Skills
-        CharacterSkillProficiency.objects.filter(character=self.object).delete()
-        for skill in form.cleaned_data.get("skills", []):
-            CharacterSkillProficiency.objects.create(
-                character=self.object,
-                skill=skill
-            )
-            
-        # Feats
-        self.object.feats.set(form.cleaned_data.get("feats", []))
-
 class CharacterDelete(LoginRequiredMixin, DeleteView):
     model = Character
     template_name = 'base/character_confirm_delete.html'
     success_url = reverse_lazy('characters')
 
 
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from .models import Subclass
 
-def subclasses_for_class(request):
-    class_id = request.GET.get("class_id")
-    subclasses = Subclass.objects.filter(character_class_id=class_id)
-    data = [{"id": s.id, "name": s.name} for s in subclasses]
-    return JsonResponse(data, safe=False)
+# Rules lookups only change with the rules version; requests that carry it as
+# ?v= can be cached by the browser for good.
+RULES_DATA_MAX_AGE = 60 * 60 * 24 * 365
 
 
-def skills_for_class(request):
-    class_id = request.GET.get("class_id")
+def _class_id(request):
     try:
-        char_class = CharacterClass.objects.get(pk=class_id)
-        skills = Skill.objects.filter(classskillchoice__character_class=char_class)
-        data = [{"id": s.id, "name": s.name} for s in skills]
-    except CharacterClass.DoesNotExist:
-        data = []
-    return JsonResponse(data, safe=False)
+        return int(request.GET.get('class_id', ''))
+    except ValueError:
+        return None
+
+
+async def _rules_data_response(request, load):
+    """JSON from `load()` with HTTP caching tied to the rules version."""
+    version = str(await aget_rules_version())
+    etag = f'"rules-{version}"'
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(await load(), safe=False)
+    response['ETag'] = etag
+    if request.GET.get('v') == version:
+        response['Cache-Control'] = f'public, max-age={RULES_DATA_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+@require_GET
+async def subclasses_for_class(request):
+    class_id = _class_id(request)
+
+    async def load():
+        subclasses = Subclass.objects.filter(character_class_id=class_id).order_by('pk').values('id', 'name')
+        return [s async for s in subclasses]
+
+    return await _rules_data_response(request, load)
+
+
+@require_GET
+async def skills_for_class(request):
+    class_id = _class_id(request)
+
+    async def load():
+        skills = Skill.objects.filter(classskillchoice__character_class_id=class_id).order_by('pk').values('id', 'name')
+        return [s async for s in skills]
+
+    return await _rules_data_response(request, load)
 
 @login_required
 def character_spells(request, pk):
@@ -184,6 +294,251 @@ def character_spells(request, pk):
 
     context = {
         'form': form,
-        'character': character
+        'character': character,
+        'known_spell_ids': form.selected_spell_ids,
     }
-    return render(request, 'base/character_spells.html', context)
\ No newline at end of file
+    return render(request, 'base/character_spells.html', context)
+
+SPELL_PICKER_PAGE_SIZE = 50
+SPELL_PICKER_FIELDS = ('id', 'name', 'level', 'school', 'casting_time', 'ritual', 'concentration')
+SPELL_PICKER_ORDERING = ('level', 'name', 'pk')
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def character_spells_api(request, pk):
+    """
+    JSON spell picker. GET returns a page of eligible spells grouped by level
+    (pass the returned `next` as `cursor` for the following page); POST takes
+    {"add": [ids], "remove": [ids]} and applies it to the known spells.
+    """
+    character = get_object_or_404(
+        Character.objects.select_related('character_class'), pk=pk, user=request.user
+    )
+    eligible_ids = get_rules_catalog().eligible_spell_ids(
+        character.character_class_id, character.subclass_id, character.level
+    )
+
+    if request.method == 'POST':
+        return _apply_spell_delta(request, character, eligible_ids)
+
+    spells, next_cursor = keyset_page(
+        Spell.objects.filter(pk__in=eligible_ids).only(*SPELL_PICKER_FIELDS),
+        SPELL_PICKER_ORDERING,
+        request.GET.get('cursor'),
+        SPELL_PICKER_PAGE_SIZE,
+    )
+    groups = []
+    for spell in spells:
+        if not groups or groups[-1]['level'] != spell.level:
+            groups.append({'level': spell.level, 'spells': []})
+        groups[-1]['spells'].append({
+            'id': spell.id,
+            'name': spell.name,
+            'school': spell.school,
+            'casting_time': spell.casting_time,
+            'ritual': spell.ritual,
+            'concentration': spell.concentration,
+        })
+    return JsonResponse({
+        'groups': groups,
+        'known': sorted(character.spells.values_list('pk', flat=True)),
+        'next': next_cursor,
+    })
+
+
+def _apply_spell_delta(request, character, eligible_ids):
+    try:
+        payload = json.loads(request.body or b'{}')
+        add = {int(pk) for pk in payload.get('add', [])}
+        remove = {int(pk) for pk in payload.get('remove', [])}
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'errors': ['Expected {"add": [ids], "remove": [ids]}.']}, status=400)
+
+    ineligible = sorted(add - eligible_ids)
+    if ineligible:
+        return JsonResponse({'errors': [f'Spells not available to this character: {ineligible}']}, status=400)
+
+    known = set(character.spells.values_list('pk', flat=True))
+    selected = (known | add) - remove
+    counts = Spell.objects.filter(pk__in=selected).aggregate(
+        cantrips=Count('pk', filter=Q(level=0)),
+        spells=Count('pk', filter=Q(level__gt=0)),
+    )
+    errors = spell_limit_errors(character, counts['cantrips'], counts['spells'])
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+
+    if add - known:
+        character.spells.add(*(add - known))
+    if remove & known:
+        character.spells.remove(*(remove & known))
+    return JsonResponse({'known': sorted(selected), **counts})
+
+
+@login_required
+@require_GET
+def spell_detail(request, pk):
+    """Full text of a single spell, loaded on demand by the picker."""
+    spell = get_object_or_404(Spell, pk=pk)
+    return JsonResponse({
+        'id': spell.id,
+        'name': spell.name,
+        'level': spell.level,
+        'school': spell.school,
+        'casting_time': spell.casting_time,
+        'range': spell.range,
+        'components': spell.components,
+        'material': spell.material,
+        'duration': spell.duration,
+        'ritual': spell.ritual,
+        'concentration': spell.concentration,
+        'desc': spell.desc,
+        'higher_level': spell.higher_level,
+        'page': spell.page,
+    })
+
+@login_required
+@require_GET
+def character_sheet_api(request, pk):
+    """
+    The computed sheet as JSON. Revalidation with If-None-Match only reads the
+    character's version; a match returns 304 without loading the sheet.
+    """
+    version = Character.objects.filter(pk=pk, user=request.user).values_list('version', flat=True).first()
+    if version is None:
+        return JsonResponse({'error': 'Character not found'}, status=404)
+
+    rules_version = get_rules_version()
+    etag = sheet_etag(pk, version, rules_version)
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+    else:
+        character = get_object_or_404(
+            CharacterSheet.prefetch(Character.objects.filter(user=request.user)).select_related('derived_stats'),
+            pk=pk,
+        )
+        # The row may have changed since the version lookup; tag what is sent
+        etag = sheet_etag(pk, character.version, rules_version)
+        response = JsonResponse(sheet_payload(CharacterSheet(character)))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+@require_GET
+def character_pdf(request, pk):
+    """The character filled into the official fillable sheet."""
+    character = get_object_or_404(export_queryset(Character.objects.filter(user=request.user)), pk=pk)
+    response = HttpResponse(render_character_pdf(character), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{character_pdf_filename(character)}"'
+    return response
+
+
+@login_required
+@require_GET
+def characters_pdf_zip(request):
+    """Streams a ZIP with a filled sheet per character of the account (or the ?ids= subset)."""
+    characters = Character.objects.filter(user=request.user)
+    if request.GET.get('ids'):
+        try:
+            ids = [int(pk) for pk in request.GET['ids'].split(',')]
+        except ValueError:
+            return JsonResponse({'error': 'ids must be a comma-separated list of integers'}, status=400)
+        characters = characters.filter(pk__in=ids)
+
+    response = StreamingHttpResponse(iter_characters_zip(characters), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="characters.zip"'
+    return response
+
+
+@login_required
+@require_GET
+def characters_export(request):
+    """
+    Streams the account's characters as NDJSON (default) or ?format=csv.
+    Staff can pass ?all=1 to export every character.
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in EXPORT_WRITERS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(EXPORT_WRITERS)}"}, status=400)
+
+    characters = Character.objects.all()
+    if not (request.user.is_staff and request.GET.get('all') == '1'):
+        characters = characters.filter(user=request.user)
+
+    response = StreamingHttpResponse(EXPORT_WRITERS[fmt](characters), content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="characters.{fmt}"'
+    return response
+
+
+MAX_IMPORT_FILES = 200
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def character_import(request):
+    """Upload filled PDF sheets and create a character from each."""
+    context = {'max_files': MAX_IMPORT_FILES}
+    if request.method == 'POST':
+        files = request.FILES.getlist('sheets')
+        if not files:
+            context['error'] = 'Choose at least one PDF file.'
+        elif len(files) > MAX_IMPORT_FILES:
+            context['error'] = f'At most {MAX_IMPORT_FILES} files can be imported at once.'
+        else:
+            context['report'] = import_sheets([(f.name, f.read()) for f in files], request.user)
+    return render(request, 'base/character_import.html', context)
+
+
+@login_required
+@require_GET
+def spell_search(request):
+    """Ranked, paginated spell search, optionally limited to what a character can learn."""
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        return JsonResponse({'error': 'page must be an integer'}, status=400)
+    page = max(1, min(page, MAX_PAGE))
+
+    class_id = subclass_id = None
+    level = 20
+    if request.GET.get('character'):
+        try:
+            character_id = int(request.GET['character'])
+        except ValueError:
+            return JsonResponse({'error': 'character must be an integer'}, status=400)
+        character = get_object_or_404(Character, pk=character_id, user=request.user)
+        class_id, subclass_id, level = character.character_class_id, character.subclass_id, character.level
+    elif request.GET.get('class_id'):
+        try:
+            class_id = int(request.GET['class_id'])
+            level = int(request.GET.get('level', 20))
+        except ValueError:
+            return JsonResponse({'error': 'class_id and level must be integers'}, status=400)
+
+    spells, has_next = search_spells(
+        request.GET.get('q', ''),
+        class_id=class_id,
+        subclass_id=subclass_id,
+        level=level,
+        page=page,
+    )
+    data = [
+        {
+            "id": s.id,
+            "name": s.name,
+            "level": s.level,
+            "school": s.school,
+            "casting_time": s.casting_time,
+        }
+        for s in spells
+    ]
+    return JsonResponse({"results": data, "page": page, "has_next": has_next})
+
+
+@staff_member_required
+@require_GET
+def fragment_cache_stats(request):
+    """Hit/miss counters of the character sheet fragment cache in this cache backend."""
+    return JsonResponse({'sections': fragment_stats()})